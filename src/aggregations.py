@@ -0,0 +1,108 @@
+"""Server-side aggregations of one run's frame columns, for the dashboards.
+
+Every function returns binned results only - a fixed number of values set by
+its bins / buckets / max_points arguments - so the payload sent to the browser
+does not grow with the length of the run. Inputs are the column arrays of
+sidecar.run_columns() (frame_id, elapsed_ms, score, defect).
+
+The value range of histograms and heatmaps defaults to [min, 99.5th
+percentile]; larger values are counted in the last bin so a few outliers do
+not squash the rest of the distribution into one bin.
+"""
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+DEFAULT_BINS = 50
+DEFAULT_WINDOW = 100
+DEFAULT_MAX_POINTS = 500
+DEFAULT_X_BUCKETS = 100
+DEFAULT_Y_BINS = 40
+RANGE_PERCENTILE = 99.5
+
+# aggregate() の kind -> (関数, 対象の列)
+AGGREGATIONS = {
+    "elapsed_hist": ("histogram", "elapsed_ms"),
+    "score_hist": ("histogram", "score"),
+    "defect_rate": ("rolling_rate", "defect"),
+    "elapsed_heatmap": ("heatmap", "elapsed_ms"),
+    "score_heatmap": ("heatmap", "score"),
+}
+
+
+def _value_range(v: np.ndarray, value_range: Optional[Sequence[float]]):
+    if value_range is not None:
+        lo, hi = float(value_range[0]), float(value_range[1])
+    else:
+        lo, hi = float(v.min()), float(np.percentile(v, RANGE_PERCENTILE))
+    if hi <= lo:
+        hi = lo + 1.0
+    return lo, hi
+
+
+def histogram(values, bins: int = DEFAULT_BINS, value_range: Optional[Sequence[float]] = None) -> Dict:
+    """{"edges": bins+1 edges, "counts": bins counts, "count": finite values} (NaN values are skipped)."""
+    v = np.asarray(values, dtype=np.float64)
+    v = v[np.isfinite(v)]
+    if not len(v):
+        return {"edges": [], "counts": [], "count": 0}
+    lo, hi = _value_range(v, value_range)
+    counts, edges = np.histogram(np.clip(v, lo, hi), bins=bins, range=(lo, hi))
+    return {"edges": edges.tolist(), "counts": counts.tolist(), "count": int(len(v))}
+
+
+def rolling_rate(frame_id, flags, window: int = DEFAULT_WINDOW, max_points: int = DEFAULT_MAX_POINTS) -> Dict:
+    """Share of true flags over the last `window` frames (frame_id order), sampled at <= max_points frames.
+
+    {"x": frame_id, "y": rate, "window": window, "overall": rate over the whole run}
+    """
+    x = np.asarray(frame_id, dtype=np.int64)
+    f = np.asarray(flags, dtype=np.float64)
+    if not len(x):
+        return {"x": [], "y": [], "window": window, "overall": None}
+    if np.any(x[1:] < x[:-1]):
+        order = np.argsort(x, kind="stable")
+        x, f = x[order], f[order]
+    csum = np.concatenate(([0.0], np.cumsum(f)))
+    end = np.arange(1, len(f) + 1)
+    start = np.maximum(end - window, 0)
+    rate = (csum[end] - csum[start]) / (end - start)
+    if len(x) > max_points:
+        idx = np.unique(np.linspace(0, len(x) - 1, max_points).astype(np.int64))
+        x, rate = x[idx], rate[idx]
+    return {"x": x.tolist(), "y": rate.tolist(), "window": window, "overall": float(csum[-1] / len(f))}
+
+
+def heatmap(frame_id, values, x_buckets: int = DEFAULT_X_BUCKETS, y_bins: int = DEFAULT_Y_BINS,
+            value_range: Optional[Sequence[float]] = None) -> Dict:
+    """Counts of frames per (frame_id bucket, value bin).
+
+    {"x_edges": x_buckets+1, "y_edges": y_bins+1, "counts": y_bins rows x x_buckets columns}
+    """
+    x = np.asarray(frame_id, dtype=np.float64)
+    v = np.asarray(values, dtype=np.float64)
+    keep = np.isfinite(v)
+    x, v = x[keep], v[keep]
+    if not len(v):
+        return {"x_edges": [], "y_edges": [], "counts": []}
+    lo, hi = _value_range(v, value_range)
+    x0, x1 = float(x.min()), float(x.max())
+    if x1 <= x0:
+        x1 = x0 + 1.0
+    counts, x_edges, y_edges = np.histogram2d(x, np.clip(v, lo, hi), bins=[x_buckets, y_bins],
+                                              range=[[x0, x1], [lo, hi]])
+    return {"x_edges": x_edges.tolist(), "y_edges": y_edges.tolist(), "counts": counts.T.astype(np.int64).tolist()}
+
+
+def aggregate(columns: Dict[str, np.ndarray], kind: str, **params) -> Dict:
+    """Run the AGGREGATIONS entry `kind` on a run's columns (raises KeyError for an unknown kind)."""
+    func, column = AGGREGATIONS[kind]
+    if func == "histogram":
+        result = histogram(columns[column], **params)
+    elif func == "rolling_rate":
+        result = rolling_rate(columns["frame_id"], columns[column], **params)
+    else:
+        result = heatmap(columns["frame_id"], columns[column], **params)
+    result["kind"] = kind
+    result["column"] = column
+    return result
@@ -0,0 +1,57 @@
+// 自動更新（server push）のクライアント側コールバック。simple_dash.py から ClientsideFunction で呼ばれる。
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    live: {
+        // 自動更新 ON の間、live-cursor（ファイル / run_id / 表示済みの点の数）の続きを /live で購読する
+        connect: function (nClicks, cursor) {
+            var dc = window.dash_clientside;
+            if (window._liveSource) {
+                window._liveSource.close();
+                window._liveSource = null;
+            }
+            clearTimeout(window._liveRetry);
+            var on = Boolean(nClicks && nClicks % 2 === 1);
+            if (!on || !cursor || !cursor.path) {
+                return "off";
+            }
+            var count = cursor.count || 0;
+
+            function open() {
+                var params = new URLSearchParams({
+                    path: cursor.path,
+                    run_id: cursor.run_id || "",
+                    after: String(count),
+                });
+                var src = new EventSource("/live?" + params.toString());
+                src.addEventListener("points", function (e) {
+                    var points = JSON.parse(e.data);
+                    count += points.x.length;
+                    dc.set_props("live-points", {data: points});
+                });
+                src.addEventListener("version", function (e) {
+                    window._liveVersion = (window._liveVersion || 0) + 1;
+                    var d = JSON.parse(e.data);
+                    dc.set_props("selected-file-version", {data: {version: window._liveVersion, mtime: d.mtime}});
+                });
+                src.onerror = function () {
+                    // 受信済みの点の続きから繋ぎ直す（EventSource の自動再接続だと after が古いまま）
+                    src.close();
+                    if (window._liveSource === src) {
+                        window._liveRetry = setTimeout(open, 2000);
+                    }
+                };
+                window._liveSource = src;
+            }
+
+            open();
+            return "on";
+        },
+
+        // 新しい点だけを detail-graph のトレース 0 に追加する（図全体は送り直さない）
+        extend: function (points) {
+            if (!points || !points.x || !points.x.length) {
+                return window.dash_clientside.no_update;
+            }
+            return [{x: [points.x], y: [points.y]}, [0]];
+        },
+    },
+});
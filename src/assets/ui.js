@@ -0,0 +1,73 @@
+// 表示だけを切り替えるクライアント側コールバック。simple_dash.py から ClientsideFunction で呼ばれる。
+// サーバへの往復なしにブラウザ内で style を差し替える（データが要る処理はサーバ側のコールバック）。
+(function () {
+    var PANEL = {
+        backgroundColor: "#1a1a1a",
+        border: "1px solid #333",
+        borderRadius: "6px",
+        transition: "all 0.25s ease",
+    };
+
+    // file-list / runid-list の 1 行。選択中の行だけ色を変える
+    function itemStyle(selected) {
+        return {
+            padding: "6px",
+            border: "1px solid #333",
+            marginBottom: "4px",
+            cursor: "pointer",
+            borderRadius: "4px",
+            backgroundColor: selected ? "#2f6eff" : "#181818",
+            color: selected ? "#fff" : "#eee",
+        };
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        ui: {
+            // サイドバーの表示/非表示。ボタンは常に右上に残し、コンテンツのみ畳む
+            toggleSidebar: function (n) {
+                var collapsed = Boolean(n && n % 2 === 1);
+                if (collapsed) {
+                    return [
+                        Object.assign({width: "24px", minWidth: "24px", padding: "8px"}, PANEL),
+                        {display: "none"},
+                        "▶",
+                    ];
+                }
+                return [
+                    Object.assign({width: "19%", minWidth: "180px", padding: "10px"}, PANEL),
+                    {display: "block"},
+                    "≡",
+                ];
+            },
+
+            // 自動更新ボタンの ON/OFF 表示（ストリームの接続/切断は live.connect）
+            toggleAutoRefresh: function (n) {
+                var on = Boolean(n && n % 2 === 1);
+                return [
+                    on ? "自動更新 ON" : "自動更新 OFF",
+                    {
+                        padding: "6px 10px",
+                        border: "1px solid #333",
+                        borderRadius: "4px",
+                        cursor: "pointer",
+                        backgroundColor: on ? "#2f6eff" : "#222",
+                        color: on ? "#fff" : "#eee",
+                    },
+                ];
+            },
+
+            // 選択中のファイル / run_id の行を強調する（一覧を描き直したときも呼ばれる）
+            highlightFiles: function (selected, ids) {
+                return (ids || []).map(function (id) {
+                    return itemStyle(id.path === selected);
+                });
+            },
+
+            highlightRuns: function (selected, ids) {
+                return (ids || []).map(function (id) {
+                    return itemStyle(id.runid === selected);
+                });
+            },
+        },
+    });
+})();
@@ -0,0 +1,120 @@
+"""Timestamp parser micro-benchmark: legacy parse_time vs parse_time_ns / parse_time_ns_array.
+
+Timestamps come from the "time" field of the JSONL logs (--logs), or are
+generated in the log's layout (2025-11-18T21:49:09.836705000) if there are
+none. The legacy parser is kept here verbatim as the reference; its results
+are compared against the fast paths before timing.
+
+usage: python src/bench_parse_time.py [--logs logs] [--count 200000] [--repeat 3]
+"""
+import argparse
+import calendar
+import glob
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+from log_records import NAT_NS, parse_time_ns, parse_time_ns_array
+
+
+def legacy_parse_time(value):
+    """Parse time field to a float timestamp (None on failure). 以前の simple_dash.parse_time そのまま"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        s = value
+        if "T" in s:
+            try:
+                return datetime.fromisoformat(s).timestamp()
+            except ValueError:
+                # truncate fractional seconds to 6 digits if longer
+                try:
+                    if "." in s:
+                        base, frac = s.split(".", 1)
+                        frac_digits = "".join(ch for ch in frac if ch.isdigit())
+                        frac_adj = (frac_digits[:6]).ljust(6, "0")
+                        return datetime.fromisoformat(f"{base}.{frac_adj}").timestamp()
+                except Exception:
+                    return None
+            except Exception:
+                return None
+        try:
+            return float(s)
+        except Exception:
+            return None
+    return None
+
+
+def load_times(log_dir, count):
+    times = []
+    for path in sorted(glob.glob(os.path.join(log_dir, "*.jsonl"))):
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                try:
+                    t = json.loads(line).get("time")
+                except (ValueError, AttributeError):
+                    continue
+                if isinstance(t, str):
+                    times.append(t)
+                if len(times) >= count:
+                    return times
+    if not times:
+        base = calendar.timegm((2025, 11, 18, 21, 49, 9))
+        for i in range(count):
+            sec, frac = divmod(i * 58000, 1_000_000_000)
+            t = datetime.fromtimestamp(base + sec, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+            times.append(f"{t}.{frac:09d}")
+    while len(times) < count:
+        times.extend(times[:count - len(times)])
+    return times
+
+
+def check(times):
+    """The fast paths must agree with the legacy parser (which is local time, microsecond precision)."""
+    offset = None
+    vec = parse_time_ns_array(times)
+    for i, t in enumerate(times):
+        legacy = legacy_parse_time(t)
+        ns = parse_time_ns(t)
+        if legacy is None or ns is None:
+            assert legacy is None and ns is None and vec[i] == NAT_NS, t
+            continue
+        assert vec[i] == ns, (t, vec[i], ns)
+        # legacy は naive をローカル時刻として扱うので、UTC との差（タイムゾーン）を除いて比べる
+        diff = ns / 1e9 - legacy
+        if offset is None:
+            offset = round(diff)
+        assert abs(diff - offset) < 2e-6, (t, ns, legacy)
+
+
+def bench(label, fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return label, best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logs", default="logs")
+    parser.add_argument("--count", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    times = load_times(args.logs, args.count)
+    check(times[:5000])
+    n = len(times)
+    results = [
+        bench("legacy parse_time", lambda: [legacy_parse_time(t) for t in times], args.repeat),
+        bench("parse_time_ns", lambda: [parse_time_ns(t) for t in times], args.repeat),
+        bench("parse_time_ns_array", lambda: parse_time_ns_array(times), args.repeat),
+    ]
+    base = results[0][1]
+    print(f"{n} timestamps (e.g. {times[0]})")
+    for label, sec in results:
+        print(f"{label:22s} {sec * 1e3:9.1f} ms  {sec / n * 1e9:8.0f} ns/ts  x{base / sec:5.1f}")
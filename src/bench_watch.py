@@ -0,0 +1,145 @@
+"""Watch backend benchmark: append-to-callback latency and idle CPU.
+
+Builds the same layout as ./logs (test<N>.log + images/) in a temp directory,
+then for each backend measures
+  - idle CPU: process CPU time / wall time while nothing is written
+  - append latency: write one line to the latest test*.log -> "append" callback
+  - create latency: create a file under images/ -> "create" callback
+
+usage: python src/bench_watch.py [--backends inotify polling] [--samples 50]
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+
+from main import WATCH_BACKENDS, create_observer, schedule_newfile, schedule_tailfile
+
+
+def make_layout(root):
+    """./logs と同じ構成を作る（test0.log / test2.log / images/）"""
+    log_dir = os.path.join(root, "logs")
+    image_dir = os.path.join(log_dir, "images")
+    os.makedirs(image_dir)
+    for name in ("test0.log", "test2.log"):
+        with open(os.path.join(log_dir, name), "w") as f:
+            f.write("start\n")
+    # test2.log を最新にしておく
+    now = time.time()
+    os.utime(os.path.join(log_dir, "test0.log"), (now - 10, now - 10))
+    return log_dir, image_dir
+
+
+def percentile(values, p):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    k = min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))
+    return values[k]
+
+
+def run_backend(backend, samples, idle_seconds, poll_interval, timeout):
+    root = tempfile.mkdtemp(prefix="bench_watch_")
+    log_dir, image_dir = make_layout(root)
+    target = os.path.join(log_dir, "test2.log")
+
+    lock = threading.Lock()
+    waiting = {}  # marker -> Event
+
+    def on_event(kind, path, data):
+        if kind == "create":
+            marker = os.path.basename(path)
+        else:
+            marker = (data or "").strip().split("\n")[-1]
+        with lock:
+            ev = waiting.get(marker)
+        if ev is not None:
+            ev.set()
+
+    def measure(action, marker):
+        ev = threading.Event()
+        with lock:
+            waiting[marker] = ev
+        t0 = time.perf_counter()
+        action()
+        ok = ev.wait(timeout)
+        dt = time.perf_counter() - t0
+        with lock:
+            waiting.pop(marker, None)
+        return dt * 1000.0 if ok else None
+
+    # ハンドラの print を計測から外す
+    sink = io.StringIO()
+    with contextlib.redirect_stdout(sink):
+        observer = create_observer(backend, timeout=poll_interval)
+        schedule_tailfile(observer, log_dir, r"test\d+\.log", on_event)
+        schedule_newfile(observer, image_dir, on_event)
+        observer.start()
+        try:
+            time.sleep(max(poll_interval, 0.2) * 2)  # warm up (polling の初回スナップショット)
+
+            cpu0, wall0 = time.process_time(), time.perf_counter()
+            time.sleep(idle_seconds)
+            idle_cpu = (time.process_time() - cpu0) / (time.perf_counter() - wall0) * 100.0
+
+            append_ms, create_ms, lost = [], [], 0
+            for i in range(samples):
+                marker = f"bench-{i}"
+
+                def append(marker=marker):
+                    with open(target, "a") as f:
+                        f.write(marker + "\n")
+
+                def create(marker=marker):
+                    with open(os.path.join(image_dir, marker), "w") as f:
+                        f.write("x")
+
+                for action, out in ((append, append_ms), (create, create_ms)):
+                    dt = measure(action, marker)
+                    if dt is None:
+                        lost += 1
+                    else:
+                        out.append(dt)
+        finally:
+            observer.stop()
+            observer.join()
+            shutil.rmtree(root, ignore_errors=True)
+
+    return {
+        "backend": type(observer).__name__,
+        "idle_cpu": idle_cpu,
+        "append": append_ms,
+        "create": create_ms,
+        "lost": lost,
+    }
+
+
+def format_ms(values):
+    if not values:
+        return "n/a"
+    return (f"p50={statistics.median(values):8.2f}ms  p95={percentile(values, 95):8.2f}ms  "
+            f"max={max(values):8.2f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", nargs="+", choices=WATCH_BACKENDS, default=["inotify", "polling"])
+    parser.add_argument("--samples", type=int, default=30)
+    parser.add_argument("--idle", type=float, default=3.0, help="idle CPU measurement window (s)")
+    parser.add_argument("--poll-interval", type=float, default=1.0)
+    parser.add_argument("--timeout", type=float, default=5.0, help="max wait per sample (s)")
+    args = parser.parse_args()
+
+    for backend in args.backends:
+        r = run_backend(backend, args.samples, args.idle, args.poll_interval, args.timeout)
+        print(f"[{backend} -> {r['backend']}]")
+        print(f"  idle cpu : {r['idle_cpu']:6.2f}%")
+        print(f"  append   : {format_ms(r['append'])}")
+        print(f"  create   : {format_ms(r['create'])}")
+        if r["lost"]:
+            print(f"  lost     : {r['lost']} events (timeout {args.timeout}s)")
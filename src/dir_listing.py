@@ -0,0 +1,101 @@
+"""Cached directory listing for the dashboards' file-list panels.
+
+list_dir() scans with os.scandir (one stat per matching entry) and returns a
+DirListing with a fingerprint of (name, mtime, size) of every entry. Scans are
+reused for max_age seconds, and a listing with an unchanged fingerprint is
+reused as-is, so sorting and filtering are only redone when something in the
+directory changed. Callbacks compare the fingerprint to what they rendered
+last time and return no_update when nothing changed.
+"""
+import hashlib
+import os
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+DEFAULT_PAGE_SIZE = 200
+
+
+class DirEntry(NamedTuple):
+    name: str
+    path: str
+    mtime_ns: int
+    size: int
+
+
+class DirListing:
+    """Entries of one directory (newest first) and their fingerprint."""
+
+    def __init__(self, path: str, entries: List[DirEntry], fingerprint: str):
+        self.path = path
+        self.entries = entries
+        self.fingerprint = fingerprint
+        self._filtered: Dict[Tuple[str, str], List[DirEntry]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def filtered(self, query: Optional[str] = None, order: str = "mtime") -> List[DirEntry]:
+        """Entries whose name contains query (case-insensitive), newest first or by name."""
+        key = ((query or "").strip().lower(), order)
+        with self._lock:
+            result = self._filtered.get(key)
+            if result is None:
+                result = self.entries
+                if key[0]:
+                    result = [e for e in result if key[0] in e.name.lower()]
+                if order == "name":
+                    result = sorted(result, key=lambda e: e.name)
+                self._filtered[key] = result
+        return result
+
+    def page(self, query: Optional[str] = None, page: int = 0, page_size: int = DEFAULT_PAGE_SIZE,
+             order: str = "mtime") -> Tuple[List[DirEntry], int, int]:
+        """(entries of the page, total matching entries, clamped page number)."""
+        items = self.filtered(query, order)
+        last_page = max((len(items) - 1) // page_size, 0)
+        page = min(max(page or 0, 0), last_page)
+        return items[page * page_size:(page + 1) * page_size], len(items), page
+
+
+_cache: Dict[Tuple[str, str], Tuple[float, DirListing]] = {}
+_cache_lock = threading.Lock()
+
+
+def list_dir(path: str, suffix: str = ".jsonl", max_age: float = 1.0) -> DirListing:
+    """Listing of files in path ending with suffix (raises OSError if it cannot be read)."""
+    path = os.path.abspath(path)
+    key = (path, suffix)
+    now = time.monotonic()
+    with _cache_lock:
+        cached = _cache.get(key)
+    if cached is not None and now - cached[0] < max_age:
+        return cached[1]
+
+    entries = []
+    with os.scandir(path) as it:
+        for entry in it:
+            if not entry.name.endswith(suffix):
+                continue
+            try:
+                if not entry.is_file():
+                    continue
+                st = entry.stat()
+            except OSError:
+                continue
+            entries.append(DirEntry(entry.name, entry.path, st.st_mtime_ns, st.st_size))
+    entries.sort(key=lambda e: (e.mtime_ns, e.name), reverse=True)
+
+    h = hashlib.blake2b(digest_size=8)
+    for e in entries:
+        h.update(f"{e.name}\0{e.mtime_ns}\0{e.size}\n".encode("utf-8", "surrogateescape"))
+    fingerprint = h.hexdigest()
+
+    if cached is not None and cached[1].fingerprint == fingerprint:
+        listing = cached[1]  # 変化なし: フィルタ結果のキャッシュごと使い回す
+    else:
+        listing = DirListing(path, entries, fingerprint)
+    with _cache_lock:
+        _cache[key] = (now, listing)
+    return listing
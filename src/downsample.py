@@ -0,0 +1,72 @@
+"""Server-side downsampling of (x, y) series for the dashboard graphs.
+
+Long runs have far more frames than the graph has pixels. series_for_view()
+cuts the series to the visible x range and, if it is still longer than
+max_points, keeps only the min and max y of each x bucket (min/max per pixel
+column), so spikes stay visible. When the user zooms in far enough, the window
+is small enough to be sent at full resolution.
+"""
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+DEFAULT_MAX_POINTS = 4000
+
+
+def minmax_downsample(x: np.ndarray, y: np.ndarray, n_buckets: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Keep the first/last point and the min and max y of each of n_buckets equal-width x buckets.
+
+    x must be sorted ascending. NaN y values are dropped.
+    """
+    keep = ~np.isnan(y)
+    x, y = x[keep], y[keep]
+    if len(x) <= 2 * n_buckets:
+        return x, y
+    x0, x1 = float(x[0]), float(x[-1])
+    if x1 <= x0:
+        return x[[0, -1]], y[[0, -1]]
+    bucket = ((x - x0) * (n_buckets / (x1 - x0))).astype(np.int64)
+    np.minimum(bucket, n_buckets - 1, out=bucket)
+    # bucket ごとに y で並べ、先頭 = 最小, 末尾 = 最大
+    order = np.lexsort((y, bucket))
+    b_sorted = bucket[order]
+    starts = np.flatnonzero(np.r_[True, b_sorted[1:] != b_sorted[:-1]])
+    ends = np.r_[starts[1:], len(order)] - 1
+    idx = np.unique(np.concatenate((order[starts], order[ends], [0, len(x) - 1])))
+    return x[idx], y[idx]
+
+
+def series_for_view(x: Sequence, y: Sequence, x_range: Optional[Sequence[float]] = None,
+                    max_points: int = DEFAULT_MAX_POINTS) -> Tuple[np.ndarray, np.ndarray, bool]:
+    """(x, y, downsampled) for the visible x_range (None = everything)."""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if len(x) and np.any(x[1:] < x[:-1]):
+        order = np.argsort(x, kind="stable")
+        x, y = x[order], y[order]
+    if x_range is not None:
+        lo = max(int(np.searchsorted(x, x_range[0], side="left")) - 1, 0)
+        hi = int(np.searchsorted(x, x_range[1], side="right")) + 1
+        x, y = x[lo:hi], y[lo:hi]
+    if len(x) <= max_points:
+        return x, y, False
+    x, y = minmax_downsample(x, y, max(max_points // 2, 1))
+    return x, y, True
+
+
+def x_range_from_relayout(relayout: Optional[dict]):
+    """Visible x range from a dcc.Graph relayoutData event.
+
+    Returns [lo, hi], None for autorange/reset, or False if the event does not
+    touch the x axis (e.g. the initial autosize event).
+    """
+    if not relayout:
+        return False
+    if "xaxis.range[0]" in relayout and "xaxis.range[1]" in relayout:
+        return [float(relayout["xaxis.range[0]"]), float(relayout["xaxis.range[1]"])]
+    if "xaxis.range" in relayout:
+        lo, hi = relayout["xaxis.range"]
+        return [float(lo), float(hi)]
+    if relayout.get("xaxis.autorange"):
+        return None
+    return False
@@ -1,30 +1,122 @@
 import dash
-from dash import html, dcc, Input, Output
+from dash import html, dcc, Input, Output, State
 import plotly.graph_objs as go
 import pandas as pd
 import json
 import os
+from dir_listing import list_dir
+from downsample import series_for_view, x_range_from_relayout
+import sidecar
+from shared_cache import cache as shared
+from run_catalog import get_catalog
 
 LOG_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "logs"))
 
-def load_runcodes():
-    """logs 内の jsonl ファイル名一覧を返す（例：test123.jsonl）"""
-    if not os.path.isdir(LOG_DIR):
-        return []
-    return sorted([f for f in os.listdir(LOG_DIR) if f.endswith(".jsonl")])
+RUNCODE_PAGE_SIZE = 200
+RUN_SEARCH_LIMIT = 50
 
-def load_log(path):
-    """JSONL を DataFrame に変換"""
-    rows = []
-    with open(path, "r") as f:
+def load_runcodes(query=None):
+    """logs 内の jsonl ファイル名一覧を返す（例：test123.jsonl）。(fingerprint, 名前一覧, 総数)"""
+    if not os.path.isdir(LOG_DIR):
+        return None, [], 0
+    listing = list_dir(LOG_DIR, ".jsonl")
+    sidecar.compactor.watch(LOG_DIR)  # 終了した run を列形式に変換（バックグラウンド）
+    entries, total, _ = listing.page(query, 0, RUNCODE_PAGE_SIZE, order="name")
+    return listing.fingerprint, [e.name for e in entries], total
+
+# 列ごとの型（ここにない列は object）。run_id / type は category
+LOG_DTYPES = {
+    "frame_id": "int32",
+    "elapsed_ms": "float32",
+    "score": "float32",
+    "defect": "bool",
+    "run_id": "category",
+    "type": "category",
+    "status": "category",
+}
+# 値がない行に入れる値
+LOG_MISSING = {"frame_id": -1, "elapsed_ms": float("nan"), "score": float("nan"), "defect": False}
+LOAD_CHUNK_ROWS = 50000
+
+
+def _needles(value):
+    """行の prefilter 用: 値がそのまま / JSON エスケープされて書かれた場合のバイト列"""
+    return {value.encode("utf-8"), json.dumps(value)[1:-1].encode("utf-8")}
+
+
+def _chunk_frame(rows, columns):
+    data = {}
+    for c in columns:
+        try:
+            data[c] = pd.Series(rows[c], dtype=LOG_DTYPES.get(c, "object"))
+        except (TypeError, ValueError):
+            data[c] = pd.Series(rows[c], dtype="object")  # 型の合わない値が混ざっている列
+    return pd.DataFrame(data)
+
+
+def load_log(path, columns=None, types=None, run_id=None):
+    """JSONL を DataFrame に変換
+
+    columns: 読む列（None なら全部。env / meta のような入れ子も含む）
+    types:   読む type（例: ["frame_result"]）。run_id: その run_id の行だけ
+    行は LOAD_CHUNK_ROWS 行ずつ型付きの列にまとめるので、メモリは選んだ行の分だけ。
+    type / run_id は json.loads の前にバイト列で大まかに絞り込む。
+    """
+    type_set = set(types) if types else None
+    needles = [_needles(t) for t in types] if types else None
+    run_needles = _needles(run_id) if run_id is not None else None
+    chunks = []
+    rows = None
+    n_rows = 0
+    with open(path, "rb") as f:
         for line in f:
+            if run_needles is not None and not any(n in line for n in run_needles):
+                continue
+            if needles is not None and not any(n in line for ns in needles for n in ns):
+                continue
             try:
-                rows.append(json.loads(line))
-            except:
-                pass
-    if rows:
-        return pd.DataFrame(rows)
-    return pd.DataFrame()
+                obj = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(obj, dict):
+                continue
+            if type_set is not None and obj.get("type") not in type_set:
+                continue
+            if run_id is not None and obj.get("run_id") != run_id:
+                continue
+            if columns is None:
+                # 列指定なし: 全部の列（従来どおり）。列は現れた順に増える
+                if rows is None:
+                    rows = {}
+                for c in obj:
+                    if c not in rows:
+                        rows[c] = [LOG_MISSING.get(c)] * n_rows
+                for c, values in rows.items():
+                    v = obj.get(c)
+                    values.append(LOG_MISSING.get(c) if v is None else v)
+            else:
+                if rows is None:
+                    rows = {c: [] for c in columns}
+                for c in columns:
+                    v = obj.get(c)
+                    rows[c].append(LOG_MISSING.get(c) if v is None else v)
+            n_rows += 1
+            if n_rows >= LOAD_CHUNK_ROWS:
+                chunks.append(_chunk_frame(rows, list(rows)))
+                rows = {c: [] for c in rows} if columns is not None else None
+                n_rows = 0
+    if rows and n_rows:
+        chunks.append(_chunk_frame(rows, list(rows)))
+    if not chunks:
+        return pd.DataFrame()
+    if len(chunks) == 1:
+        return chunks[0]
+    df = pd.concat(chunks, ignore_index=True)
+    # category は chunk ごとにカテゴリが違うと object になるので戻す
+    for c in df.columns:
+        if LOG_DTYPES.get(c) == "category" and df[c].dtype != "category":
+            df[c] = df[c].astype("category")
+    return df
 
 def extract_run_ids(df: pd.DataFrame):
     """type == run_end の run_id をユニークに抽出"""
@@ -36,13 +128,24 @@ def extract_run_ids(df: pd.DataFrame):
     ids = run_end_rows.get("run_id", pd.Series(dtype=object)).dropna().unique().tolist()
     return ids
 
+def load_run_ids(path):
+    """run_end のある run_id（ファイル順）。変換済み（sidecar のマニフェストが最新）ならログを読まない"""
+    manifest = sidecar.read_manifest(path)
+    if manifest is not None:
+        return list(manifest["run_times"])
+    return extract_run_ids(load_log(path, columns=["type", "run_id"], types=["run_end"]))
+
 # Dash アプリ作成
 app = dash.Dash(__name__)
+# gunicorn 用（例: gunicorn -w 4 --chdir src glaph_dash:server）。解析結果と図はワーカー間で shared_cache に共有
+server = app.server
 
 app.layout = html.Div(style={"display": "flex"}, children=[
 
     dcc.Store(id="selected-file"),
     dcc.Store(id="selected-run-id"),
+    dcc.Store(id="runcode-key"),
+    dcc.Store(id="catalog-run"),
 
     # --------------------
     # 左側 RunCode / RunID 一覧
@@ -50,10 +153,19 @@ app.layout = html.Div(style={"display": "flex"}, children=[
     html.Div(style={"width": "25%", "padding": "10px", "border-right": "1px solid #ccc"}, children=[
         html.H3("RunCode List"),
         dcc.Interval(id="interval_list", interval=2000, n_intervals=0),
+        dcc.Input(id="runcode-search", type="text", placeholder="search", debounce=True,
+                  style={"width": "90%", "margin-bottom": "5px"}),
         html.Div(id="runcode-list"),
         html.Hr(),
         html.H4("run_id List"),
         html.Div(id="runid-list"),
+        html.Hr(),
+        # 全ファイルの run をカタログ（run_catalog.py）から検索。クリックでファイルと run_id を選択
+        html.H4("Run Search"),
+        dcc.Input(id="run-catalog-search", type="text", placeholder="v0.1 host:dev fft_size:1024", debounce=True,
+                  style={"width": "90%", "margin-bottom": "5px"}),
+        html.Div(id="run-catalog-results"),
+        dcc.Interval(id="run-catalog-poll", interval=1000, disabled=True),  # カタログ更新中だけ取り直す
     ]),
 
     # --------------------
@@ -68,18 +180,24 @@ app.layout = html.Div(style={"display": "flex"}, children=[
     ]),
 ])
 
-# RunCode 一覧更新
+# RunCode 一覧更新（ディレクトリに変化がなければ描き直さない）
 @app.callback(
     Output("runcode-list", "children"),
-    Input("interval_list", "n_intervals")
+    Output("runcode-key", "data"),
+    Input("interval_list", "n_intervals"),
+    Input("runcode-search", "value"),
+    State("runcode-key", "data"),
 )
 
-def update_runcode_list(_):
-    print("[DEBUG] update_runcode_list triggered")
-    print("[DEBUG] LOG_DIR =", LOG_DIR)
-    print("[DEBUG] dir exists =", os.path.isdir(LOG_DIR))
-    files = load_runcodes()
-    return [
+def update_runcode_list(_, query, last_key):
+    try:
+        fingerprint, files, total = load_runcodes(query)
+    except OSError as e:
+        return [html.Div(f"read error: {e}", style={"color": "#888"})], None
+    key = [fingerprint, query or ""]
+    if key == last_key:
+        return dash.no_update, dash.no_update
+    items = [
         html.Div(
             f,
             id={"type": "runcode-item", "index": f},
@@ -92,6 +210,9 @@ def update_runcode_list(_):
             }
         ) for f in files
     ]
+    if total > len(files):
+        items.append(html.Div(f"... {total - len(files)} more (narrow down with search)", style={"color": "#888"}))
+    return items, key
 
 
 @app.callback(
@@ -125,13 +246,21 @@ def select_file(n_clicks):
     Output("runid-list", "children"),
     Output("selected-run-id", "data"),
     Input("selected-file", "data"),
+    State("catalog-run", "data"),
 )
-def update_runid_list(selected_filename):
+def update_runid_list(selected_filename, catalog_run):
     if not selected_filename:
         return [], None
-
-    df = load_log(os.path.join(LOG_DIR, selected_filename))
-    run_ids = extract_run_ids(df)
+    # 検索結果から開いたときはその run_id を選択した状態にする
+    selected = None
+    if catalog_run and catalog_run.get("file") == selected_filename:
+        selected = catalog_run.get("run_id")
+
+    path = os.path.join(LOG_DIR, selected_filename)
+    try:
+        run_ids = shared.for_file("glaph_run_ids", path, "", lambda: load_run_ids(path))
+    except OSError:
+        run_ids = []
     if not run_ids:
         return [html.Div("run_id not found", style={"color": "#888"})], None
 
@@ -147,7 +276,57 @@ def update_runid_list(selected_filename):
                 "cursor": "pointer"
             }
         ) for rid in run_ids
-    ], None
+    ], selected if selected in run_ids else None
+
+
+@app.callback(
+    Output("run-catalog-results", "children"),
+    Output("run-catalog-poll", "disabled"),
+    Input("run-catalog-search", "value"),
+    Input("run-catalog-poll", "n_intervals"),
+)
+def search_catalog(query, _n):
+    # カタログの更新はバックグラウンド。ここでは SQLite を引くだけ
+    if not query or not os.path.isdir(LOG_DIR):
+        return [], True
+    try:
+        catalog = get_catalog(LOG_DIR)
+        building = catalog.refresh_async()
+        rows = catalog.search(query, limit=RUN_SEARCH_LIMIT)
+    except Exception as e:
+        return [html.Div(f"search error: {e}", style={"color": "#888"})], True
+    note = [html.Div("updating catalog...", style={"color": "#888", "font-size": "12px"})] if building else []
+    if not rows:
+        return note or [html.Div("no match", style={"color": "#888"})], not building
+    return note + [
+        html.Div(
+            [html.Div(row["run_id"]),
+             html.Div(f"{row['file']} / {row['model_version'] or '-'} / {row['count'] or 0} frames",
+                      style={"color": "#888", "font-size": "12px"})],
+            id={"type": "catalog-item", "file": row["file"], "runid": row["run_id"]},
+            n_clicks=0,
+            style={
+                "padding": "5px",
+                "border": "1px solid #aaa",
+                "margin-bottom": "5px",
+                "cursor": "pointer"
+            }
+        ) for row in rows
+    ], not building
+
+
+@app.callback(
+    Output("selected-file", "data", allow_duplicate=True),
+    Output("catalog-run", "data"),
+    Input({"type": "catalog-item", "file": dash.dependencies.ALL, "runid": dash.dependencies.ALL}, "n_clicks"),
+    prevent_initial_call=True,
+)
+def open_catalog_item(n_clicks):
+    triggered_id = dash.callback_context.triggered_id
+    if not isinstance(triggered_id, dict) or not n_clicks or all((c is None or c == 0) for c in n_clicks):
+        return dash.no_update, dash.no_update
+    filename, rid = triggered_id.get("file"), triggered_id.get("runid")
+    return filename, {"file": filename, "run_id": rid}
 
 
 @app.callback(
@@ -177,39 +356,70 @@ def select_run_id(n_clicks):
     return rid
 
 
+def empty_fig():
+    fig = go.Figure()
+    fig.update_layout(height=500)
+    return fig
+
+
+def build_graph(selected_filename, selected_run_id, x_range):
+    """run_id の elapsed_ms グラフ（表示範囲 x_range、None なら全体）を dict で返す"""
+    path = os.path.join(LOG_DIR, selected_filename)
+    # 変換済み（終了した run）なら sidecar の列だけを読む。なければ JSONL から
+    columns = sidecar.load_run_columns(path, selected_run_id)
+    if columns is not None:
+        xs, ys = columns["frame_id"], columns["elapsed_ms"]
+    else:
+        # 必要な列・行（この run_id の frame_result）だけを読む
+        df = load_log(path, columns=["frame_id", "elapsed_ms"], types=["frame_result"], run_id=selected_run_id)
+        if df.empty:
+            return empty_fig().to_dict()
+        xs, ys = df["frame_id"], df["elapsed_ms"]
+    if not len(xs):
+        return empty_fig().to_dict()
+
+    x, y, reduced = series_for_view(xs, ys, x_range)
+
+    fig = go.Figure()
+    fig.add_trace(go.Scattergl(x=x, y=y, mode="lines+markers",
+                               name="elapsed_ms (min/max)" if reduced else "elapsed_ms"))
+
+    fig.update_layout(title=f"Graph: {selected_filename} / run_id={selected_run_id}", height=500,
+                      uirevision=f"{selected_filename}|{selected_run_id}")
+    return fig.to_dict()
+
+
 # RunCode クリック時にグラフ更新
 @app.callback(
     Output("main-graph", "figure"),
     Input("selected-file", "data"),
     Input("selected-run-id", "data"),
+    Input("main-graph", "relayoutData"),
 )
-def update_graph(selected_filename, selected_run_id):
-    def empty_fig():
-        fig = go.Figure()
-        fig.update_layout(height=500)
-        return fig
+def update_graph(selected_filename, selected_run_id, relayout):
+    # ズーム操作なら表示範囲だけ取り直す（範囲外は送らない、多すぎる点は min/max で間引く）
+    x_range = None
+    if dash.callback_context.triggered_id == "main-graph":
+        x_range = x_range_from_relayout(relayout)
+        if x_range is False:
+            return dash.no_update
 
     if not selected_filename or not selected_run_id:
         return empty_fig()
 
-    df = load_log(os.path.join(LOG_DIR, selected_filename))
-    if df.empty:
+    # 同じファイル（fingerprint）・run_id・表示範囲の図はワーカー間で共有する
+    path = os.path.join(LOG_DIR, selected_filename)
+    try:
+        return shared.for_file("glaph_graph", path, json.dumps([selected_run_id, x_range]),
+                               lambda: build_graph(selected_filename, selected_run_id, x_range))
+    except OSError:
         return empty_fig()
 
-    # run_id で絞り込み
-    df = df[(df.get("type") == "frame_result") & (df.get("run_id") == selected_run_id)]
-    if df.empty:
-        return empty_fig()
 
-    x = df.get("frame_id", [])
-    y = df.get("elapsed_ms", [])
-
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(x=x, y=y, mode="lines+markers", name="elapsed_ms"))
-
-    fig.update_layout(title=f"Graph: {selected_filename} / run_id={selected_run_id}", height=500)
-
-    return fig
+@app.server.route("/_cache")
+def cache_stats():
+    """このワーカーのキャッシュのヒット/ミス数とサイズ"""
+    return shared.stats()
 
 
 if __name__ == "__main__":
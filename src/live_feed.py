@@ -0,0 +1,71 @@
+"""File change notifications for server-push (SSE) clients of the dashboards.
+
+One watchdog observer is shared by every stream. Each watched file has a
+version counter that is bumped on create/modify; a stream waits on it instead
+of polling the file.
+"""
+import os
+import threading
+from typing import Optional
+
+from watchdog.events import FileSystemEventHandler
+
+from main import create_observer
+
+
+class _ChangeHandler(FileSystemEventHandler):
+    def __init__(self, feed: "LiveFeed"):
+        self.feed = feed
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.feed.bump(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.feed.bump(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.feed.bump(event.src_path)
+            self.feed.bump(event.dest_path)
+
+
+class LiveFeed:
+    def __init__(self, backend: str = "auto"):
+        self.backend = backend
+        self._observer = None
+        self._dirs = set()
+        self._versions = {}
+        self._cond = threading.Condition()
+
+    def watch(self, path: str):
+        """Start watching the directory of path (once per directory)."""
+        log_dir = os.path.dirname(os.path.abspath(path))
+        with self._cond:
+            if self._observer is None:
+                self._observer = create_observer(self.backend)
+                self._observer.daemon = True
+                self._observer.start()
+            if log_dir not in self._dirs:
+                self._observer.schedule(_ChangeHandler(self), path=log_dir, recursive=False)
+                self._dirs.add(log_dir)
+
+    def bump(self, path: str):
+        with self._cond:
+            self._versions[path] = self._versions.get(path, 0) + 1
+            self._cond.notify_all()
+
+    def version(self, path: str) -> int:
+        with self._cond:
+            return self._versions.get(os.path.abspath(path), 0)
+
+    def wait(self, path: str, version: int, timeout: Optional[float] = None) -> int:
+        """Block until path's version differs from version (or timeout); return the current version."""
+        path = os.path.abspath(path)
+        with self._cond:
+            self._cond.wait_for(lambda: self._versions.get(path, 0) != version, timeout)
+            return self._versions.get(path, 0)
+
+
+feed = LiveFeed()
@@ -0,0 +1,284 @@
+"""Process-wide cache of parsed run logs, shared by the dashboard callbacks.
+
+get_log_index(path) returns a LogIndex for the file, keyed by its fingerprint
+(path, inode, size, mtime). If the file only grew since the last call, just
+the new tail is parsed and appended; a different inode, a smaller size or an
+in-place rewrite triggers a full re-parse.
+
+The index also keeps the byte offset of every line, plus line numbers per
+run_id / record type, so a viewer can read one page of lines by seeking
+instead of loading the file, and per-run statistics (run_stats.RunStats)
+that are updated as lines are parsed.
+"""
+import os
+import threading
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Union
+
+from log_records import FrameResult, JsonlDecoder, RunColumns, RunEnd, parse_time
+from run_stats import RunStats
+
+READ_CHUNK = 1024 * 1024
+MAX_CACHE_BYTES = 256 * 1024 * 1024  # キャッシュする LogIndex の合計（nbytes の見積もり）
+RUN_OVERHEAD_BYTES = 4096  # run ごとの dict・env/meta・統計のおおよその大きさ
+MAX_LINE_CHARS = 4000  # ページ表示で 1 行をここで切る
+
+# 行の種類（フィルタ用）。デコードできない行・未知の type は "other"
+LINE_KINDS = ("other", "run_start", "frame_result", "run_end")
+
+
+def run_summary(stats: Optional[RunStats], cols: RunColumns, end_time: Optional[float]) -> dict:
+    """RunStats.summary() plus model_version / end_time (latest run_end) / finished."""
+    return dict((stats or RunStats()).summary(), model_version=cols.env.get("model_version"),
+                end_time=end_time, finished=cols.finished)
+
+
+class LogIndex:
+    """run_id -> line offsets, run_end times and frame series of one JSONL file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.inode = None
+        self.size = 0       # 解析済みのバイト数（行境界）
+        self.file_size = 0  # 最後に見たファイルサイズ
+        self.mtime_ns = None
+        self.decoder = JsonlDecoder()
+        self.run_end_times: Dict[str, Optional[float]] = {}
+        self.stats: Dict[str, RunStats] = {}
+        self._init_lines()
+        self.lock = threading.RLock()
+
+    def _init_lines(self):
+        self.line_offsets = array("q")   # 行番号 -> 行頭のバイト位置
+        self.kind_lines = {k: array("I") for k in LINE_KINDS}  # type -> 行番号
+        self.run_lines: Dict[str, array] = {}                  # run_id -> 行番号
+        self.run_kind_lines: Dict[Tuple[str, str], array] = {}  # (run_id, type) -> 行番号
+        self.frame_lines: Dict[str, array] = {}                # run_id -> frame_result の行番号（frame 列と並行）
+
+    @property
+    def fingerprint(self) -> Tuple:
+        return (self.path, self.inode, self.file_size, self.mtime_ns)
+
+    @property
+    def runs(self) -> Dict[str, RunColumns]:
+        return self.decoder.runs
+
+    @property
+    def nbytes(self) -> int:
+        """Estimated memory held by the index: its typed arrays plus a fixed cost per run."""
+        with self.lock:
+            n = self.line_offsets.itemsize * len(self.line_offsets)
+            for lines in (self.kind_lines, self.run_lines, self.run_kind_lines, self.frame_lines):
+                n += sum(a.itemsize * len(a) for a in lines.values())
+            for cols in self.decoder.runs.values():
+                n += sum(a.itemsize * len(a) for a in (cols.frame_id, cols.elapsed_ms, cols.score, cols.defect))
+            return n + RUN_OVERHEAD_BYTES * len(self.decoder.runs)
+
+    def _reset(self):
+        self.inode = None
+        self.size = 0
+        self.file_size = 0
+        self.mtime_ns = None
+        self.decoder = JsonlDecoder()
+        self.run_end_times = {}
+        self.stats = {}
+        self._init_lines()
+
+    def refresh(self, st: Optional[os.stat_result] = None) -> "LogIndex":
+        """Bring the index up to date with the file on disk."""
+        if st is None:
+            st = os.stat(self.path)
+        with self.lock:
+            inode = (st.st_dev, st.st_ino)
+            if inode == self.inode and st.st_mtime_ns == self.mtime_ns and st.st_size == self.file_size:
+                return self
+            if inode != self.inode or st.st_size < self.file_size or (
+                    st.st_size == self.file_size and st.st_mtime_ns != self.mtime_ns):
+                self._reset()
+                self.inode = inode
+            self._parse_tail()
+            self.file_size = st.st_size
+            self.mtime_ns = st.st_mtime_ns
+        return self
+
+    def _parse_tail(self):
+        """Parse complete lines from self.size to EOF, in bounded chunks."""
+        with open(self.path, "rb") as f:
+            f.seek(self.size)
+            pos = self.size
+            partial = b""
+            while True:
+                data = f.read(READ_CHUNK)
+                if not data:
+                    break
+                buf = partial + data
+                start = 0
+                while True:
+                    nl = buf.find(b"\n", start)
+                    if nl < 0:
+                        break
+                    self._add_line(buf[start:nl + 1], pos + start)
+                    start = nl + 1
+                pos += start
+                partial = buf[start:]
+            # 書きかけの最終行は次回に回す
+            self.size = pos
+
+    def _add_line(self, line: bytes, offset: int):
+        lineno = len(self.line_offsets)
+        self.line_offsets.append(offset)
+        rec = self.decoder.decode_line(line)
+        if rec is None:
+            self.kind_lines["other"].append(lineno)
+            return
+        rid = rec.run_id
+        kind = "frame_result" if isinstance(rec, FrameResult) else "run_end" if isinstance(rec, RunEnd) else "run_start"
+        self.kind_lines[kind].append(lineno)
+        self._lines_of(self.run_lines, rid).append(lineno)
+        self._lines_of(self.run_kind_lines, (rid, kind)).append(lineno)
+        if kind == "frame_result":
+            self._lines_of(self.frame_lines, rid).append(lineno)
+            stats = self.stats.get(rid)
+            if stats is None:
+                stats = self.stats[rid] = RunStats()
+            stats.add(rec.elapsed_ms, rec.score, rec.defect)
+
+        if kind == "run_end":
+            t_val = parse_time(rec.time)
+            prev = self.run_end_times.get(rid)
+            if rid not in self.run_end_times or (t_val is not None and (prev is None or t_val > prev)):
+                self.run_end_times[rid] = t_val
+
+    @staticmethod
+    def _lines_of(table, key) -> array:
+        lines = table.get(key)
+        if lines is None:
+            lines = table[key] = array("I")
+        return lines
+
+    def run_times(self) -> Dict[str, Optional[float]]:
+        """Copy of run_id -> latest run_end time."""
+        with self.lock:
+            return dict(self.run_end_times)
+
+    def _summary(self, rid: str, cols: RunColumns) -> dict:
+        return run_summary(self.stats.get(rid), cols, self.run_end_times.get(rid))
+
+    def run_summary(self, run_id: str) -> Optional[dict]:
+        """RunStats.summary() of run_id plus model_version / end_time / finished (None if unknown)."""
+        with self.lock:
+            cols = self.decoder.runs.get(run_id)
+            return None if cols is None else self._summary(run_id, cols)
+
+    def run_summaries(self) -> Dict[str, dict]:
+        """run_id -> run_summary(run_id), for every run."""
+        with self.lock:
+            return {rid: self._summary(rid, cols) for rid, cols in self.decoder.runs.items()}
+
+    def frame_series(self, run_id: str, start: int = 0) -> Tuple[List[int], List[float]]:
+        """(frame_id, elapsed_ms) lists of run_id, from the start-th frame on."""
+        with self.lock:
+            cols = self.decoder.runs.get(run_id)
+            if cols is None:
+                return [], []
+            return cols.frame_id[start:].tolist(), cols.elapsed_ms[start:].tolist()
+
+
+    # ---- ページ表示 ----
+    def _selection(self, run_id: Optional[str], kind: Optional[str]) -> Union[range, array]:
+        """Line numbers matching run_id / kind (None = any), in file order. Caller holds the lock."""
+        if run_id and kind:
+            return self.run_kind_lines.get((run_id, kind), array("I"))
+        if run_id:
+            return self.run_lines.get(run_id, array("I"))
+        if kind:
+            return self.kind_lines.get(kind, array("I"))
+        return range(len(self.line_offsets))
+
+    def count_lines(self, run_id: Optional[str] = None, kind: Optional[str] = None) -> int:
+        with self.lock:
+            return len(self._selection(run_id, kind))
+
+    def find_frame(self, run_id: str, frame_id: int, kind: Optional[str] = None) -> Optional[int]:
+        """Position of frame_id's line within the (run_id, kind) selection, or None."""
+        with self.lock:
+            cols = self.decoder.runs.get(run_id)
+            if cols is None:
+                return None
+            try:
+                i = cols.frame_id.index(frame_id)
+            except ValueError:
+                return None
+            lineno = self.frame_lines[run_id][i]
+            sel = self._selection(run_id, kind)
+            pos = bisect_left(sel, lineno)
+            return pos if pos < len(sel) and sel[pos] == lineno else None
+
+    def read_page(self, run_id: Optional[str] = None, kind: Optional[str] = None, start: int = 0,
+                  count: int = 200, max_bytes: int = 64 * 1024) -> Tuple[List[str], int]:
+        """Lines [start, start+count) of the selection, read by seeking to their offsets.
+
+        Stops before the first line that would take the page past max_bytes, so
+        only whole lines are returned (fewer than count if the budget ran out);
+        a first line longer than max_bytes on its own is cut and ends in " …".
+        Returns (lines, total number of lines in the selection).
+        """
+        with self.lock:
+            sel = self._selection(run_id, kind)
+            total = len(sel)
+            numbers = list(sel[start:start + count])
+            n_lines = len(self.line_offsets)
+            spans = [(self.line_offsets[n], self.line_offsets[n + 1] if n + 1 < n_lines else self.size)
+                     for n in numbers]
+        lines = []
+        used = 0
+        with open(self.path, "rb") as f:
+            for begin, end in spans:
+                if lines and used + (end - begin) > max_bytes:
+                    break  # 行の途中では切らない（残りは呼び出し側が次のページとして扱う）
+                f.seek(begin)
+                raw = f.read(min(end - begin, max_bytes))
+                used += len(raw)
+                text = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+                if len(raw) < end - begin or len(text) > MAX_LINE_CHARS:
+                    text = text[:MAX_LINE_CHARS] + " …"
+                lines.append(text)
+        return lines, total
+
+
+_cache: "OrderedDict[str, LogIndex]" = OrderedDict()
+_cache_sizes: Dict[str, int] = {}  # path -> 最後に見積もった nbytes
+_cache_bytes = 0
+_cache_lock = threading.Lock()
+
+
+def get_log_index(path: str) -> LogIndex:
+    """Up-to-date LogIndex of path (raises OSError if it cannot be read).
+
+    The cache keeps the most recently used indexes up to MAX_CACHE_BYTES in
+    total; the one just returned is never evicted, even if it alone is larger.
+    """
+    global _cache_bytes
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    with _cache_lock:
+        idx = _cache.get(path)
+        if idx is None:
+            idx = _cache[path] = LogIndex(path)
+        else:
+            _cache.move_to_end(path)
+    idx.refresh(st)
+    size = idx.nbytes
+    with _cache_lock:
+        if _cache.get(path) is idx:
+            _cache_bytes += size - _cache_sizes.get(path, 0)
+            _cache_sizes[path] = size
+            for old in list(_cache):
+                if _cache_bytes <= MAX_CACHE_BYTES:
+                    break
+                if old != path:
+                    del _cache[old]
+                    _cache_bytes -= _cache_sizes.pop(old, 0)
+    return idx
@@ -0,0 +1,344 @@
+"""Incremental decoder for the run JSONL logs.
+
+Each line of a run log is one JSON object with a "type":
+  run_start    : run_id, time, env, meta
+  frame_result : run_id, time, env, frame_id, status, elapsed_ms, defect, score, ...
+  run_end      : run_id, time, env, ...
+
+JsonlDecoder turns appended lines into typed records and appends the
+frame_result values into per-run_id columns (RunColumns). The env dict, which
+is repeated on every line, is interned so all records of a run share one dict.
+"""
+import json
+import math
+import threading
+from array import array
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, NamedTuple, Optional, Union
+
+
+class RunStart(NamedTuple):
+    run_id: str
+    time: Optional[str]
+    env: dict
+    meta: dict
+
+
+class FrameResult(NamedTuple):
+    run_id: str
+    time: Optional[str]
+    env: dict
+    frame_id: int
+    status: Optional[str]
+    elapsed_ms: float
+    score: float
+    defect: bool
+
+
+class RunEnd(NamedTuple):
+    run_id: str
+    time: Optional[str]
+    env: dict
+
+
+Record = Union[RunStart, FrameResult, RunEnd]
+
+
+class RunColumns:
+    """frame_result values of one run_id as typed arrays (one entry per frame)."""
+
+    __slots__ = ("run_id", "env", "meta", "start_time", "end_time",
+                 "frame_id", "elapsed_ms", "score", "defect")
+
+    def __init__(self, run_id: str):
+        self.run_id = run_id
+        self.env = {}
+        self.meta = {}
+        self.start_time = None
+        self.end_time = None
+        self.frame_id = array("q")
+        self.elapsed_ms = array("d")
+        self.score = array("d")
+        self.defect = array("b")
+
+    def __len__(self):
+        return len(self.frame_id)
+
+    @property
+    def finished(self) -> bool:
+        return self.end_time is not None
+
+    def append(self, rec: FrameResult):
+        self.frame_id.append(rec.frame_id)
+        self.elapsed_ms.append(rec.elapsed_ms)
+        self.score.append(rec.score)
+        self.defect.append(1 if rec.defect else 0)
+
+
+NAT_NS = -(2 ** 63)  # 不正値（pandas の NaT と同じ int64 表現）
+_SECOND_CACHE: Dict[str, int] = {}  # "YYYY-MM-DDTHH:MM:SS" -> ns（同じ秒の行が続くので使い回す）
+_SECOND_CACHE_MAX = 65536
+
+
+def _days_from_civil(y, m, d):
+    """Days since 1970-01-01 of a proleptic Gregorian date (H. Hinnant's algorithm)."""
+    y = y - (m <= 2)
+    era = y // 400
+    yoe = y - era * 400
+    doy = (153 * (m + 9 - 12 * (m > 2)) + 2) // 5 + d - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return era * 146097 + doe - 719468
+
+
+def _days_in_month(y: int, m: int) -> int:
+    if m == 2:
+        return 29 if y % 4 == 0 and (y % 100 != 0 or y % 400 == 0) else 28
+    return 30 if m in (4, 6, 9, 11) else 31
+
+
+def _parse_second_ns(head: str) -> Optional[int]:
+    if (len(head) != 19 or head[4] != "-" or head[7] != "-" or head[10] not in "T "
+            or head[13] != ":" or head[16] != ":"):
+        return None
+    digits = head[:4] + head[5:7] + head[8:10] + head[11:13] + head[14:16] + head[17:19]
+    if not (digits.isascii() and digits.isdigit()):
+        return None
+    y, m, d = int(digits[:4]), int(digits[4:6]), int(digits[6:8])
+    h, mi, sec = int(digits[8:10]), int(digits[10:12]), int(digits[12:])
+    if not (1 <= m <= 12 and 1 <= d <= _days_in_month(y, m) and h <= 23 and mi <= 59 and sec <= 60):
+        return None
+    return (_days_from_civil(y, m, d) * 86400 + h * 3600 + mi * 60 + sec) * 1_000_000_000
+
+
+def parse_time_ns(value) -> Optional[int]:
+    """Parse the log's fixed timestamp layout to int nanoseconds since the epoch.
+
+    Layout: "YYYY-MM-DDTHH:MM:SS[.f{1,9}]" (e.g. 2025-11-18T21:49:09.836705000),
+    naive and interpreted as UTC. Returns None for anything else (time zones,
+    other layouts), so callers can fall back to a general parser.
+    """
+    if not isinstance(value, str):
+        return None
+    base = _SECOND_CACHE.get(value[:19])
+    if base is None:
+        base = _parse_second_ns(value[:19])
+        if base is None:
+            return None
+        if len(_SECOND_CACHE) >= _SECOND_CACHE_MAX:
+            _SECOND_CACHE.clear()
+        _SECOND_CACHE[value[:19]] = base
+    n = len(value)
+    if n == 19:
+        return base
+    frac = value[20:]
+    if value[19] != "." or not (frac.isdigit() and frac.isascii()):
+        return None
+    if n == 29:
+        return base + int(frac)
+    if n < 29:
+        return base + int(frac) * 10 ** (29 - n)
+    return base + int(frac[:9])  # 10 桁目以降は切り捨て
+
+
+def parse_time_ns_array(values):
+    """Vectorized parse_time_ns over a column (list / NumPy array / pandas Series) -> int64 ndarray.
+
+    Rows in the fixed layout with a fraction are parsed by pandas.to_datetime;
+    the others (no fraction, "T" replaced by a space, more than 9 fraction
+    digits, anything pandas rejects) go through parse_time_ns one by one. Unparseable rows
+    become NAT_NS (so .view("datetime64[ns]") yields NaT).
+    """
+    import numpy as np
+    import pandas as pd
+
+    arr = np.asarray(values, dtype=object)
+    # pandas は 1 桁の月・全角数字・空の小数部も受け付けるので、形が合うものだけ渡す
+    text = np.array([v if isinstance(v, str) and 21 <= len(v) <= 29 and v[10] == "T" and v[19] == "."
+                     and v.isascii() else None for v in arr], dtype=object)
+    out = np.array(pd.to_datetime(text, format="%Y-%m-%dT%H:%M:%S.%f", utc=True, errors="coerce").asi8,
+                   dtype=np.int64)
+    for i in np.flatnonzero(out == NAT_NS):
+        ns = parse_time_ns(arr[i])
+        if ns is not None:
+            out[i] = ns
+    return out
+
+
+def _iso_timestamp(s: str) -> float:
+    dt = datetime.fromisoformat(s)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)  # parse_time_ns と同じく naive は UTC
+    return dt.timestamp()
+
+
+def parse_time(value):
+    """Parse time field to a float timestamp (None on failure)."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        s = value
+        ns = parse_time_ns(s)
+        if ns is not None:
+            return ns / 1e9
+        if "T" in s:
+            try:
+                return _iso_timestamp(s)
+            except ValueError:
+                # truncate fractional seconds to 6 digits if longer
+                try:
+                    if "." in s:
+                        base, frac = s.split(".", 1)
+                        frac_digits = "".join(ch for ch in frac if ch.isdigit())
+                        frac_adj = (frac_digits[:6]).ljust(6, "0")
+                        return _iso_timestamp(f"{base}.{frac_adj}")
+                except Exception:
+                    return None
+            except Exception:
+                return None
+        try:
+            return float(s)
+        except Exception:
+            return None
+    return None
+
+
+def _float(value) -> float:
+    if value is None:
+        return math.nan
+    return float(value)
+
+
+class JsonlDecoder:
+    """Feed JSONL text (complete lines) and collect RunColumns per run_id.
+
+    counts["malformed"] counts lines that are not valid JSON objects or lack
+    type/run_id or have badly typed fields; counts["other"] counts valid
+    objects of an unknown type. Neither raises.
+    """
+
+    def __init__(self):
+        self.runs: Dict[str, RunColumns] = {}
+        self.counts = {"lines": 0, "run_start": 0, "frame_result": 0, "run_end": 0, "other": 0, "malformed": 0}
+        self._envs = {}
+
+    def intern_env(self, env) -> dict:
+        """Return one shared dict per distinct env content."""
+        if not isinstance(env, dict):
+            return {}
+        try:
+            key = tuple(sorted(env.items()))
+            hash(key)
+        except TypeError:
+            key = json.dumps(env, sort_keys=True)
+        shared = self._envs.get(key)
+        if shared is None:
+            shared = self._envs[key] = env
+        return shared
+
+    def run(self, run_id: str) -> RunColumns:
+        cols = self.runs.get(run_id)
+        if cols is None:
+            cols = self.runs[run_id] = RunColumns(run_id)
+        return cols
+
+    def decode_line(self, line: Union[str, bytes]) -> Optional[Record]:
+        """Decode one line and update the columns. Returns None for blank/skipped lines."""
+        if not line.strip():
+            return None
+        self.counts["lines"] += 1
+        try:
+            obj = json.loads(line)
+        except ValueError:
+            self.counts["malformed"] += 1
+            return None
+        if not isinstance(obj, dict):
+            self.counts["malformed"] += 1
+            return None
+        kind = obj.get("type")
+        run_id = obj.get("run_id")
+        if kind not in ("run_start", "frame_result", "run_end"):
+            self.counts["other" if kind is not None and run_id is not None else "malformed"] += 1
+            return None
+        if run_id is None:
+            self.counts["malformed"] += 1
+            return None
+
+        env = self.intern_env(obj.get("env"))
+        t = obj.get("time")
+        cols = self.run(run_id)
+        if env and not cols.env:
+            cols.env = env
+        try:
+            if kind == "frame_result":
+                rec = FrameResult(run_id, t, env, int(obj.get("frame_id", -1)), obj.get("status"),
+                                  _float(obj.get("elapsed_ms")), _float(obj.get("score")),
+                                  bool(obj.get("defect", False)))
+                cols.append(rec)
+            elif kind == "run_start":
+                meta = obj.get("meta")
+                rec = RunStart(run_id, t, env, meta if isinstance(meta, dict) else {})
+                cols.meta = rec.meta
+                cols.start_time = t
+            else:
+                rec = RunEnd(run_id, t, env)
+                cols.end_time = t
+        except (TypeError, ValueError):
+            self.counts["malformed"] += 1
+            return None
+        self.counts[kind] += 1
+        return rec
+
+    def feed(self, text: Union[str, bytes]) -> List[Record]:
+        """Decode every line of text (which should end on a line boundary)."""
+        records = []
+        for line in text.splitlines():
+            rec = self.decode_line(line)
+            if rec is not None:
+                records.append(rec)
+        return records
+
+
+class DecodingCallback:
+    """Watcher callback adapter: (kind, path, text) -> callback(kind, path, records).
+
+    Pass an instance to schedule_tailfile / schedule_multitail. "create" events
+    (data None) are forwarded with records None. Each file gets its own
+    decoder (decoders[path]), so runs with the same run_id in different files
+    are kept apart; multi-file tailing calls back from several threads, so
+    feeding is locked per file.
+    """
+
+    def __init__(self, callback: Optional[Callable[[str, str, Optional[List[Record]]], None]] = None):
+        self.callback = callback
+        self.decoders: Dict[str, JsonlDecoder] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self.lock = threading.Lock()
+
+    @property
+    def counts(self) -> Dict[str, int]:
+        """counts of every file's decoder, summed."""
+        with self.lock:
+            decoders = list(self.decoders.values())
+        total = dict.fromkeys(JsonlDecoder().counts, 0)
+        for decoder in decoders:
+            for key, n in decoder.counts.items():
+                total[key] += n
+        return total
+
+    def feed(self, path: str, data: str) -> List[Record]:
+        """Decode complete lines of path with that file's decoder."""
+        with self.lock:
+            decoder = self.decoders.get(path)
+            if decoder is None:
+                decoder = self.decoders[path] = JsonlDecoder()
+                self._locks[path] = threading.Lock()
+            lock = self._locks[path]
+        with lock:
+            return decoder.feed(data)
+
+    def __call__(self, kind: str, path: str, data: Optional[str]):
+        records = None if data is None else self.feed(path, data)
+        if self.callback and (records is None or records):
+            self.callback(kind, path, records)
@@ -1,100 +1,736 @@
 from watchdog.observers.polling import PollingObserver
 from watchdog.events import FileSystemEventHandler
-from typing import Callable, Optional
+from log_records import DecodingCallback
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, List, NamedTuple, Optional, Tuple
+import argparse
+import asyncio
+import heapq
+import json
+import sys
+import tempfile
+import threading
 import time
 import os
 import re
 
-def find_latest_log(log_dir,fileRegX):
-    """Find newest test*.log (numbers only)."""
-    latest_path = None
-    latest_mtime = -1
-    for name in os.listdir(log_dir):
-        if not re.fullmatch(fileRegX, name):
-            continue
-        path = os.path.join(log_dir, name)
+WATCH_BACKENDS = ("auto", "inotify", "polling")
+MARK_BYTES = 64  # FileTail が書き直しの検出に覚えておく、読み込み位置の直前のバイト数
+
+def create_observer(backend: str = "auto", timeout: float = 1.0):
+    """Create a watchdog observer.
+
+    backend:
+      "inotify" -> native inotify (Linux only). Events arrive as soon as the kernel reports them.
+      "polling" -> PollingObserver, stats the directory every `timeout` seconds.
+      "auto"    -> inotify on Linux, polling otherwise (or if inotify is unavailable).
+    """
+    if backend not in WATCH_BACKENDS:
+        raise ValueError(f"unknown watch backend: {backend!r} (choose from {WATCH_BACKENDS})")
+
+    if backend in ("auto", "inotify"):
+        if sys.platform.startswith("linux"):
+            try:
+                from watchdog.observers.inotify import InotifyObserver
+                return InotifyObserver(timeout=timeout)
+            except (ImportError, OSError) as e:
+                if backend == "inotify":
+                    raise
+                print(f"[WATCH] inotify unavailable ({e}), falling back to polling")
+        elif backend == "inotify":
+            raise OSError(f"inotify backend is not available on {sys.platform}")
+
+    return PollingObserver(timeout=timeout)
+
+class LatestFileIndex:
+    """In-memory index of files in log_dir matching fileRegX, ordered by mtime.
+
+    The directory is listed only in rescan() (startup). After that the index is
+    kept up to date from create/modify/delete/move events, so picking the newest
+    file does not touch the directory at all.
+    Heap with lazy invalidation: update() is O(log n), latest() amortized O(log n).
+    """
+
+    def __init__(self, log_dir, fileRegX):
+        self.log_dir = log_dir
+        self.pattern = re.compile(fileRegX)
+        self._mtimes = {}  # path -> mtime_ns (現在値)
+        self._heap = []    # (-mtime_ns, path) 古いエントリは latest() で読み捨てる
+
+    def __len__(self):
+        return len(self._mtimes)
+
+    def __contains__(self, path):
+        return path in self._mtimes
+
+    def matches(self, path) -> bool:
+        return (os.path.dirname(path) == self.log_dir
+                and self.pattern.fullmatch(os.path.basename(path)) is not None)
+
+    def rescan(self):
+        """Full directory scan (startup only)."""
+        self._mtimes.clear()
+        self._heap = []
+        try:
+            with os.scandir(self.log_dir) as it:
+                for entry in it:
+                    if not self.pattern.fullmatch(entry.name):
+                        continue
+                    try:
+                        if not entry.is_file():
+                            continue
+                        self._mtimes[entry.path] = entry.stat().st_mtime_ns
+                    except OSError:
+                        continue
+        except OSError as e:
+            print(f"[TAIL] Failed to scan {self.log_dir}: {e}")
+        self._heap = [(-m, p) for p, m in self._mtimes.items()]
+        heapq.heapify(self._heap)
+
+    def update(self, path, mtime_ns: Optional[int] = None) -> bool:
+        """Record a create/modify of path. Returns False if path is not indexed."""
+        if not self.matches(path):
+            return False
+        if mtime_ns is None:
+            try:
+                mtime_ns = os.stat(path).st_mtime_ns
+            except OSError:
+                self.remove(path)
+                return False
+        if self._mtimes.get(path) == mtime_ns:
+            return True
+        self._mtimes[path] = mtime_ns
+        heapq.heappush(self._heap, (-mtime_ns, path))
+        if len(self._heap) > 2 * len(self._mtimes) + 64:
+            self._compact()
+        return True
+
+    def __iter__(self):
+        return iter(list(self._mtimes))
+
+    def mtime(self, path) -> Optional[int]:
+        return self._mtimes.get(path)
+
+    def newest(self, n: int) -> List[str]:
+        """The n newest paths, newest first (O(len) - not for the per-event path)."""
+        return [p for p, _ in heapq.nlargest(n, self._mtimes.items(), key=lambda kv: kv[1])]
+
+    def remove(self, path):
+        # heap 側は latest() で遅延削除
+        self._mtimes.pop(path, None)
+
+    def move(self, src_path, dest_path):
+        self.remove(src_path)
+        self.update(dest_path)
+
+    def latest(self) -> Optional[str]:
+        heap = self._heap
+        while heap:
+            neg_mtime, path = heap[0]
+            if self._mtimes.get(path) == -neg_mtime:
+                return path
+            heapq.heappop(heap)
+        return None
+
+    def _compact(self):
+        self._heap = [(-m, p) for p, m in self._mtimes.items()]
+        heapq.heapify(self._heap)
+
+
+class FileTail:
+    """Persistent, binary, line-framed tail of one file.
+
+    The file stays open between reads. Bytes are read in chunks of at most
+    chunk_size and only complete lines are delivered; a trailing partial line
+    (possibly ending mid UTF-8 character) is carried over to the next read.
+    Rotation is detected by inode (st_dev, st_ino) and truncation by size, or,
+    when the file was truncated and has already grown past our position again,
+    by the last few bytes before the read position no longer matching.
+    """
+
+    def __init__(self, path, offset: int = 0, chunk_size: int = 64 * 1024, align: bool = False):
+        self.path = path
+        self.chunk_size = chunk_size
+        self._f = None
+        self._inode = None
+        self._pos = 0        # ファイル上の読み込み位置
+        self._partial = b""  # 改行までたどり着いていない残り
+        self._skip_line = False
+        self._mark = b""     # 読み込み位置の直前のバイト（書き直しの検出用）
+        self._open(offset)
+        if align and self._pos > 0 and self._f is not None:
+            # offset が行の途中なら次の行頭まで読み捨てる
+            self._f.seek(self._pos - 1)
+            self._skip_line = self._f.read(1) != b"\n"
+
+    @property
+    def offset(self) -> int:
+        """Byte offset just after the last complete line delivered."""
+        return self._pos - len(self._partial)
+
+    @property
+    def inode(self):
+        return self._inode
+
+    def close(self):
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+    def _open(self, offset):
+        self.close()
+        self._partial = b""
+        self._skip_line = False
         try:
-            mtime = os.path.getmtime(path)
+            self._f = open(self.path, "rb")
+        except OSError as e:
+            print(f"[TAIL] Failed to open {self.path}: {e}")
+            self._inode = None
+            self._pos = 0
+            return
+        st = os.fstat(self._f.fileno())
+        self._inode = (st.st_dev, st.st_ino)
+        self._pos = min(max(offset, 0), st.st_size)
+        self._mark = b""
+        if self._pos > 0:
+            self._f.seek(max(self._pos - MARK_BYTES, 0))
+            self._mark = self._f.read(self._pos - self._f.tell())
+        self._f.seek(self._pos)
+
+    def _check_file(self) -> Optional[str]:
+        """Return "rotated", "truncated" or None (same file, same or larger size)."""
+        try:
+            st = os.stat(self.path)
         except OSError:
-            continue
-        if mtime > latest_mtime:
-            latest_path = path
-            latest_mtime = mtime
-    return latest_path
+            return None  # 消えた場合は開いている fd から読めるだけ読む
+        if self._f is None or (st.st_dev, st.st_ino) != self._inode:
+            return "rotated"
+        if st.st_size < self._pos:
+            return "truncated"
+        if self._mark:
+            # 切り詰め後に元の位置より長く書き直されていても、読み込み位置の直前が変わる
+            self._f.seek(self._pos - len(self._mark))
+            same = self._f.read(len(self._mark)) == self._mark
+            self._f.seek(self._pos)
+            if not same:
+                return "truncated"
+        return None
+
+    def _read_chunks(self, final=False):
+        """Read to EOF in bounded chunks, yielding text made of complete lines."""
+        if self._f is None:
+            return
+        while True:
+            data = self._f.read(self.chunk_size)
+            if not data:
+                break
+            self._pos += len(data)
+            self._mark = (self._mark + data)[-MARK_BYTES:]
+            buf = self._partial + data
+            if self._skip_line:
+                nl = buf.find(b"\n")
+                if nl < 0:
+                    self._partial = b""
+                    continue
+                buf = buf[nl + 1:]
+                self._skip_line = False
+            cut = buf.rfind(b"\n") + 1
+            self._partial = buf[cut:]
+            if cut:
+                yield buf[:cut].decode("utf-8", errors="replace")
+        if final and self._partial:
+            # ローテートされた旧ファイルの末尾（改行なし）
+            rest, self._partial = self._partial, b""
+            yield rest.decode("utf-8", errors="replace")
+
+    def read_available(self):
+        """Yield newly appended complete lines as text blocks (each <= ~chunk_size)."""
+        state = self._check_file()
+        if state == "rotated":
+            # 旧ファイルの残りを読み切ってから新しいファイルを先頭から読む
+            yield from self._read_chunks(final=True)
+            print(f"[TAIL] {self.path} rotated; reopening")
+            self._open(0)
+        elif state == "truncated":
+            print(f"[TAIL] {self.path} truncated; reading from start")
+            self._f.seek(0)
+            self._pos = 0
+            self._partial = b""
+            self._skip_line = False
+            self._mark = b""
+        yield from self._read_chunks()
+
+
+class CheckpointStore:
+    """Per-file tail offsets kept in a small JSON state file.
+
+    {"<path>": {"inode": [st_dev, st_ino], "offset": N}, ...}
+    offset is the byte position just after the last line handed to the
+    callback, so a restart resumes there (lines are delivered at least once).
+    A matching file with no entry that was modified after the state file was
+    last written appeared while we were down; is_new() tells the handlers to
+    read it from the start.
+    The file is rewritten atomically (temp file + os.replace) by a background
+    thread at most once per `interval` seconds, and on flush()/close().
+    """
+
+    def __init__(self, state_path: str, interval: float = 1.0):
+        self.state_path = os.path.abspath(state_path)
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._entries = {}
+        self.saved_at = None  # 前回 state を書いた時刻 (mtime_ns)。初回起動なら None
+        try:
+            with open(self.state_path, "r") as f:
+                self.saved_at = os.fstat(f.fileno()).st_mtime_ns
+                self._entries = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"[CKPT] Ignoring unreadable state file {self.state_path}: {e}")
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="CheckpointStore", daemon=True)
+        self._thread.start()
+
+    def get(self, path, inode) -> Optional[int]:
+        """Saved offset for path, or None if unknown or the inode changed (rotated)."""
+        with self._lock:
+            entry = self._entries.get(path)
+        if not entry or inode is None or tuple(entry.get("inode", ())) != tuple(inode):
+            return None
+        return entry.get("offset")
+
+    def is_new(self, path, st) -> bool:
+        """True if path (stat st) has no valid entry and was written after the last save."""
+        if self.saved_at is None or st.st_mtime_ns <= self.saved_at:
+            return False
+        return self.get(path, (st.st_dev, st.st_ino)) is None
+
+    def set(self, path, inode, offset: int):
+        if inode is None:
+            return
+        entry = {"inode": list(inode), "offset": offset}
+        with self._lock:
+            if self._entries.get(path) != entry:
+                self._entries[path] = entry
+                self._dirty = True
+
+    def remove(self, path):
+        with self._lock:
+            if self._entries.pop(path, None) is not None:
+                self._dirty = True
+
+    def flush(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            data = json.dumps(self._entries, ensure_ascii=False, sort_keys=True)
+            self._dirty = False
+        state_dir = os.path.dirname(self.state_path)
+        try:
+            fd, tmp = tempfile.mkstemp(prefix=".ckpt_", dir=state_dir)
+            with os.fdopen(fd, "w") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.state_path)
+        except OSError as e:
+            print(f"[CKPT] Failed to write {self.state_path}: {e}")
+            with self._lock:
+                self._dirty = True
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+
+def open_tail(path, checkpoints: Optional[CheckpointStore], default_offset: int, **kwargs) -> "FileTail":
+    """FileTail resuming from the checkpoint of path if it is still the same file."""
+    if checkpoints is not None:
+        try:
+            st = os.stat(path)
+        except OSError:
+            st = None
+        if st is not None:
+            offset = checkpoints.get(path, (st.st_dev, st.st_ino))
+            if offset is not None and offset <= st.st_size:
+                kwargs.pop("align", None)
+                return FileTail(path, offset=offset, **kwargs)
+    return FileTail(path, offset=default_offset, **kwargs)
+
 
 class TailHandler(FileSystemEventHandler):
-    def __init__(self, log_dir,fileRegX, callback: Optional[Callable[[str, str, Optional[str]], None]] = None):
+    """Tail the newest file in log_dir matching fileRegX.
+
+    When a newer file appears the handler switches to it and delivers its
+    existing contents (the backlog) as a series of "switch" callbacks, each at
+    most ~chunk_size bytes of complete lines:
+      skip_backlog=True -> start the new file at its end, deliver nothing
+      max_backlog=N     -> deliver at most the last N bytes (from the next line start)
+    With checkpoints, a file that has a saved offset (same inode) is resumed
+    from it instead, both at startup and on switch. At startup every older
+    checkpointed file is first read up to EOF, and files created while we were
+    down are delivered from the start like a switch (backlog limits apply).
+    """
+
+    def __init__(self, log_dir,fileRegX, callback: Optional[Callable[[str, str, Optional[str]], None]] = None,
+                 skip_backlog: bool = False, max_backlog: Optional[int] = None, chunk_size: int = 64 * 1024,
+                 verbose: bool = True, checkpoints: Optional[CheckpointStore] = None):
         self.log_dir = log_dir
         self.fileRegX= fileRegX
         self.callback = callback
-        self.watch_file = find_latest_log(self.log_dir,self.fileRegX)
-        self.last_size = os.path.getsize(self.watch_file) if self.watch_file and os.path.exists(self.watch_file) else 0
+        self.skip_backlog = skip_backlog
+        self.max_backlog = max_backlog
+        self.chunk_size = chunk_size
+        self.verbose = verbose
+        self.checkpoints = checkpoints
+        self.index = LatestFileIndex(self.log_dir, self.fileRegX)
+        self.index.rescan()
+        self.watch_file = self.index.latest()
+        self.tail = None
         if self.watch_file:
-            print(f"[TAIL] Now watching latest log: {self.watch_file}")
+            if checkpoints is not None:
+                # 停止中に書かれた分: 最新以外のファイルも古い順に読み切る
+                for path in sorted(self.index, key=lambda p: self.index.mtime(p) or 0):
+                    if path == self.watch_file:
+                        continue
+                    resumed = self._resume_tail(path)
+                    if resumed is not None:
+                        tail, kind = resumed
+                        self._deliver(kind, tail)
+                        tail.close()
+            # チェックポイントがあればそこから、なければ起動時点の末尾から追う
+            self.tail, kind = self._resume_tail(self.watch_file, at_end=True)
+            print(f"[TAIL] Now watching latest log: {self.watch_file} (offset {self.tail.offset})")
+            self._deliver(kind)
         else:
             print("[TAIL] No test*.log found yet.")
 
+    def _resume_tail(self, path, at_end: bool = False) -> Optional[Tuple["FileTail", str]]:
+        """Startup tail for path and the kind to deliver its unread lines as.
+
+        Checkpointed files resume from their offset ("append"), files created
+        while we were down start at the backlog start ("switch"). Anything else
+        starts at its end if at_end, otherwise None (nothing to catch up on).
+        """
+        try:
+            st = os.stat(path)
+        except OSError:
+            st = None
+        if self.checkpoints is not None and st is not None:
+            offset = self.checkpoints.get(path, (st.st_dev, st.st_ino))
+            if offset is not None and offset <= st.st_size:
+                return FileTail(path, offset=offset, chunk_size=self.chunk_size), "append"
+            if self.checkpoints.is_new(path, st):
+                tail = FileTail(path, offset=self._backlog_start(path), chunk_size=self.chunk_size, align=True)
+                return tail, "switch"
+        if not at_end:
+            return None
+        return FileTail(path, offset=st.st_size if st is not None else 0, chunk_size=self.chunk_size), "append"
+
+    def _deliver(self, kind, tail: Optional["FileTail"] = None) -> Tuple[int, int]:
+        """Read everything new from tail (default self.tail), pass it to the callback, checkpoint the offset."""
+        tail = tail or self.tail
+        sent = chunks = 0
+        try:
+            for data in tail.read_available():
+                sent += len(data)
+                chunks += 1
+                if self.verbose and kind == "append":
+                    print("[APPEND]", data.strip())
+                if self.callback:
+                    self.callback(kind, tail.path, data)
+                if self.checkpoints is not None:
+                    self.checkpoints.set(tail.path, tail.inode, tail.offset)
+        except Exception as e:
+            print(f"[TAIL] Error reading {tail.path}: {e}")
+        return sent, chunks
+
+    def _backlog_start(self, path) -> int:
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return 0
+        if self.skip_backlog:
+            return size
+        if self.max_backlog is not None and size > self.max_backlog:
+            return size - self.max_backlog
+        return 0
+
     def update_target(self):
-        latest = find_latest_log(self.log_dir,self.fileRegX)
+        latest = self.index.latest()
         if latest and latest != self.watch_file:
             self.watch_file = latest
             print(f"[TAIL] Switched to latest log: {latest}")
-            # 新しいファイルに切り替わったら中身を先頭から読む
-            try:
-                with open(self.watch_file, "r") as f:
-                    data = f.read()
-                if data:
-                    print("[SWITCH]", data.strip())
-                    if self.callback:
-                        self.callback("switch", self.watch_file, data)
-            except Exception as e:
-                print(f"[TAIL] Error reading {self.watch_file}: {e}")
-
-            self.last_size = os.path.getsize(latest) if os.path.exists(latest) else 0
+            if self.tail is not None:
+                self.tail.close()
+            # 新しいファイルに切り替わったら既存分をチャンク単位で流す（全体を一度にメモリへ載せない）
+            start = self._backlog_start(latest)
+            self.tail = open_tail(latest, self.checkpoints, start, chunk_size=self.chunk_size, align=True)
+            start = self.tail.offset
+            sent, chunks = self._deliver("switch")
+            if chunks and self.verbose:
+                skipped = f", skipped first {start} bytes" if start else ""
+                print(f"[SWITCH] {self.watch_file}: {sent} chars in {chunks} chunks{skipped}")
 
     def on_created(self, event):
         if event.is_directory:
             return
+        if self.index.update(event.src_path):
+            self.update_target()
+
+    def on_deleted(self, event):
+        if event.is_directory:
+            return
+        if event.src_path in self.index:
+            self.index.remove(event.src_path)
+            if self.checkpoints is not None:
+                self.checkpoints.remove(event.src_path)
+            self.update_target()
+
+    def on_moved(self, event):
+        if event.is_directory:
+            return
+        self.index.move(event.src_path, event.dest_path)
         self.update_target()
 
     def on_modified(self, event):
         if event.is_directory:
             return
+        if not self.index.update(event.src_path):
+            return
         self.update_target()
         if not self.watch_file or event.src_path != self.watch_file:
             return  # 最新の test*.log のみ
 
+        # 追加分だけ読む（完結した行のみ）
+        self._deliver("append")
+
+class MultiTailHandler(FileSystemEventHandler):
+    """Tail every file in log_dir matching fileRegX at once (or only the max_files newest).
+
+    Each file has its own FileTail (own descriptor and offset). Reads run on a
+    shared thread pool, so a slow or huge file does not hold up the others;
+    at most one read per file is in flight, and events that arrive meanwhile
+    are coalesced into one more read. The callback is therefore invoked from
+    pool threads (in order per file) and must be thread safe.
+    With checkpoints, every file with a saved offset resumes from it and
+    files created while we were down are read from the start, including
+    those outside the max_files newest (caught up once, then parked).
+    """
+
+    def __init__(self, log_dir, fileRegX, callback: Optional[Callable[[str, str, Optional[str]], None]] = None,
+                 max_files: Optional[int] = None, executor: Optional[ThreadPoolExecutor] = None, workers: int = 4,
+                 chunk_size: int = 64 * 1024, verbose: bool = True, checkpoints: Optional[CheckpointStore] = None):
+        self.log_dir = log_dir
+        self.fileRegX = fileRegX
+        self.callback = callback
+        self.max_files = max_files
+        self.chunk_size = chunk_size
+        self.verbose = verbose
+        self.checkpoints = checkpoints
+        self.executor = executor or ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tail")
+        self.index = LatestFileIndex(self.log_dir, self.fileRegX)
+        self.index.rescan()
+        self.tails = {}     # path -> FileTail
+        self._parked = {}   # 対象外になったファイルの (inode, offset)。再び対象になったら続きから読む
+        self._running = set()
+        self._rerun = set()
+        self._lock = threading.Lock()
+        # 起動時点のファイルは末尾（チェックポイントがあればそこ）から追う。対象外のファイルは
+        # 停止中の追記分を読んでから位置を覚えておき、あとで対象に入ったときはそこから読む
+        wanted = self._wanted()
+        for path in wanted:
+            self._add(path, from_start=False)
+        if self.max_files is not None:
+            wanted = set(wanted)
+            for path in self.index:
+                if path in wanted:
+                    continue
+                self._catch_up(path)
+        # チェックポイントから再開したファイルの未読分を読む
+        for path in list(self.tails):
+            self._schedule(path)
+        print(f"[TAIL] Now watching {len(self.tails)} logs in {self.log_dir}")
+
+    def _wanted(self):
+        if self.max_files is None:
+            return list(self.index)
+        return self.index.newest(self.max_files)
+
+    def _catch_up(self, path):
+        """Park a file outside the N newest, first reading what was written to it while we were down."""
         try:
-            new_size = os.path.getsize(self.watch_file)
-        except OSError as e:
-            print(f"[TAIL] Failed to stat {self.watch_file}: {e}")
+            st = os.stat(path)
+        except OSError:
             return
-
-        if new_size < self.last_size:
-            # File truncated or rotated; start from beginning
-            self.last_size = 0
-        if new_size > self.last_size:
-            # 追加分だけ読む
+        inode = (st.st_dev, st.st_ino)
+        offset = st.st_size
+        if self.checkpoints is not None:
+            saved = self.checkpoints.get(path, inode)
+            if saved is not None and saved <= st.st_size:
+                offset = saved
+            elif self.checkpoints.is_new(path, st):
+                offset = 0
+        if offset < st.st_size:
+            tail = FileTail(path, offset=offset, chunk_size=self.chunk_size)
             try:
-                with open(self.watch_file, "r") as f:
-                    f.seek(self.last_size)
-                    added = f.read()
-                print("[APPEND]", added.strip())
-                if self.callback and added:
-                    self.callback("append", self.watch_file, added)
+                for data in tail.read_available():
+                    if self.verbose:
+                        print("[APPEND]", path, data.strip())
+                    if self.callback:
+                        self.callback("append", path, data)
+                    self.checkpoints.set(path, tail.inode, tail.offset)
             except Exception as e:
-                print(f"[TAIL] Error reading {self.watch_file}: {e}")
+                print(f"[TAIL] Error reading {path}: {e}")
+            finally:
+                tail.close()
+            inode, offset = tail.inode or inode, tail.offset
+        self._parked[path] = (inode, offset)
+
+    def _add(self, path, from_start: bool):
+        parked = self._parked.pop(path, None)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        if not from_start and self.checkpoints is not None and self.checkpoints.is_new(path, st):
+            from_start = True  # 停止中にできたファイル
+        if parked and parked[0] == (st.st_dev, st.st_ino):
+            offset = parked[1]
+        else:
+            offset = 0 if from_start else st.st_size
+        tail = open_tail(path, self.checkpoints, offset, chunk_size=self.chunk_size)
+        offset = tail.offset
+        with self._lock:
+            self.tails[path] = tail
+        if self.verbose:
+            print(f"[TAIL] + {path} (offset {offset})")
+
+    def _remove(self, path, park: bool):
+        with self._lock:
+            tail = self.tails.pop(path, None)
+            if tail is None:
+                return
+            if park and tail.inode is not None:
+                self._parked[path] = (tail.inode, tail.offset)
+            if path not in self._running:
+                tail.close()  # 読み込み中ならワーカー側で閉じる
+        if self.verbose:
+            print(f"[TAIL] - {path}")
+
+    def _evict_oldest(self):
+        while self.max_files is not None and len(self.tails) > self.max_files:
+            oldest = min(self.tails, key=lambda p: self.index.mtime(p) or 0)
+            self._remove(oldest, park=True)
+
+    def _schedule(self, path):
+        with self._lock:
+            if path not in self.tails:
+                return
+            if path in self._running:
+                self._rerun.add(path)
+                return
+            self._running.add(path)
+        self.executor.submit(self._drain, path)
+
+    def _drain(self, path):
+        tail = self.tails.get(path)
+        while True:
+            if tail is not None:
+                try:
+                    for data in tail.read_available():
+                        if self.verbose:
+                            print("[APPEND]", path, data.strip())
+                        if self.callback:
+                            self.callback("append", path, data)
+                        if self.checkpoints is not None:
+                            self.checkpoints.set(path, tail.inode, tail.offset)
+                except Exception as e:
+                    print(f"[TAIL] Error reading {path}: {e}")
+            with self._lock:
+                if path in self._rerun and self.tails.get(path) is tail:
+                    self._rerun.discard(path)
+                    continue
+                self._rerun.discard(path)
+                self._running.discard(path)
+                if tail is not None and self.tails.get(path) is not tail:
+                    tail.close()
+                return
+
+    def on_created(self, event):
+        if event.is_directory:
+            return
+        if not self.index.update(event.src_path):
+            return
+        if event.src_path not in self.tails:
+            self._add(event.src_path, from_start=True)
+            self._evict_oldest()
+        self._schedule(event.src_path)
 
-        self.last_size = new_size
+    def on_modified(self, event):
+        if event.is_directory:
+            return
+        if not self.index.update(event.src_path):
+            return
+        if event.src_path not in self.tails:
+            # 更新されたファイルは最新なので N 件の枠に入る
+            self._add(event.src_path, from_start=False)
+            self._evict_oldest()
+        self._schedule(event.src_path)
+
+    def on_deleted(self, event):
+        if event.is_directory or event.src_path not in self.index:
+            return
+        self.index.remove(event.src_path)
+        self._parked.pop(event.src_path, None)
+        if self.checkpoints is not None:
+            self.checkpoints.remove(event.src_path)
+        self._remove(event.src_path, park=False)
+        self._refill()
+
+    def on_moved(self, event):
+        if event.is_directory:
+            return
+        if event.src_path in self.index:
+            self.index.remove(event.src_path)
+            self._remove(event.src_path, park=False)
+        if self.index.update(event.dest_path) and event.dest_path not in self.tails:
+            self._add(event.dest_path, from_start=True)
+            self._evict_oldest()
+            self._schedule(event.dest_path)
+        self._refill()
+
+    def _refill(self):
+        if self.max_files is None:
+            return
+        for path in self._wanted():
+            if path not in self.tails:
+                self._add(path, from_start=False)
+
+    def close(self):
+        with self._lock:
+            tails = list(self.tails.values())
+            self.tails.clear()
+        for tail in tails:
+            tail.close()
 
 # ---- イベントハンドラ ----
 class MyHandler(FileSystemEventHandler):
-    def __init__(self, callback: Optional[Callable[[str, str, Optional[str]], None]] = None):
+    def __init__(self, callback: Optional[Callable[[str, str, Optional[str]], None]] = None, verbose: bool = True):
         self.callback = callback
+        self.verbose = verbose
 
     def on_created(self, event):
         if not event.is_directory:
-            print(f"[CREATE] {event.src_path}")
+            if self.verbose:
+                print(f"[CREATE] {event.src_path}")
             if self.callback:
                 self.callback("create", event.src_path, None)
     
@@ -112,43 +748,309 @@ class MyHandler(FileSystemEventHandler):
     #     except Exception as e:
     #         print(f"Error reading {path}: {e}")
 
+# ---- バッチ化 ----
+class BatchCallback:
+    """Coalesce watcher callbacks into batches.
+
+    Pass an instance as the callback of schedule_tailfile / schedule_newfile.
+    Tailed text is split into lines and every line (or "create" event) becomes
+    one (kind, path, line) item. Pending items are handed to batch_callback as
+    one list when max_batch items are pending or max_latency seconds have
+    passed since the oldest pending item, whichever comes first. The flush runs
+    on a worker thread, so the observer thread never waits for the consumer;
+    if more than max_pending items pile up, new items are dropped and counted.
+    """
+
+    def __init__(self, batch_callback: Callable[[List[Tuple[str, str, Optional[str]]]], None],
+                 max_batch: int = 500, max_latency: float = 0.05, max_pending: int = 100_000):
+        self.batch_callback = batch_callback
+        self.max_batch = max_batch
+        self.max_latency = max_latency
+        self.max_pending = max_pending
+        # counters
+        self.events = 0
+        self.lines = 0
+        self.batches = 0
+        self.dropped = 0
+        self._items = []
+        self._deadline = None
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="BatchCallback", daemon=True)
+        self._thread.start()
+
+    def __call__(self, kind: str, path: str, data: Optional[str]):
+        if data is None:
+            new = [(kind, path, None)]
+        else:
+            new = [(kind, path, line) for line in data.splitlines()]
+        with self._cond:
+            self.events += 1
+            room = self.max_pending - len(self._items)
+            if len(new) > room:
+                self.dropped += len(new) - max(room, 0)
+                new = new[:max(room, 0)]
+            if not new:
+                return
+            was_empty = not self._items
+            self._items.extend(new)
+            if data is not None:
+                self.lines += len(new)
+            if was_empty:
+                self._deadline = time.monotonic() + self.max_latency
+            if was_empty or len(self._items) >= self.max_batch:
+                self._cond.notify()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "events": self.events,
+                "lines": self.lines,
+                "batches": self.batches,
+                "dropped": self.dropped,
+                "pending": len(self._items),
+            }
+
+    def flush(self):
+        """Deliver everything pending now (on the worker thread)."""
+        with self._cond:
+            self._deadline = time.monotonic()
+            self._cond.notify()
+
+    def close(self, timeout: Optional[float] = None):
+        """Flush pending items and stop the worker."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._items and (self._closed or len(self._items) >= self.max_batch
+                                        or time.monotonic() >= self._deadline):
+                        break
+                    if self._closed:
+                        return
+                    timeout = self._deadline - time.monotonic() if self._items else None
+                    self._cond.wait(timeout)
+                batch = self._items[:self.max_batch]
+                del self._items[:self.max_batch]
+                # 残りがあれば次の締め切りを設定
+                self._deadline = time.monotonic() + self.max_latency if self._items else None
+                self.batches += 1
+            try:
+                self.batch_callback(batch)
+            except Exception as e:
+                print(f"[BATCH] callback failed: {e}")
+
 # ---- メイン ----
-def schedule_tailfile(observer, path:str,fileRegx:str, callback: Optional[Callable[[str, str, Optional[str]], None]] = None) -> bool:
+def schedule_tailfile(observer, path:str,fileRegx:str, callback: Optional[Callable[[str, str, Optional[str]], None]] = None,
+                      skip_backlog: bool = False, max_backlog: Optional[int] = None, chunk_size: int = 64 * 1024,
+                      verbose: bool = True, checkpoints: Optional[CheckpointStore] = None) -> bool:
     log_dir = os.path.abspath(os.path.abspath(path))
     
     if not os.path.isdir(log_dir):
         print(f"{log_dir} is not exit")
         return False
 
-    tail_handler  = TailHandler(log_dir=log_dir,fileRegX=fileRegx, callback=callback)
+    tail_handler  = TailHandler(log_dir=log_dir,fileRegX=fileRegx, callback=callback,
+                                skip_backlog=skip_backlog, max_backlog=max_backlog, chunk_size=chunk_size,
+                                verbose=verbose, checkpoints=checkpoints)
     observer.schedule(tail_handler, path=log_dir, recursive=False)
     print(f"Watching file: {log_dir}¥{fileRegx}")
     
     return True
 
-def schedule_newfile(observer, path:str, callback: Optional[Callable[[str, str, Optional[str]], None]] = None) -> bool:
+def schedule_multitail(observer, path:str, fileRegx:str, callback: Optional[Callable[[str, str, Optional[str]], None]] = None,
+                       max_files: Optional[int] = None, workers: int = 4, chunk_size: int = 64 * 1024,
+                       verbose: bool = True, checkpoints: Optional[CheckpointStore] = None) -> bool:
+    """Like schedule_tailfile, but tail every matching file (or the max_files newest) concurrently."""
+    log_dir = os.path.abspath(path)
+
+    if not os.path.isdir(log_dir):
+        print(f"{log_dir} is not exit")
+        return False
+
+    tail_handler = MultiTailHandler(log_dir=log_dir, fileRegX=fileRegx, callback=callback, max_files=max_files,
+                                    workers=workers, chunk_size=chunk_size, verbose=verbose,
+                                    checkpoints=checkpoints)
+    observer.schedule(tail_handler, path=log_dir, recursive=False)
+    print(f"Watching files: {log_dir}¥{fileRegx}")
+
+    return True
+
+def schedule_newfile(observer, path:str, callback: Optional[Callable[[str, str, Optional[str]], None]] = None,
+                     verbose: bool = True) -> bool:
     log_dir = os.path.abspath(os.path.abspath(path))
 
     if not os.path.isdir(log_dir):
         print(f"{log_dir} is not exit")
         return False
 
-    event_handler = MyHandler(callback=callback)
+    event_handler = MyHandler(callback=callback, verbose=verbose)
     observer.schedule(event_handler, path=log_dir, recursive=False)
     
     print(f"Watching directory: {log_dir}")
 
     return True
 
+# ---- asyncio API ----
+class TailEvent(NamedTuple):
+    kind: str            # "append" / "switch" / "create"
+    path: str
+    data: Optional[str]  # 完結した行のテキスト（create は None）
+
+
+async def _async_watch(schedule: Callable[[object, Callable], bool], maxsize: int, backend: str,
+                       poll_interval: float) -> AsyncIterator[TailEvent]:
+    """Run an observer and yield its callback events on the running event loop.
+
+    Events go straight from the watcher thread onto the loop
+    (call_soon_threadsafe). At most maxsize events are buffered: when the
+    consumer falls behind, the watcher thread blocks on a free slot, which in
+    turn stops it from reading more of the file (backpressure).
+
+    schedule() runs on its own thread, not on the loop: with a checkpoint it
+    delivers the backlog synchronously, and that delivery has to be able to
+    wait for the consumer.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    slots = threading.BoundedSemaphore(maxsize)
+    closed = threading.Event()
+    observer = create_observer(backend, timeout=poll_interval)
+    started = []  # schedule スレッドの結果（True / False / 例外）
+
+    def on_event(kind, path, data):
+        while not slots.acquire(timeout=0.5):
+            if closed.is_set():
+                return
+        if closed.is_set():
+            slots.release()
+            return
+        loop.call_soon_threadsafe(queue.put_nowait, TailEvent(kind, path, data))
+
+    def start():
+        try:
+            ok = schedule(observer, on_event)
+            if ok and not closed.is_set():
+                observer.start()
+                started.append(True)
+            result = ok
+        except BaseException as e:
+            result = e
+        # バックログのイベントの後に届く（スロットは使わない）
+        loop.call_soon_threadsafe(queue.put_nowait, result)
+
+    starter = threading.Thread(target=start, name="watch-schedule", daemon=True)
+    starter.start()
+    try:
+        while True:
+            event = await queue.get()
+            if not isinstance(event, TailEvent):
+                if isinstance(event, BaseException):
+                    raise event
+                if not event:
+                    raise FileNotFoundError("watch target does not exist")
+                continue
+            slots.release()
+            yield event
+    finally:
+        closed.set()
+        await loop.run_in_executor(None, starter.join)
+        if started:
+            observer.stop()
+            await loop.run_in_executor(None, observer.join)
+
+
+def watch_tail(path: str, fileRegx: str, maxsize: int = 1000, backend: str = "auto", poll_interval: float = 1.0,
+               multi: bool = False, **kwargs) -> AsyncIterator[TailEvent]:
+    """async for event in watch_tail("./logs", r"test\\d+\\.log"): ...
+
+    kwargs are passed to schedule_tailfile (or schedule_multitail if multi).
+    """
+    schedule = schedule_multitail if multi else schedule_tailfile
+    kwargs.setdefault("verbose", False)
+    return _async_watch(lambda observer, cb: schedule(observer, path, fileRegx, cb, **kwargs),
+                        maxsize, backend, poll_interval)
+
+
+def watch_newfile(path: str, maxsize: int = 1000, backend: str = "auto", poll_interval: float = 1.0,
+                  verbose: bool = False) -> AsyncIterator[TailEvent]:
+    """async for event in watch_newfile("./logs/images"): ..."""
+    return _async_watch(lambda observer, cb: schedule_newfile(observer, path, cb, verbose=verbose),
+                        maxsize, backend, poll_interval)
+
 if __name__ == "__main__":
-    
+    parser = argparse.ArgumentParser(description="tail latest log / watch new files")
+    parser.add_argument("--backend", choices=WATCH_BACKENDS, default="auto",
+                        help="watch backend (auto: inotify on Linux, polling otherwise)")
+    parser.add_argument("--poll-interval", type=float, default=1.0,
+                        help="polling interval in seconds (polling backend only)")
+    parser.add_argument("--skip-backlog", action="store_true",
+                        help="on switch to a new log, start at its end instead of delivering existing lines")
+    parser.add_argument("--max-backlog", type=int, default=None,
+                        help="on switch, deliver at most the last N bytes of the new log")
+    parser.add_argument("--pattern", default=r"test\d+\.log", help="regex of log file names to tail in ./logs")
+    parser.add_argument("--decode", action="store_true",
+                        help="decode tailed lines as run JSONL records (use with e.g. --pattern '_\\d+\\.jsonl')")
+    parser.add_argument("--multi", action="store_true", help="tail every matching log, not only the newest")
+    parser.add_argument("--max-files", type=int, default=None, help="with --multi, tail only the N newest logs")
+    parser.add_argument("--state", default=None,
+                        help="checkpoint file for tail offsets; resume from it on restart")
+    parser.add_argument("--batch", action="store_true",
+                        help="coalesce events into batches (no per-event print); with --decode, batches are decoded")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--batch-latency", type=float, default=0.05, help="max seconds an event waits in a batch")
+    args = parser.parse_args()
+
     def on_event(kind, path, data):
         print("EVENT", kind, path, repr(data))
 
-    observer = PollingObserver(timeout=1.0)
+    decoder = None
+    if args.decode:
+        def on_records(kind, path, records):
+            if records is None:
+                print("EVENT", kind, path)
+                return
+            print("RECORDS", kind, path, len(records), "last:", records[-1])
+
+        decoder = DecodingCallback(on_records)
+        on_event = decoder
+
+    batcher = None
+    if args.batch:
+        def on_batch(items):
+            if decoder is not None:
+                # --decode と併用: まとめた行をデコードしてから 1 回だけ表示する
+                lines = {}
+                for _, path, line in items:
+                    if line is not None:
+                        lines.setdefault(path, []).append(line + "\n")
+                records = [rec for path, text in lines.items() for rec in decoder.feed(path, "".join(text))]
+                last = records[-1] if records else items[-1]
+                print(f"BATCH {len(items)} items, {len(records)} records, last: {last!r}")
+                return
+            print(f"BATCH {len(items)} items, last: {items[-1]!r}")
+
+        batcher = BatchCallback(on_batch, max_batch=args.batch_size, max_latency=args.batch_latency)
+        on_event = batcher
+
+    checkpoints = CheckpointStore(args.state) if args.state else None
+
+    observer = create_observer(args.backend, timeout=args.poll_interval)
+    print(f"[WATCH] backend: {type(observer).__name__}")
 
-    schedule_tailfile(observer,"./logs",r"test\d+\.log",on_event)
-    schedule_newfile(observer,"./logs/images",on_event)
+    if args.multi:
+        schedule_multitail(observer,"./logs",args.pattern,on_event,
+                           max_files=args.max_files, verbose=not args.batch, checkpoints=checkpoints)
+    else:
+        schedule_tailfile(observer,"./logs",args.pattern,on_event,
+                          skip_backlog=args.skip_backlog, max_backlog=args.max_backlog, verbose=not args.batch,
+                          checkpoints=checkpoints)
+    schedule_newfile(observer,"./logs/images",on_event, verbose=not args.batch)
 
     observer.start()
     
@@ -160,3 +1062,10 @@ if __name__ == "__main__":
         observer.stop()
     
     observer.join()
+    if checkpoints is not None:
+        checkpoints.close()
+    if decoder is not None:
+        print("[DECODE]", decoder.counts)
+    if batcher is not None:
+        batcher.close()
+        print("[BATCH]", batcher.stats())
@@ -0,0 +1,236 @@
+"""Persistent catalog of the runs of every log in a directory (SQLite).
+
+One row per (file, run_id) with the run's byte range in the file, start/end
+time, env fields, meta and the summary stats of run_stats. The catalog is
+updated incrementally: refresh() compares each *.jsonl's (mtime, size) with
+what was catalogued and re-reads only the files that changed, so searching
+thousands of runs does not parse any log, and opening a result only touches
+the file it is in. A changed file is read from its sidecar manifest when that
+is current, else with one streaming pass (sidecar.scan_log); neither goes
+through the LogIndex cache of the dashboards. Dashboards call
+refresh_async(), which updates the catalog on a background thread while
+search() only queries SQLite.
+
+The database is <log dir>/.run_catalog.sqlite, shared by every process that
+browses the directory.
+
+search() takes whitespace-separated terms, all of which must match:
+  text          substring of run_id, file name, host, model, version or meta
+  key:value     column filter (run, file, host, model, version, app, finished)
+                or an exact env/meta field, e.g. fft_size:1024
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from dir_listing import list_dir
+from log_records import parse_time_ns
+from sidecar import read_manifest, scan_log
+
+CATALOG_NAME = ".run_catalog.sqlite"
+MIN_REFRESH_INTERVAL = 2.0  # これより短い間隔の refresh はディレクトリを見に行かない
+
+# search() の key:value で使える列
+FILTER_COLUMNS = {
+    "run": "run_id",
+    "run_id": "run_id",
+    "file": "file",
+    "host": "host_name",
+    "model": "model_name",
+    "version": "model_version",
+    "model_version": "model_version",
+    "app": "app_name",
+}
+TEXT_COLUMNS = ("run_id", "file", "host_name", "model_name", "model_version", "meta")
+STAT_COLUMNS = ("count", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms", "defect_rate", "score_mean")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS runs (
+    path TEXT NOT NULL, file TEXT NOT NULL, run_id TEXT NOT NULL,
+    start_offset INTEGER, end_offset INTEGER,
+    start_time TEXT, end_time TEXT, start_ns INTEGER, end_ns INTEGER, finished INTEGER NOT NULL,
+    host_name TEXT, app_name TEXT, app_version TEXT, model_name TEXT, model_version TEXT,
+    env TEXT, meta TEXT,
+    count INTEGER, mean_ms REAL, p50_ms REAL, p95_ms REAL, p99_ms REAL, max_ms REAL,
+    defect_rate REAL, score_mean REAL,
+    PRIMARY KEY (path, run_id)
+);
+CREATE INDEX IF NOT EXISTS runs_run_id ON runs (run_id);
+CREATE INDEX IF NOT EXISTS runs_model_version ON runs (model_version);
+CREATE INDEX IF NOT EXISTS runs_end_ns ON runs (end_ns);
+"""
+
+
+def _like(value: str) -> str:
+    """LIKE pattern matching value as a plain substring (% _ \\ escaped)."""
+    return "%" + value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+@contextmanager
+def _transaction(conn: sqlite3.Connection):
+    # autocommit 接続なので BEGIN/COMMIT は明示する（ファイル単位で書き換えを見せる）
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def _real(value):
+    # NaN は NULL として保存する
+    return None if value is None or value != value else value
+
+
+class RunCatalog:
+    """Catalog of the runs in log_dir's *.jsonl files."""
+
+    def __init__(self, log_dir: str, db_path: Optional[str] = None, suffix: str = ".jsonl"):
+        self.log_dir = os.path.abspath(log_dir)
+        self.db_path = db_path or os.path.join(self.log_dir, CATALOG_NAME)
+        self.suffix = suffix
+        self._tls = threading.local()
+        self._refresh_lock = threading.Lock()
+        self._listing_fingerprint = None
+        self._refreshed_at = 0.0
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._tls, "conn", None)
+        if conn is None or self._tls.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=10.0, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            self._tls.conn = conn
+            self._tls.pid = os.getpid()
+        return conn
+
+    def refresh(self, force: bool = False) -> int:
+        """Re-catalog files that changed since the last refresh. Returns the number of files re-read."""
+        now = time.monotonic()
+        if not force and now - self._refreshed_at < MIN_REFRESH_INTERVAL:
+            return 0
+        with self._refresh_lock:
+            listing = list_dir(self.log_dir, self.suffix)
+            if not force and listing.fingerprint == self._listing_fingerprint:
+                self._refreshed_at = now
+                return 0
+            conn = self._conn()
+            known = {row["path"]: (row["mtime_ns"], row["size"])
+                     for row in conn.execute("SELECT path, mtime_ns, size FROM files")}
+            updated = 0
+            for e in listing.entries:
+                if known.pop(e.path, None) == (e.mtime_ns, e.size):
+                    continue
+                try:
+                    self._catalog_file(conn, e.path, e.name, e.mtime_ns, e.size)
+                except OSError as ex:
+                    print(f"[catalog] {e.path}: {ex}")
+                    continue
+                updated += 1
+            # 消えたファイル
+            for path in known:
+                with _transaction(conn):
+                    conn.execute("DELETE FROM runs WHERE path = ?", (path,))
+                    conn.execute("DELETE FROM files WHERE path = ?", (path,))
+            self._listing_fingerprint = listing.fingerprint
+            self._refreshed_at = now
+            return updated
+
+    def refresh_async(self) -> bool:
+        """Run refresh() on a background thread (unless one is running). True while it is running."""
+        with self._thread_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return True
+            now = time.monotonic()
+            if now - self._refreshed_at < MIN_REFRESH_INTERVAL:
+                return False
+            # 一覧（dir_listing のキャッシュ）が変わっていなければスレッドを起こすまでもない
+            if list_dir(self.log_dir, self.suffix).fingerprint == self._listing_fingerprint:
+                self._refreshed_at = now
+                return False
+            self._thread = threading.Thread(target=self._refresh_quietly, name="run-catalog", daemon=True)
+            self._thread.start()
+            return True
+
+    def _refresh_quietly(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            print(f"[catalog] refresh failed: {self.log_dir}: {e}")
+
+    def _catalog_file(self, conn: sqlite3.Connection, path: str, name: str, mtime_ns: int, size: int):
+        manifest = read_manifest(path) or scan_log(path)
+        # 読んだ時点の (mtime, size) を記録する（読んでいる間に伸びた分は次の refresh で）
+        mtime_ns, size = manifest["source"]["mtime_ns"], manifest["source"]["size"]
+        rows = []
+        for rid, run in manifest["runs"].items():
+            s = run["summary"]
+            env = run["env"] or {}
+            rows.append((
+                path, name, rid, run["start"], run["end"],
+                run["start_time"], run["end_time"], parse_time_ns(run["start_time"]), parse_time_ns(run["end_time"]),
+                int(run["finished"]),
+                env.get("host_name"), env.get("app_name"), env.get("app_version"),
+                env.get("model_name"), env.get("model_version"),
+                json.dumps(env, ensure_ascii=False), json.dumps(run["meta"] or {}, ensure_ascii=False),
+                s.get("count"), *(_real(s.get(c)) for c in STAT_COLUMNS[1:]),
+            ))
+        with _transaction(conn):
+            conn.execute("DELETE FROM runs WHERE path = ?", (path,))
+            conn.executemany(f"INSERT INTO runs VALUES ({', '.join('?' * 25)})", rows)
+            conn.execute("INSERT OR REPLACE INTO files (path, mtime_ns, size) VALUES (?, ?, ?)",
+                         (path, mtime_ns, size))
+
+    def search(self, query: Optional[str] = None, limit: int = 200) -> List[Dict]:
+        """Runs matching every term of query (see module docstring), newest end time first."""
+        where = []
+        params = []
+        for term in (query or "").split():
+            key, sep, value = term.partition(":")
+            if sep and key and value:
+                column = FILTER_COLUMNS.get(key.lower())
+                if column:
+                    where.append(f"{column} LIKE ? ESCAPE '\\'")
+                    params.append(_like(value))
+                elif key.lower() == "finished":
+                    where.append("finished = ?")
+                    params.append(1 if value.lower() in ("1", "true", "yes") else 0)
+                else:
+                    # env / meta のフィールド（完全一致、数値も文字列として比べる）
+                    path = "$." + json.dumps(key)
+                    where.append("(CAST(json_extract(meta, ?) AS TEXT) = ? OR CAST(json_extract(env, ?) AS TEXT) = ?)")
+                    params += [path, value, path, value]
+            else:
+                where.append("(" + " OR ".join(f"{c} LIKE ? ESCAPE '\\'" for c in TEXT_COLUMNS) + ")")
+                params += [_like(term)] * len(TEXT_COLUMNS)
+        sql = "SELECT * FROM runs"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY end_ns IS NULL, end_ns DESC, file DESC LIMIT ?"
+        params.append(limit)
+        return [dict(row) for row in self._conn().execute(sql, params)]
+
+
+_catalogs: Dict[str, RunCatalog] = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog(log_dir: str) -> RunCatalog:
+    """Shared RunCatalog of log_dir (one per directory and process)."""
+    log_dir = os.path.abspath(log_dir)
+    with _catalogs_lock:
+        catalog = _catalogs.get(log_dir)
+        if catalog is None:
+            catalog = _catalogs[log_dir] = RunCatalog(log_dir)
+        return catalog
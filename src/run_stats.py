@@ -0,0 +1,157 @@
+"""Incrementally maintained per-run statistics of frame_result records.
+
+RunStats is updated one frame at a time (LogIndex calls add() while parsing
+lines), so the summary of a growing run is always current without re-reading
+the file. Quantiles of elapsed_ms come from QuantileSketch, a log-bucket
+sketch (DDSketch style): memory grows with the log of the value range, not
+with the number of frames, and every quantile is within rel_err (relative) of
+a value that was actually observed at that rank. Sketches of the same rel_err
+can be merged, e.g. to summarize several runs together.
+"""
+import math
+from typing import Dict, Iterable, List
+
+DEFAULT_REL_ERR = 0.01
+# これ以下の値は 0 として数える（log が取れないため）
+ZERO_THRESHOLD = 1e-9
+SUMMARY_FIELDS = ("count", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms", "defect_rate",
+                  "score_mean", "score_std", "score_min", "score_max")
+
+
+class QuantileSketch:
+    """Streaming quantiles with bounded relative error (values <= ZERO_THRESHOLD share one bucket)."""
+
+    __slots__ = ("rel_err", "_gamma", "_log_gamma", "buckets", "zero_count", "count", "min", "max")
+
+    def __init__(self, rel_err: float = DEFAULT_REL_ERR):
+        self.rel_err = rel_err
+        self._gamma = (1 + rel_err) / (1 - rel_err)
+        self._log_gamma = math.log(self._gamma)
+        self.buckets: Dict[int, int] = {}  # k -> (gamma^(k-1), gamma^k] に入った値の数
+        self.zero_count = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float):
+        if value != value:  # NaN
+            return
+        self.count += 1
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if value <= ZERO_THRESHOLD:
+            self.zero_count += 1
+        else:
+            k = math.ceil(math.log(value) / self._log_gamma)
+            self.buckets[k] = self.buckets.get(k, 0) + 1
+
+    def merge(self, other: "QuantileSketch"):
+        if other.rel_err != self.rel_err:
+            raise ValueError("cannot merge sketches with different rel_err")
+        for k, n in other.buckets.items():
+            self.buckets[k] = self.buckets.get(k, 0) + n
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantiles(self, qs: Iterable[float]) -> List[float]:
+        """Values at each quantile q in [0, 1] (NaN if empty), in one pass over the buckets."""
+        qs = list(qs)
+        if not self.count:
+            return [math.nan] * len(qs)
+        order = sorted(range(len(qs)), key=lambda i: qs[i])
+        result = [math.nan] * len(qs)
+        keys = iter(sorted(self.buckets))
+        seen = self.zero_count
+        value = 0.0 if self.min >= 0 else self.min
+        for i in order:
+            rank = qs[i] * (self.count - 1)
+            while seen <= rank:
+                k = next(keys, None)
+                if k is None:
+                    value = self.max
+                    break
+                seen += self.buckets[k]
+                # バケットの代表値（相対誤差 rel_err 以内）
+                value = 2 * self._gamma ** k / (self._gamma + 1)
+            result[i] = min(max(value, self.min), self.max)
+        return result
+
+    def quantile(self, q: float) -> float:
+        return self.quantiles([q])[0]
+
+
+class RunStats:
+    """count / mean / quantiles / max of elapsed_ms, defect rate and score stats of one run."""
+
+    __slots__ = ("count", "elapsed", "elapsed_sum", "defects",
+                 "score_count", "score_mean", "_score_m2", "score_min", "score_max")
+
+    def __init__(self, rel_err: float = DEFAULT_REL_ERR):
+        self.count = 0  # frame_result の数
+        self.elapsed = QuantileSketch(rel_err)
+        self.elapsed_sum = 0.0
+        self.defects = 0
+        self.score_count = 0
+        self.score_mean = 0.0
+        self._score_m2 = 0.0  # Welford の分散計算用
+        self.score_min = math.inf
+        self.score_max = -math.inf
+
+    def add(self, elapsed_ms: float, score: float, defect: bool):
+        self.count += 1
+        if elapsed_ms == elapsed_ms:
+            self.elapsed.add(elapsed_ms)
+            self.elapsed_sum += elapsed_ms
+        if defect:
+            self.defects += 1
+        if score == score:
+            self.score_count += 1
+            delta = score - self.score_mean
+            self.score_mean += delta / self.score_count
+            self._score_m2 += delta * (score - self.score_mean)
+            if score < self.score_min:
+                self.score_min = score
+            if score > self.score_max:
+                self.score_max = score
+
+    def extend(self, cols, start: int = 0):
+        """Add frames [start:] of a RunColumns."""
+        for e, s, d in zip(cols.elapsed_ms[start:], cols.score[start:], cols.defect[start:]):
+            self.add(e, s, d)
+
+    def merge(self, other: "RunStats"):
+        self.elapsed.merge(other.elapsed)
+        self.elapsed_sum += other.elapsed_sum
+        self.defects += other.defects
+        n = self.score_count + other.score_count
+        if other.score_count:
+            delta = other.score_mean - self.score_mean
+            self._score_m2 += other._score_m2 + delta * delta * self.score_count * other.score_count / n
+            self.score_mean += delta * other.score_count / n
+            self.score_min = min(self.score_min, other.score_min)
+            self.score_max = max(self.score_max, other.score_max)
+        self.score_count = n
+        self.count += other.count
+
+    def summary(self) -> dict:
+        """SUMMARY_FIELDS as a dict (NaN where there is no data)."""
+        nan = math.nan
+        n_elapsed = self.elapsed.count
+        p50, p95, p99 = self.elapsed.quantiles((0.5, 0.95, 0.99))
+        return {
+            "count": self.count,
+            "mean_ms": self.elapsed_sum / n_elapsed if n_elapsed else nan,
+            "p50_ms": p50,
+            "p95_ms": p95,
+            "p99_ms": p99,
+            "max_ms": self.elapsed.max if n_elapsed else nan,
+            "defect_rate": self.defects / self.count if self.count else nan,
+            "score_mean": self.score_mean if self.score_count else nan,
+            "score_std": math.sqrt(self._score_m2 / self.score_count) if self.score_count else nan,
+            "score_min": self.score_min if self.score_count else nan,
+            "score_max": self.score_max if self.score_count else nan,
+        }
@@ -0,0 +1,319 @@
+"""Cache shared by every worker process of the dashboards (SQLite file).
+
+With gunicorn and several workers, each process has its own LogIndex cache;
+this tier lets one worker's parse results (run lists, run summaries, frame
+series, figures) be reused by the others. Entries are keyed by
+(namespace, key) and carry the fingerprint of the data they were computed
+from (for log files: path, inode, size, mtime); a lookup with a different
+fingerprint is a miss and the entry is replaced. The total size of the stored
+values is bounded by evicting the least recently used entries.
+
+In front of SQLite, each process keeps a LocalLRU of the decoded values
+(bounded by their encoded size), so a repeat view in the same worker - another
+tab, another user - returns the stored object without touching SQLite,
+decoding or recomputing. Both tiers count hits and misses (stats()).
+
+The database lives in $LOGVIEW_CACHE (default:
+$XDG_CACHE_HOME/logview/cache.sqlite, in a directory created with mode 0700).
+A database file (or its -wal / -shm) owned by another user or writable by
+group / others is refused and the cache is disabled. Values are stored as JSON,
+with numpy arrays as raw bytes plus dtype and shape (see encode_value), so a
+tampered file can at worst produce a wrong value, never run code. The file is
+a cache only and can be deleted at any time. Cached values are shared between
+callers and must not be mutated (arrays come back read-only).
+"""
+import base64
+import json
+import os
+import sqlite3
+import stat
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Tuple
+
+import numpy as np
+
+CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "logview")
+DEFAULT_PATH = os.environ.get("LOGVIEW_CACHE") or os.path.join(CACHE_DIR, "cache.sqlite")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_LOCAL_MAX_BYTES = 64 * 1024 * 1024
+ATIME_RESOLUTION = 1.0  # これより短い間隔の参照では atime を書き換えない
+
+_MISSING = object()
+# encode_value の特殊な値の印（dict のキーとしてだけ使う。NUL で始まるキーの dict は保存しない）
+_ARRAY_TAG = "\0ndarray"
+_TUPLE_TAG = "\0tuple"
+
+
+def _encode(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, list):
+        return [_encode(v) for v in value]
+    if isinstance(value, tuple):
+        return {_TUPLE_TAG: [_encode(v) for v in value]}
+    if isinstance(value, dict):
+        out = {}
+        for k, v in value.items():
+            if not isinstance(k, str) or k.startswith("\0"):
+                raise TypeError(f"unsupported dict key: {k!r}")
+            out[k] = _encode(v)
+        return out
+    if isinstance(value, np.ndarray):
+        if value.dtype.hasobject:
+            raise TypeError("object arrays are not supported")
+        return {_ARRAY_TAG: [value.dtype.str, list(value.shape),
+                             base64.b64encode(np.ascontiguousarray(value).tobytes()).decode("ascii")]}
+    raise TypeError(f"unsupported type: {type(value).__name__}")
+
+
+def _decode(value):
+    if isinstance(value, list):
+        return [_decode(v) for v in value]
+    if isinstance(value, dict):
+        if len(value) == 1:
+            if _TUPLE_TAG in value:
+                return tuple(_decode(v) for v in value[_TUPLE_TAG])
+            if _ARRAY_TAG in value:
+                dtype, shape, data = value[_ARRAY_TAG]
+                dtype = np.dtype(dtype)
+                if dtype.hasobject:
+                    raise ValueError("object arrays are not supported")
+                return np.frombuffer(base64.b64decode(data), dtype=dtype).reshape(shape)
+        return {k: _decode(v) for k, v in value.items()}
+    return value
+
+
+def encode_value(value: Any) -> bytes:
+    """value as JSON bytes: None / bool / int / float / str, lists, tuples, str-keyed dicts and
+    non-object numpy arrays / scalars. Raises TypeError for anything else."""
+    return json.dumps(_encode(value), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def decode_value(data: bytes) -> Any:
+    """Inverse of encode_value (numpy arrays come back read-only). Raises ValueError."""
+    return _decode(json.loads(data))
+
+
+def _check_private(path: str):
+    """Raise PermissionError unless path (if it exists) is ours and not writable by group / others."""
+    if not hasattr(os, "getuid"):
+        return
+    try:
+        st = os.lstat(path)
+    except FileNotFoundError:
+        return
+    if st.st_uid != os.getuid() or st.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise PermissionError(f"{path} is owned by another user or writable by group/others")
+    if not (stat.S_ISREG(st.st_mode) or stat.S_ISDIR(st.st_mode)):
+        raise PermissionError(f"{path} is not a regular file")
+
+
+def _prepare_path(path: str):
+    """Create the default cache directory (0700) and refuse files that others could have written."""
+    if os.path.dirname(os.path.abspath(path)) == os.path.abspath(CACHE_DIR):
+        os.makedirs(CACHE_DIR, mode=0o700, exist_ok=True)
+        _check_private(CACHE_DIR)
+    for suffix in ("", "-wal", "-shm"):
+        _check_private(path + suffix)
+
+
+def file_fingerprint(path: str, st: Optional[os.stat_result] = None) -> str:
+    """Fingerprint of a file's current contents (path, inode, size, mtime). Raises OSError."""
+    if st is None:
+        st = os.stat(path)
+    return f"{os.path.abspath(path)}|{st.st_dev}:{st.st_ino}|{st.st_size}|{st.st_mtime_ns}"
+
+
+class LocalLRU:
+    """In-process LRU of (fingerprint, value) with a byte budget; sizes are given by the caller."""
+
+    def __init__(self, max_bytes: int = DEFAULT_LOCAL_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[str, Any, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, str], fingerprint: str, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != fingerprint:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Tuple[str, str], fingerprint: str, value: Any, size: int):
+        if size > self.max_bytes // 4:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[2]
+            self._entries[key] = (fingerprint, value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes and self._entries:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries),
+                    "bytes": self.bytes, "max_bytes": self.max_bytes}
+
+
+class SharedCache:
+    """Size-bounded LRU of encoded values in a SQLite file, safe across threads and processes.
+
+    get_or_compute / for_file look in the process-local LocalLRU first.
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH, max_bytes: int = DEFAULT_MAX_BYTES,
+                 local_max_bytes: int = DEFAULT_LOCAL_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.local = LocalLRU(local_max_bytes)
+        self.hits = 0
+        self.misses = 0
+        self._tls = threading.local()
+        self.disabled = False
+
+    def _conn(self) -> Optional[sqlite3.Connection]:
+        # 接続はスレッドごと・プロセスごと（fork 後に親の接続を使わない）
+        conn = getattr(self._tls, "conn", None)
+        if conn is not None and self._tls.pid == os.getpid():
+            return conn
+        if self.disabled:
+            return None
+        try:
+            _prepare_path(self.path)
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, value BLOB NOT NULL,"
+                " size INTEGER NOT NULL, atime REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_atime ON entries (atime)")
+        except (sqlite3.Error, OSError) as e:
+            # 共有キャッシュが使えなくても表示は続ける（毎回計算するだけ）
+            print(f"[shared_cache] disabled: {self.path}: {e}")
+            self.disabled = True
+            return None
+        self._tls.conn = conn
+        self._tls.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _key(namespace: str, key: str) -> str:
+        return f"{namespace}\0{key}"
+
+    def get(self, namespace: str, key: str, fingerprint: str, default=None):
+        """Value stored for (namespace, key) if it was stored with fingerprint, else default (SQLite only)."""
+        return self._get(namespace, key, fingerprint, default)[0]
+
+    def _get(self, namespace: str, key: str, fingerprint: str, default) -> Tuple[Any, int]:
+        conn = self._conn()
+        if conn is None:
+            return default, 0
+        k = self._key(namespace, key)
+        try:
+            row = conn.execute("SELECT fingerprint, value, atime FROM entries WHERE key = ?", (k,)).fetchone()
+            if row is None or row[0] != fingerprint:
+                self.misses += 1
+                return default, 0
+            now = time.time()
+            if now - row[2] >= ATIME_RESOLUTION:
+                conn.execute("UPDATE entries SET atime = ? WHERE key = ?", (now, k))
+            value = decode_value(row[1])
+        except (sqlite3.Error, ValueError, TypeError) as e:
+            print(f"[shared_cache] get failed: {e}")
+            self.misses += 1
+            return default, 0
+        self.hits += 1
+        return value, len(row[1])
+
+    def set(self, namespace: str, key: str, fingerprint: str, value: Any) -> Optional[int]:
+        """Store value (SQLite only); returns its encoded size, or None if encode_value cannot store it."""
+        try:
+            data = encode_value(value)
+        except TypeError as e:
+            print(f"[shared_cache] not cached: {namespace}: {e}")
+            return None
+        conn = self._conn()
+        if conn is None:
+            return len(data)
+        if len(data) > self.max_bytes // 4:
+            return len(data)  # 大きすぎるものは置かない（他を全部追い出してしまう）
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, fingerprint, value, size, atime) VALUES (?, ?, ?, ?, ?)",
+                (self._key(namespace, key), fingerprint, data, len(data), time.time()),
+            )
+            self._evict(conn)
+        except sqlite3.Error as e:
+            print(f"[shared_cache] set failed: {e}")
+        return len(data)
+
+    def _evict(self, conn: sqlite3.Connection):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # 古い順に、上限の 9 割まで減らす
+        target = total - self.max_bytes * 9 // 10
+        freed = 0
+        victims = []
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY atime"):
+            victims.append((key,))
+            freed += size
+            if freed >= target:
+                break
+        conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+
+    def get_or_compute(self, namespace: str, key: str, fingerprint: str, compute: Callable[[], Any]):
+        """Cached value for (namespace, key, fingerprint): process-local LRU, then SQLite, then compute()."""
+        value = self.local.get((namespace, key), fingerprint, _MISSING)
+        if value is not _MISSING:
+            return value
+        value, size = self._get(namespace, key, fingerprint, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            size = self.set(namespace, key, fingerprint, value)
+            if size is None:
+                return value
+        self.local.set((namespace, key), fingerprint, value, size)
+        return value
+
+    def for_file(self, namespace: str, path: str, key: str, compute: Callable[[], Any]):
+        """get_or_compute keyed by path's current file_fingerprint (raises OSError if path is gone)."""
+        return self.get_or_compute(namespace, f"{os.path.abspath(path)}\0{key}", file_fingerprint(path), compute)
+
+    def clear(self):
+        self.local.clear()
+        conn = self._conn()
+        if conn is not None:
+            conn.execute("DELETE FROM entries")
+
+    def stats(self) -> dict:
+        """Hit/miss counters and sizes of both tiers (hits/misses of "shared" are per process)."""
+        conn = self._conn()
+        entries, size = (0, 0) if conn is None else conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {"local": self.local.stats(),
+                "shared": {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size,
+                           "max_bytes": self.max_bytes}}
+
+
+cache = SharedCache()
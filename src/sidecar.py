@@ -0,0 +1,462 @@
+"""Columnar sidecar files for finished runs, written by a background compactor.
+
+A run is compacted once its run_end has been parsed. Its frame_result columns
+are stored next to the log as plain .npy files, which the dashboards memory-map
+instead of re-decoding the JSONL (and its repeated env dict) on every view:
+
+  <log dir>/.cols/<log name>/<run_id>/
+      frame_id.npy  elapsed_ms.npy  score.npy  defect.npy
+      header.json   run_id, env, meta, start/end time, count, stats, source check
+
+  <log dir>/.cols/<log name>.json
+      manifest: every run of the log (byte range, times, env, meta, summary)
+      and run_id -> run_end time, valid while the log's inode / size / mtime match
+
+header.json is written last, so a run directory without it is ignored. The
+header records where the run ended in the log and a CRC of the bytes just
+before that offset; a sidecar whose log was rewritten or truncated no longer
+matches and readers fall back to the JSONL. A sidecar is only used while the
+manifest is current and lists the run as ending at that offset, so records
+appended to the run later (the same run_id again) are never hidden by it.
+
+The compactor reads each log once with its own streaming decoder (not the
+LogIndex cache of log_cache, so it never evicts the file being viewed) and
+releases a run's columns as soon as they are written. It leaves a log alone
+until it has not been modified for `settle` seconds. Only one process per
+log directory compacts it (a lock file in .cols), so the workers of a
+dashboard do not all scan the same files. run_times() / run_summaries()
+answer from the manifest while it is current, without indexing the log.
+
+usage: python src/sidecar.py ./logs [--interval 5] [--settle 10] [--once]
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+import zlib
+from array import array
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import quote
+
+import numpy as np
+
+from dir_listing import list_dir
+from log_cache import READ_CHUNK, get_log_index, run_summary
+from log_records import FrameResult, JsonlDecoder, RunColumns, RunEnd, parse_time
+from run_stats import RunStats
+
+try:
+    import fcntl
+except ImportError:  # Windows: ロックなし（書き込みは atomic なので重複しても壊れない）
+    fcntl = None
+
+SIDECAR_DIR = ".cols"
+HEADER = "header.json"
+LOCK_NAME = ".compactor.lock"
+FORMAT_VERSION = 1
+COLUMNS = {"frame_id": "int64", "elapsed_ms": "float64", "score": "float64", "defect": "bool"}
+TAIL_CHECK = 256  # ソース確認に使う run 末尾のバイト数
+SETTLE_SECONDS = 10.0  # 最後の書き込みからこの秒数たったログだけ変換する
+
+
+def run_dir(log_path: str, run_id: str) -> str:
+    """Sidecar directory of run_id in log_path."""
+    log_dir, name = os.path.split(os.path.abspath(log_path))
+    return os.path.join(log_dir, SIDECAR_DIR, name, quote(run_id, safe=""))
+
+
+def manifest_path(log_path: str) -> str:
+    """Manifest of log_path (next to its run directories)."""
+    log_dir, name = os.path.split(os.path.abspath(log_path))
+    return os.path.join(log_dir, SIDECAR_DIR, name + ".json")
+
+
+def _file_source(st: os.stat_result) -> dict:
+    return {"inode": [st.st_dev, st.st_ino], "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _tail_crc(log_path: str, end: int) -> Optional[int]:
+    start = max(end - TAIL_CHECK, 0)
+    try:
+        with open(log_path, "rb") as f:
+            f.seek(start)
+            data = f.read(end - start)
+    except OSError:
+        return None
+    if len(data) != end - start:
+        return None
+    return zlib.crc32(data)
+
+
+def _atomic_write(directory: str, name: str, write):
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=f".{name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(directory, name))
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _load_header(log_path: str, run_id: str) -> Optional[dict]:
+    """header.json of run_id's sidecar if its tail CRC still matches the log (which may have grown since)."""
+    try:
+        with open(os.path.join(run_dir(log_path, run_id), HEADER), "r", encoding="utf-8") as f:
+            header = json.load(f)
+    except (OSError, ValueError):
+        return None
+    source = header.get("source") or {}
+    if header.get("version") != FORMAT_VERSION or header.get("run_id") != run_id:
+        return None
+    if _tail_crc(log_path, source.get("end", -1)) != source.get("tail_crc"):
+        return None
+    return header
+
+
+def read_header(log_path: str, run_id: str) -> Optional[dict]:
+    """header.json of run_id's sidecar, or None if there is none or it does not cover the current log."""
+    header = _load_header(log_path, run_id)
+    if header is None:
+        return None
+    # 追記で同じ run_id の行が増えていても CRC は通るので、現在のマニフェストで run の終わりを確かめる
+    manifest = read_manifest(log_path)
+    run = manifest["runs"].get(run_id) if manifest is not None else None
+    if run is None or run["split"] or run["end"] != header["source"]["end"]:
+        return None
+    return header
+
+
+def load_run_columns(log_path: str, run_id: str) -> Optional[Dict[str, np.ndarray]]:
+    """Memory-mapped COLUMNS of a compacted run, or None (not compacted yet / stale)."""
+    header = read_header(log_path, run_id)
+    if header is None:
+        return None
+    d = run_dir(log_path, run_id)
+    try:
+        columns = {name: np.load(os.path.join(d, f"{name}.npy"), mmap_mode="r") for name in COLUMNS}
+    except (OSError, ValueError):
+        return None
+    if any(len(col) != header["count"] for col in columns.values()):
+        return None
+    return columns
+
+
+def frame_series(log_path: str, run_id: str) -> Tuple[np.ndarray, np.ndarray]:
+    """(frame_id, elapsed_ms) of run_id: from the sidecar if compacted, else from the JSONL index."""
+    columns = load_run_columns(log_path, run_id)
+    if columns is not None:
+        return columns["frame_id"], columns["elapsed_ms"]
+    xs, ys = get_log_index(log_path).frame_series(run_id)
+    return np.asarray(xs, dtype=np.int64), np.asarray(ys, dtype=np.float64)
+
+
+def run_columns(log_path: str, run_id: str) -> Dict[str, np.ndarray]:
+    """All COLUMNS of run_id: from the sidecar if compacted, else copied from the JSONL index (empty if unknown)."""
+    columns = load_run_columns(log_path, run_id)
+    if columns is not None:
+        return columns
+    idx = get_log_index(log_path)
+    with idx.lock:
+        cols = idx.runs.get(run_id)
+        if cols is None:
+            return {name: np.zeros(0, dtype=dtype) for name, dtype in COLUMNS.items()}
+        return {
+            "frame_id": np.array(cols.frame_id, dtype=np.int64),
+            "elapsed_ms": np.array(cols.elapsed_ms, dtype=np.float64),
+            "score": np.array(cols.score, dtype=np.float64),
+            "defect": np.array(cols.defect, dtype=np.int8).astype(bool),
+        }
+
+
+def read_manifest(log_path: str, st: Optional[os.stat_result] = None) -> Optional[dict]:
+    """Manifest of log_path, or None if there is none or the log changed since it was written."""
+    try:
+        if st is None:
+            st = os.stat(log_path)
+        with open(manifest_path(log_path), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != FORMAT_VERSION or manifest.get("source") != _file_source(st):
+        return None
+    return manifest
+
+
+def run_times(log_path: str) -> Dict[str, Optional[float]]:
+    """run_id -> latest run_end time: from the manifest if current, else from the JSONL index."""
+    manifest = read_manifest(log_path)
+    if manifest is not None:
+        return manifest["run_times"]
+    return get_log_index(log_path).run_times()
+
+
+def run_summaries(log_path: str) -> Dict[str, dict]:
+    """run_id -> LogIndex.run_summary(): from the manifest if current, else from the JSONL index."""
+    manifest = read_manifest(log_path)
+    if manifest is not None:
+        return {rid: run["summary"] for rid, run in manifest["runs"].items()}
+    return get_log_index(log_path).run_summaries()
+
+
+def scan_log(log_path: str, on_run_end: Optional[Callable[[RunColumns, int, dict], None]] = None) -> dict:
+    """Read log_path once with a private decoder and return its manifest.
+
+    on_run_end(cols, end, summary) is called as each run_end is read (end = byte offset just after it);
+    the run's frame columns are released right after, so memory is bounded by the runs still open.
+    A run_id that has records after its run_end (the same id run again) is marked "split" in the
+    manifest; its columns are incomplete, so it must not get a sidecar.
+    """
+    st = os.stat(log_path)
+    decoder = JsonlDecoder()
+    spans: Dict[str, list] = {}         # run_id -> [start, end)
+    end_times: Dict[str, Optional[float]] = {}
+    stats: Dict[str, RunStats] = {}
+    closed = set()  # run_end を処理して列を手放した run
+    split = set()   # その後にまた行が出てきた run
+    with open(log_path, "rb") as f:
+        pos = 0
+        partial = b""
+        remaining = st.st_size  # 読み始めた時点の長さまで（その後の追記は次回）
+        while remaining > 0:
+            data = f.read(min(READ_CHUNK, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            buf = partial + data
+            start = 0
+            while True:
+                nl = buf.find(b"\n", start)
+                if nl < 0:
+                    break
+                rec = decoder.decode_line(buf[start:nl + 1])
+                offset, end = pos + start, pos + nl + 1
+                start = nl + 1
+                if rec is None:
+                    continue
+                rid = rec.run_id
+                if rid in closed:
+                    split.add(rid)
+                span = spans.get(rid)
+                if span is None:
+                    spans[rid] = [offset, end]
+                else:
+                    span[1] = end
+                if isinstance(rec, FrameResult):
+                    run_stats = stats.get(rid)
+                    if run_stats is None:
+                        run_stats = stats[rid] = RunStats()
+                    run_stats.add(rec.elapsed_ms, rec.score, rec.defect)
+                elif isinstance(rec, RunEnd):
+                    t_val = parse_time(rec.time)
+                    prev = end_times.get(rid)
+                    if rid not in end_times or (t_val is not None and (prev is None or t_val > prev)):
+                        end_times[rid] = t_val
+                    cols = decoder.runs[rid]
+                    if on_run_end is not None and rid not in split:
+                        on_run_end(cols, end, run_summary(stats.get(rid), cols, end_times[rid]))
+                    cols.frame_id, cols.elapsed_ms = array("q"), array("d")
+                    cols.score, cols.defect = array("d"), array("b")
+                    closed.add(rid)
+            pos += start
+            partial = buf[start:]
+
+    runs = {}
+    for rid, cols in decoder.runs.items():
+        span = spans.get(rid) or [None, None]
+        runs[rid] = {
+            "start": span[0],
+            "end": span[1],
+            "start_time": cols.start_time,
+            "end_time": cols.end_time,
+            "finished": cols.finished,
+            "env": cols.env,
+            "meta": cols.meta,
+            "summary": run_summary(stats.get(rid), cols, end_times.get(rid)),
+            "split": rid in split,
+        }
+    return {"version": FORMAT_VERSION, "source": _file_source(st), "run_times": end_times, "runs": runs}
+
+
+def _write_run(log_path: str, cols: RunColumns, end: int, summary: dict) -> bool:
+    """Write the sidecar of a finished run ending at byte end, unless an up-to-date one exists."""
+    run_id = cols.run_id
+    existing = _load_header(log_path, run_id)
+    if existing is not None and existing["source"]["end"] == end:
+        return False
+    crc = _tail_crc(log_path, end)
+    if crc is None:
+        return False
+    arrays = {
+        "frame_id": np.array(cols.frame_id, dtype=np.int64),
+        "elapsed_ms": np.array(cols.elapsed_ms, dtype=np.float64),
+        "score": np.array(cols.score, dtype=np.float64),
+        "defect": np.array(cols.defect, dtype=np.int8).astype(bool),
+    }
+    header = {
+        "version": FORMAT_VERSION,
+        "run_id": run_id,
+        "env": cols.env,
+        "meta": cols.meta,
+        "start_time": cols.start_time,
+        "end_time": cols.end_time,
+        "count": len(cols),
+        "columns": COLUMNS,
+        "stats": summary,
+        "source": {"name": os.path.basename(log_path), "end": end, "tail_crc": crc},
+    }
+
+    d = run_dir(log_path, run_id)
+    os.makedirs(d, exist_ok=True)
+    for name, arr in arrays.items():
+        _atomic_write(d, f"{name}.npy", lambda f, arr=arr: np.save(f, arr, allow_pickle=False))
+    data = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    _atomic_write(d, HEADER, lambda f: f.write(data))
+    return True
+
+
+def compact_file(log_path: str, verbose: bool = False) -> int:
+    """Write the sidecar of every finished run of log_path that has none, then its manifest.
+
+    Returns the number of runs written.
+    """
+    written = set()
+
+    def on_run_end(cols, end, summary):
+        if _write_run(log_path, cols, end, summary):
+            written.add(cols.run_id)
+
+    manifest = scan_log(log_path, on_run_end)
+    for rid, run in manifest["runs"].items():
+        if run["split"]:
+            # 途中までの列で書いた sidecar は使わせない（JSONL から読む）
+            try:
+                os.unlink(os.path.join(run_dir(log_path, rid), HEADER))
+            except FileNotFoundError:
+                pass
+            written.discard(rid)
+    if verbose:
+        for rid in written:
+            print(f"[compact] {log_path} {rid}")
+    path = manifest_path(log_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    data = json.dumps(manifest, ensure_ascii=False).encode("utf-8")
+    _atomic_write(os.path.dirname(path), os.path.basename(path), lambda f: f.write(data))
+    return len(written)
+
+
+class Compactor:
+    """Background thread that compacts the *.jsonl of every watched directory it holds the lock of."""
+
+    def __init__(self, interval: float = 5.0, suffix: str = ".jsonl", settle: float = SETTLE_SECONDS,
+                 verbose: bool = False):
+        self.interval = interval
+        self.suffix = suffix
+        self.settle = settle
+        self.verbose = verbose
+        self._dirs = set()
+        self._seen: Dict[str, Tuple[int, int]] = {}  # path -> 処理済みの (mtime_ns, size)
+        self._locks: Dict[str, object] = {}          # log_dir -> ロック中のファイル（プロセスが終わるまで開いたまま）
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def watch(self, log_dir: str, start: bool = True):
+        """Start compacting log_dir (once per directory; starts the thread on first use unless start=False)."""
+        log_dir = os.path.abspath(log_dir)
+        with self._lock:
+            self._dirs.add(log_dir)
+            if start and self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="sidecar-compactor", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _acquire(self, log_dir: str) -> bool:
+        """True if this process compacts log_dir (holds its lock file, taken on first success)."""
+        if log_dir in self._locks:
+            return True
+        if fcntl is not None:
+            try:
+                os.makedirs(os.path.join(log_dir, SIDECAR_DIR), exist_ok=True)
+                f = open(os.path.join(log_dir, SIDECAR_DIR, LOCK_NAME), "a")
+            except OSError:
+                return False
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                f.close()
+                return False  # 他のプロセス（別のワーカー）が変換している
+        else:
+            f = None
+        self._locks[log_dir] = f
+        return True
+
+    def run_once(self) -> int:
+        with self._lock:
+            dirs = list(self._dirs)
+        written = 0
+        for log_dir in dirs:
+            if not self._acquire(log_dir):
+                continue
+            try:
+                entries = list_dir(log_dir, self.suffix).entries
+            except OSError:
+                continue
+            now = time.time()
+            for e in entries:
+                # 前回から変わっていないファイルは読まない
+                if self._seen.get(e.path) == (e.mtime_ns, e.size):
+                    continue
+                # 書き込み中のファイルは落ち着くまで待つ（追記のたびに読み直さない）
+                if now - e.mtime_ns / 1e9 < self.settle:
+                    continue
+                if read_manifest(e.path) is None:
+                    try:
+                        written += compact_file(e.path, self.verbose)
+                    except OSError as ex:
+                        print(f"[compact] {e.path}: {ex}")
+                        continue
+                self._seen[e.path] = (e.mtime_ns, e.size)
+        return written
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as ex:
+                print(f"[compact] error: {ex}")
+            self._stop.wait(self.interval)
+
+
+compactor = Compactor()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("log_dir", nargs="?", default="./logs")
+    parser.add_argument("--interval", type=float, default=5.0)
+    parser.add_argument("--settle", type=float, default=SETTLE_SECONDS,
+                        help="skip logs modified within this many seconds")
+    parser.add_argument("--once", action="store_true", help="compact what is finished now and exit")
+    args = parser.parse_args()
+
+    c = Compactor(args.interval, settle=args.settle, verbose=True)
+    c.watch(args.log_dir, start=False)
+    if args.once:
+        print(f"{c.run_once()} runs compacted")
+    else:
+        try:
+            while True:
+                c.run_once()
+                time.sleep(args.interval)
+        except KeyboardInterrupt:
+            pass
@@ -1,15 +1,64 @@
 import os
 import json
+import time
 import dash  # Dash本体。Flask + React + Plotly をまとめたフレームワーク
 from dash import html, dcc, Input, Output, State  # html: HTMLタグ, dcc: Dash Core Components, Input/Output/State: コールバックの入出力宣言
+import flask
 import plotly.graph_objs as go
-from datetime import datetime
+import live_feed
+import sidecar
+from aggregations import AGGREGATIONS, aggregate
+from dir_listing import list_dir
+from downsample import series_for_view, x_range_from_relayout
+from log_cache import LINE_KINDS, get_log_index
+from run_catalog import get_catalog
+from run_stats import SUMMARY_FIELDS
+from shared_cache import cache as shared
 
 
-def build_fig(xs=None, ys=None, title=None):
-    """Build a scatter-only figure with consistent dark styling."""
+# ファイル内容はページ単位で返す（1 レスポンスの上限）
+PAGE_LINES = 200
+PAGE_MAX_BYTES = 256 * 1024
+# ファイル一覧の 1 ページの件数
+FILE_PAGE_SIZE = 100
+# run 検索（カタログ）の表示件数
+RUN_SEARCH_LIMIT = 50
+# 自動更新: ファイル更新の通知（selected-file-version → 一覧・集計などを再計算）は
+# run の追加 / run_end のときはすぐ、それ以外はこの秒数に 1 回までにまとめる
+LIVE_VERSION_INTERVAL = 2.0
+
+# run 比較の選択肢を集めるファイル数（ファイル一覧の新しい順・検索語で絞り込み）
+COMPARE_MAX_FILES = 20
+COMPARE_METRICS = ("p50_ms", "p95_ms", "p99_ms", "mean_ms", "max_ms", "defect_rate", "score_mean")
+
+CONTROL_STYLE = {
+    "padding": "2px 8px",
+    "border": "1px solid #444",
+    "backgroundColor": "#222",
+    "color": "#eee",
+    "cursor": "pointer",
+}
+# file-list / runid-list の行。選択中の行の色はクライアント側で付ける（assets/ui.js の itemStyle と同じ）
+LIST_ITEM_STYLE = {
+    "padding": "6px",
+    "border": "1px solid #333",
+    "marginBottom": "4px",
+    "cursor": "pointer",
+    "borderRadius": "4px",
+    "backgroundColor": "#181818",
+    "color": "#eee",
+}
+
+
+def build_fig(xs=None, ys=None, title=None, x_range=None, uirevision=None):
+    """Build a scatter-only figure with consistent dark styling.
+
+    Long series are cut to x_range and min/max downsampled (downsample.py), and drawn with WebGL.
+    uirevision keeps the user's zoom when the figure is replaced for a new x_range.
+    """
     fig = go.Figure()
     fig.update_layout(
+        uirevision=uirevision,
         height=300,
         margin=dict(l=10, r=6, t=40, b=12),
         title=title or None,
@@ -19,45 +68,105 @@ def build_fig(xs=None, ys=None, title=None):
         xaxis_title="line",
         yaxis_title="d Y",
     )
-    if xs and ys:
-        fig.add_trace(go.Scatter(x=xs, y=ys, mode="markers", name="elapsed_ms"))
+    if xs is not None and ys is not None:
+        # run 選択時は点が 0 個でもトレースを置く（自動更新で extendData の追加先になる）
+        x, y, reduced = series_for_view(xs, ys, x_range)
+        fig.add_trace(go.Scattergl(x=x, y=y, mode="markers", name="elapsed_ms (min/max)" if reduced else "elapsed_ms"))
     return fig
 
 
-def parse_time(value):
-    """Parse time field to a float timestamp (None on failure)."""
-    if value is None:
-        return None
-    if isinstance(value, (int, float)):
-        return float(value)
-    if isinstance(value, str):
-        s = value
-        if "T" in s:
-            try:
-                return datetime.fromisoformat(s).timestamp()
-            except ValueError:
-                # truncate fractional seconds to 6 digits if longer
-                try:
-                    if "." in s:
-                        base, frac = s.split(".", 1)
-                        frac_digits = "".join(ch for ch in frac if ch.isdigit())
-                        frac_adj = (frac_digits[:6]).ljust(6, "0")
-                        return datetime.fromisoformat(f"{base}.{frac_adj}").timestamp()
-                except Exception:
-                    return None
-            except Exception:
-                return None
-        try:
-            return float(s)
-        except Exception:
-            return None
-    return None
+def build_agg_fig(agg, title=None):
+    """Figure of an aggregations.aggregate() result (histogram / rolling rate / heatmap)."""
+    fig = go.Figure()
+    fig.update_layout(
+        height=300,
+        margin=dict(l=10, r=6, t=40, b=12),
+        title=title,
+        template="plotly_dark",
+        paper_bgcolor="#1a1a1a",
+        plot_bgcolor="#111",
+    )
+    if not agg:
+        return fig
+    func = AGGREGATIONS[agg["kind"]][0]
+    if func == "histogram" and agg["counts"]:
+        edges = agg["edges"]
+        fig.add_trace(go.Bar(
+            x=[(a + b) / 2 for a, b in zip(edges[:-1], edges[1:])],
+            y=agg["counts"],
+            width=[b - a for a, b in zip(edges[:-1], edges[1:])],
+            name=agg["column"],
+        ))
+        fig.update_layout(xaxis_title=agg["column"], yaxis_title="frames", bargap=0)
+    elif func == "rolling_rate":
+        fig.add_trace(go.Scatter(x=agg["x"], y=agg["y"], mode="lines", name=f"{agg['column']} rate"))
+        fig.update_layout(xaxis_title="frame_id", yaxis_title=f"{agg['column']} rate (last {agg['window']} frames)")
+    elif func == "heatmap" and agg["counts"]:
+        xe, ye = agg["x_edges"], agg["y_edges"]
+        fig.add_trace(go.Heatmap(
+            x=[(a + b) / 2 for a, b in zip(xe[:-1], xe[1:])],
+            y=[(a + b) / 2 for a, b in zip(ye[:-1], ye[1:])],
+            z=agg["counts"],
+            colorscale="Viridis",
+        ))
+        fig.update_layout(xaxis_title="frame_id", yaxis_title=agg["column"])
+    return fig
+
+
+def build_compare_fig(rows, metric):
+    """Bar chart of metric per run, one trace (color) per model_version."""
+    fig = go.Figure()
+    fig.update_layout(
+        height=300,
+        margin=dict(l=10, r=6, t=40, b=12),
+        title=f"{metric} by run" if rows else None,
+        template="plotly_dark",
+        paper_bgcolor="#1a1a1a",
+        plot_bgcolor="#111",
+        barmode="group",
+        legend_title_text="model_version",
+    )
+    by_version = {}
+    for row in rows:
+        by_version.setdefault(str(row.get("model_version")), []).append(row)
+    for version, group in by_version.items():
+        fig.add_trace(go.Bar(
+            x=[f"{r['run_id']}<br>{r['file']}" for r in group],
+            y=[r.get(metric) for r in group],
+            name=version,
+        ))
+    return fig
+
+
+def _fmt(value):
+    if isinstance(value, float):
+        return "-" if value != value else f"{value:.4g}"
+    return "-" if value is None else str(value)
+
+
+def build_compare_table(rows):
+    """html.Table of the run summaries (SUMMARY_FIELDS) of the compared runs."""
+    if not rows:
+        return "比較する run を選択してください。"
+    columns = ["file", "run_id", "model_version"] + list(SUMMARY_FIELDS)
+    cell = {"padding": "2px 6px", "borderBottom": "1px solid #333", "textAlign": "right"}
+    return html.Table(
+        style={"borderCollapse": "collapse", "marginTop": "4px"},
+        children=[
+            html.Thead(html.Tr([html.Th(c, style=cell) for c in columns])),
+            html.Tbody([html.Tr([html.Td(_fmt(row.get(c)), style=cell) for c in columns]) for row in rows]),
+        ],
+    )
 
 
 # ----------------------------------------
 # Dash アプリ本体の生成
 # ----------------------------------------
 app = dash.Dash(__name__)
+# gunicorn などの WSGI サーバ用（例: gunicorn -w 4 --threads 16 --chdir src simple_dash:server）。
+# /live の SSE は 1 接続で 1 スレッドを使うので、スレッド数は同時に開くタブ数より多めにする。
+# ワーカー間では解析結果・図を shared_cache（SQLite）で共有する。
+server = app.server
 
 # ======================================================
 # layout = 画面に「何をどう配置するか」を定義する部分
@@ -70,8 +179,15 @@ app.layout = html.Div([
     dcc.Store(id="selected-run-id-time"),
     dcc.Store(id="selected-file-version", data={"version": 0, "mtime": None}),
     dcc.Store(id="sidebar-collapsed", data=False),
-    # dcc.Interval: 一定間隔でイベントを発火させるコンポーネント。自動更新用に利用。
-    dcc.Interval(id="auto-refresh-interval", interval=2000, disabled=True),
+    # 自動更新はポーリングではなくサーバからの push（SSE /live）で受ける。
+    # live-cursor: 今グラフに載っている (ファイル, run_id, 点の数)。ストリームはその続きから送られる。
+    # live-points: push された新しい点。detail-graph に extendData で追加する。
+    dcc.Store(id="live-cursor"),
+    dcc.Store(id="live-points"),
+    dcc.Store(id="live-status"),
+    dcc.Store(id="content-page", data=0),
+    dcc.Store(id="file-page", data=0),
+    dcc.Store(id="file-list-key"),
 
     # html.Div: HTMLのdiv要素。styleでCSS指定し、childrenで中に入れるコンポーネントを列挙する。
     html.Div(
@@ -147,6 +263,30 @@ app.layout = html.Div([
                             html.Div([
                                 # .jsonl ファイルの一覧（mtime 降順）
                                 html.Div("file list", style={"fontWeight": "bold", "marginTop": "10px"}),
+                                # ファイル名の絞り込みとページ送り（大量のセグメントがあっても 1 ページ分だけ描画）
+                                dcc.Input(
+                                    id="file-search",
+                                    type="text",
+                                    placeholder="search",
+                                    debounce=True,
+                                    style={
+                                        "padding": "4px",
+                                        "border": "1px solid #444",
+                                        "marginTop": "4px",
+                                        "width": "90%",
+                                        "backgroundColor": "#222",
+                                        "color": "#eee",
+                                    },
+                                ),
+                                html.Div(
+                                    style={"display": "flex", "gap": "6px", "alignItems": "center",
+                                           "marginTop": "4px", "fontSize": "12px"},
+                                    children=[
+                                        html.Button("◀", id="file-prev", n_clicks=0, style=CONTROL_STYLE),
+                                        html.Button("▶", id="file-next", n_clicks=0, style=CONTROL_STYLE),
+                                        html.Span(id="file-page-info", style={"color": "#aaa"}),
+                                    ],
+                                ),
                                 # html.Div 内で動的に子要素を差し替える。子要素には id={"type":"jsonl-item",...} のDivを入れる。
                                 html.Div(id="file-list", style={"marginTop": "4px", "fontSize": "14px"}),
                             ]),
@@ -155,6 +295,27 @@ app.layout = html.Div([
                                 html.Div("run id list", style={"fontWeight": "bold", "marginTop": "10px"}),
                                 html.Div(id="runid-list", style={"marginTop": "4px", "fontSize": "14px"}),
                             ]),
+                            html.Div([
+                                # ログパス内の全ファイルの run を検索（run_catalog.py の SQLite カタログ。ファイルは開かない）
+                                html.Div("run search", style={"fontWeight": "bold", "marginTop": "10px"}),
+                                dcc.Input(
+                                    id="run-search",
+                                    type="text",
+                                    placeholder="v0.1 host:dev fft_size:1024",
+                                    debounce=True,
+                                    style={
+                                        "padding": "4px",
+                                        "border": "1px solid #444",
+                                        "marginTop": "4px",
+                                        "width": "90%",
+                                        "backgroundColor": "#222",
+                                        "color": "#eee",
+                                    },
+                                ),
+                                html.Div(id="run-search-results", style={"marginTop": "4px", "fontSize": "13px"}),
+                                # カタログ作成中だけ有効にして、結果を取り直す
+                                dcc.Interval(id="run-search-poll", interval=1000, disabled=True),
+                            ]),
                         ],
                     ),
                 ]
@@ -175,8 +336,53 @@ app.layout = html.Div([
                         style={"height": "340px", "margin": "0"},
                         figure=build_fig(),
                     ),
-                    # ファイル内容（run_id 選択時はフィルタリング）
+                    # 集計ビュー: score / elapsed_ms の分布、defect 率の推移、frame × 値のヒートマップ。
+                    # サーバ側 (aggregations.py) で集計し、ビンの値だけを送る（run の長さに関係なく一定の量）
+                    dcc.Dropdown(
+                        id="agg-view",
+                        options=[
+                            {"label": "score histogram", "value": "score_hist"},
+                            {"label": "elapsed_ms histogram", "value": "elapsed_hist"},
+                            {"label": "defect rate (rolling)", "value": "defect_rate"},
+                            {"label": "elapsed_ms heatmap", "value": "elapsed_heatmap"},
+                            {"label": "score heatmap", "value": "score_heatmap"},
+                        ],
+                        value="score_hist",
+                        clearable=False,
+                        style={"width": "240px", "color": "#111", "marginTop": "6px"},
+                    ),
+                    dcc.Graph(id="agg-graph", style={"height": "300px", "margin": "0"}, figure=build_agg_fig(None)),
+                    # ファイル内容（run_id 選択時はフィルタリング）。行インデックスから表示中のページだけ読む
                     html.Div("ファイル内容", style={"fontWeight": "bold", "marginTop": "10px"}),
+                    html.Div(
+                        style={
+                            "display": "flex",
+                            "gap": "6px",
+                            "alignItems": "center",
+                            "margin": "4px 0",
+                            "fontSize": "13px",
+                        },
+                        children=[
+                            dcc.Dropdown(
+                                id="content-kind",
+                                options=[{"label": "all", "value": ""}] + [{"label": k, "value": k} for k in LINE_KINDS],
+                                value="",
+                                clearable=False,
+                                style={"width": "150px", "color": "#111"},
+                            ),
+                            html.Button("◀", id="content-prev", n_clicks=0, style=CONTROL_STYLE),
+                            html.Button("▶", id="content-next", n_clicks=0, style=CONTROL_STYLE),
+                            html.Button("末尾", id="content-last", n_clicks=0, style=CONTROL_STYLE),
+                            dcc.Input(
+                                id="content-frame",
+                                type="number",
+                                placeholder="frame_id",
+                                style={**CONTROL_STYLE, "width": "90px", "cursor": "text"},
+                            ),
+                            html.Button("Jump", id="content-jump", n_clicks=0, style=CONTROL_STYLE),
+                            html.Span(id="content-info", style={"color": "#aaa"}),
+                        ],
+                    ),
                     dcc.Textarea(
                         id="file-content",
                         style={
@@ -189,6 +395,29 @@ app.layout = html.Div([
                         },
                         readOnly=True,
                     ),
+                    # run 比較: 複数ファイルの run を選んで、集計値（run_stats）を表とグラフで並べる。
+                    # 集計はインデックス作成時に逐次更新されているので、生の行は読まない。
+                    html.Div("run 比較", style={"fontWeight": "bold", "marginTop": "14px"}),
+                    html.Div(
+                        style={"display": "flex", "gap": "6px", "alignItems": "center", "margin": "4px 0"},
+                        children=[
+                            dcc.Dropdown(
+                                id="compare-runs",
+                                multi=True,
+                                placeholder="比較する run_id（ログパスの新しいファイルから）",
+                                style={"flex": "1", "color": "#111"},
+                            ),
+                            dcc.Dropdown(
+                                id="compare-metric",
+                                options=[{"label": m, "value": m} for m in COMPARE_METRICS],
+                                value="p95_ms",
+                                clearable=False,
+                                style={"width": "150px", "color": "#111"},
+                            ),
+                        ],
+                    ),
+                    dcc.Graph(id="compare-graph", style={"height": "300px"}, figure=build_compare_fig([], "p95_ms")),
+                    html.Div(id="compare-table", style={"fontSize": "12px", "overflowX": "auto"}),
                 ]
             ),
         ]
@@ -199,156 +428,245 @@ app.layout = html.Div([
 # 3) パス直下のファイル一覧を表示する callback
 @app.callback(
     Output("file-list", "children"),
+    Output("file-page", "data"),
+    Output("file-page-info", "children"),
+    Output("file-list-key", "data"),
     Input("text", "value"),
-    Input("selected-file", "data"),
+    Input("file-search", "value"),
+    Input("file-prev", "n_clicks"),
+    Input("file-next", "n_clicks"),
+    Input("selected-file-version", "data"),
+    State("file-page", "data"),
+    State("file-list-key", "data"),
     prevent_initial_call=False,
 )
-def show_files(path, selected_path):
+def show_files(path, query, _prev, _next, _version, page, last_key):
     """
     ログパスの .jsonl を mtime 新しい順に並べ、クリック可能なリストで返す。
     Dashのコールバックは「Outputをどう埋めるか」を定義する関数。
     Input/Stateの値が変わるとこの関数が呼ばれ、返り値がOutputに反映される。
+    一覧は dir_listing のキャッシュから取り、前回描画したときと
+    (fingerprint, 検索語, ページ) が同じなら no_update を返して描画し直さない。
+    選択中の行の強調はクライアント側 (assets/ui.js の highlightFiles) で行うので、選択が変わっても呼ばれない。
     """
+    no_change = (dash.no_update,) * 4
     if not path:
-        return "パスを入力するとファイル一覧を表示します。"
+        return "パスを入力するとファイル一覧を表示します。", 0, "", None
     abs_path = os.path.abspath(path)
     if not os.path.exists(abs_path):
-        return f"存在しないパスです: {abs_path}"
+        return f"存在しないパスです: {abs_path}", 0, "", None
     if not os.path.isdir(abs_path):
-        return f"ディレクトリを指定してください: {abs_path}"
+        return f"ディレクトリを指定してください: {abs_path}", 0, "", None
 
     try:
-        candidates = [e for e in os.listdir(abs_path) if e.endswith(".jsonl")]
-        entries = sorted(
-            candidates,
-            key=lambda name: os.path.getmtime(os.path.join(abs_path, name)),
-            reverse=True,
-        )
+        listing = list_dir(abs_path, ".jsonl")
     except Exception as e:
-        return f"読み取りに失敗しました: {e}"
+        return f"読み取りに失敗しました: {e}", 0, "", None
+
+    trig = dash.callback_context.triggered_id
+    page = page or 0
+    if trig in ("text", "file-search"):
+        page = 0
+    elif trig == "file-prev":
+        page -= 1
+    elif trig == "file-next":
+        page += 1
+    entries, total, page = listing.page(query, page, FILE_PAGE_SIZE)
+
+    key = [listing.fingerprint, query or "", page]
+    if key == last_key:
+        return no_change
 
     if not entries:
-        return f"jsonlファイルがありません: {abs_path}"
+        msg = f"jsonlファイルがありません: {abs_path}" if not query else f"一致するファイルがありません: {query}"
+        return msg, page, "", key
 
-    return [
+    last_page = max((total - 1) // FILE_PAGE_SIZE, 0)
+    info = f"{page * FILE_PAGE_SIZE + 1}-{page * FILE_PAGE_SIZE + len(entries)} / {total} (page {page + 1}/{last_page + 1})"
+    items = [
         html.Div(
-            e,
-            id={"type": "jsonl-item", "path": os.path.join(abs_path, e)},
+            e.name,
+            id={"type": "jsonl-item", "path": e.path},
             n_clicks=0,
-            style={
-                "padding": "6px",
-                "border": "1px solid #333",
-                "marginBottom": "4px",
-                "cursor": "pointer",
-                "borderRadius": "4px",
-                "backgroundColor": "#2f6eff" if os.path.join(abs_path, e) == selected_path else "#181818",
-                "color": "#fff" if os.path.join(abs_path, e) == selected_path else "#eee",
-            }
+            style=LIST_ITEM_STYLE,
         )
         for e in entries
     ]
+    return items, page, info, key
 
 
 @app.callback(
-    Output("file-content", "value"),
     Output("selected-file", "data"),
     Output("detail-graph", "figure"),
+    Output("live-cursor", "data"),
     Input({"type": "jsonl-item", "path": dash.dependencies.ALL}, "n_clicks"),
     Input("selected-run-id", "data"),
+    Input("detail-graph", "relayoutData"),
     State("selected-file", "data"),
     prevent_initial_call=True,
 )
-def show_file_content(n_clicks, selected_run_id, current_file):
+def show_file_content(n_clicks, selected_run_id, relayout, current_file):
     """
-    ファイルクリック or run_id 変更で発火。
-    - ファイルを選択したら内容を表示し、selected-file を更新。
-    - run_id が選択されていれば、その run_id の行だけを表示し、同じデータでグラフ描画。
+    ファイルクリック or run_id 変更 or グラフのズームで発火。
+    - ファイルを選択したら selected-file を更新（内容の表示は render_content_page がページ単位で行う）。
+    - run_id が選択されていれば、その run_id のデータでグラフ描画。
+      点が多いときは表示範囲だけを間引いて送り、ズームしたらその範囲を取り直す（拡大すれば全点になる）。
     DashのInput/Outputは宣言的: Outputで指定したコンポーネント属性を、この関数の返り値で置き換える。
     Stateは「監視はしないが現在値を読みたい」入力。
     """
     ctx = dash.callback_context
     if not ctx.triggered:
-        return dash.no_update, dash.no_update, build_fig()
+        return dash.no_update, build_fig(), dash.no_update
 
     trig = ctx.triggered_id
     triggered_by_run = trig == "selected-run-id"
 
     path = None
     new_selected = dash.no_update
+    x_range = None
 
-    if triggered_by_run:
+    if trig == "detail-graph":
+        x_range = x_range_from_relayout(relayout)
+        if x_range is False or not selected_run_id:
+            return dash.no_update, dash.no_update, dash.no_update
+        path = current_file
+    elif triggered_by_run:
         path = current_file
     else:
         # ファイルクリック時
+        # 一覧を描き直しただけ（n_clicks が全部 0）のときはグラフを消さない
         if not n_clicks or all((c is None or c == 0) for c in n_clicks):
-            return dash.no_update, dash.no_update, build_fig()
+            return dash.no_update, dash.no_update, dash.no_update
         if isinstance(trig, dict):
             path = trig.get("path")
         else:
             try:
                 path = json.loads(ctx.triggered[0]["prop_id"].split(".")[0]).get("path")
             except Exception:
-                return dash.no_update, dash.no_update, build_fig()
+                return dash.no_update, build_fig(), dash.no_update
         new_selected = path
 
     if not path or not os.path.isfile(path):
-        return dash.no_update, dash.no_update, build_fig()
-
-    try:
-        with open(path, "r") as f:
-            lines = f.readlines()
-    except Exception as e:
-        return f"読み取りに失敗しました: {e}", new_selected, build_fig()
+        return dash.no_update, build_fig(), dash.no_update
+    # 開いたファイルのディレクトリを、終了した run を列形式（sidecar.py）に変換する対象にする
+    sidecar.compactor.watch(os.path.dirname(path))
 
     if selected_run_id:
-        filtered = []
-        xs = []
-        ys = []
-        for line in lines:
-            try:
-                obj = json.loads(line)
-            except Exception:
-                continue
-            if obj.get("run_id") == selected_run_id:
-                filtered.append(line.rstrip("\n"))
-                if "frame_id" in obj and "elapsed_ms" in obj:
-                    xs.append(obj.get("frame_id"))
-                    ys.append(obj.get("elapsed_ms"))
-        content = "\n".join(filtered) if filtered else "選択した run_id の行はありません。"
-        fig = build_fig(xs, ys, title=f"{os.path.basename(path)} / run_id={selected_run_id}" if xs and ys else None)
+        try:
+            # 終了済みで変換済みの run は sidecar の列を読み、それ以外は JSONL のインデックスから
+            xs, ys = shared.for_file("frame_series", path, selected_run_id,
+                                     lambda: sidecar.frame_series(path, selected_run_id))
+            # 同じ (ファイルの版, run_id, 表示範囲) の図は作り直さない（別タブ・別ユーザーでも同じものを返す）
+            fig = shared.for_file(
+                "detail_fig", path, json.dumps([selected_run_id, x_range]),
+                lambda: build_fig(xs, ys, title=f"{os.path.basename(path)} / run_id={selected_run_id}" if len(xs) else None,
+                                  x_range=x_range, uirevision=f"{path}|{selected_run_id}").to_dict())
+        except OSError:
+            return new_selected, build_fig(), None
+        if trig == "detail-graph":
+            # ズームでは図だけ差し替え、自動更新のストリームは繋ぎ直さない
+            return dash.no_update, fig, dash.no_update
+        cursor = {"path": path, "run_id": selected_run_id, "count": len(xs)}
     else:
-        content = "".join(lines)
         fig = build_fig()
+        cursor = {"path": path, "run_id": None, "count": 0}
 
-    return content, new_selected, fig
+    return new_selected, fig, cursor
 
 
 @app.callback(
-    Output("runid-list", "children"),
+    Output("file-content", "value"),
+    Output("content-page", "data"),
+    Output("content-info", "children"),
     Input("selected-file", "data"),
     Input("selected-run-id", "data"),
+    Input("content-kind", "value"),
+    Input("content-prev", "n_clicks"),
+    Input("content-next", "n_clicks"),
+    Input("content-last", "n_clicks"),
+    Input("content-jump", "n_clicks"),
+    Input("selected-file-version", "data"),
+    State("content-frame", "value"),
+    State("content-page", "data"),
+)
+def render_content_page(path, run_id, kind, _prev, _next, _last, _jump, _version, frame_id, page):
+    """
+    ファイル内容を PAGE_LINES 行ずつ表示する。
+    行インデックス（行ごとのバイト位置）から表示するページの行だけを seek して読むので、
+    ファイルサイズに関係なく 1 回の応答は PAGE_MAX_BYTES 以下。
+    run_id / 種類 (content-kind) で絞り込み、frame_id の行へジャンプできる。
+    行数と読んだページはワーカー間で共有する（shared_cache、ファイルが変わると作り直し）。
+    """
+    if not path or not os.path.isfile(path):
+        return "", 0, ""
+
+    kind = kind or None
+    try:
+        total = shared.for_file("line_count", path, json.dumps([run_id, kind]),
+                                lambda: get_log_index(path).count_lines(run_id, kind))
+    except OSError as e:
+        return f"読み取りに失敗しました: {e}", 0, ""
+    last_page = max((total - 1) // PAGE_LINES, 0)
+    trig = dash.callback_context.triggered_id
+    page = page or 0
+    msg = ""
+    if trig in ("selected-file", "selected-run-id", "content-kind"):
+        page = 0
+    elif trig == "content-prev":
+        page -= 1
+    elif trig == "content-next":
+        page += 1
+    elif trig == "content-last":
+        page = last_page
+    elif trig == "content-jump":
+        if not run_id:
+            msg = "frame へ移動するには run_id を選択してください。"
+        elif frame_id is None:
+            msg = "frame_id を入力してください。"
+        else:
+            try:
+                pos = get_log_index(path).find_frame(run_id, int(frame_id), kind)
+            except OSError:
+                pos = None
+            if pos is None:
+                msg = f"frame_id={frame_id} が見つかりません。"
+            else:
+                page = pos // PAGE_LINES
+    page = min(max(page, 0), last_page)
+
+    try:
+        lines, total = shared.for_file(
+            "content_page", path, json.dumps([run_id, kind, page]),
+            lambda: get_log_index(path).read_page(run_id, kind, page * PAGE_LINES, PAGE_LINES, PAGE_MAX_BYTES))
+    except OSError as e:
+        return f"読み取りに失敗しました: {e}", page, ""
+    if lines:
+        content = "\n".join(lines)
+    else:
+        content = "選択した run_id の行はありません。" if run_id else ""
+    # 1 ページの上限バイト数で打ち切られた行があれば、黙って消さずに残りの行数を出す
+    omitted = min((page + 1) * PAGE_LINES, total) - (page * PAGE_LINES + len(lines))
+    if lines and omitted > 0:
+        content += f"\n… 残り {omitted} 行はページの上限 ({PAGE_MAX_BYTES // 1024} KB) を超えるため省略しました"
+    first = page * PAGE_LINES + 1 if total else 0
+    info = f"{first}-{page * PAGE_LINES + len(lines)} / {total} 行 (page {page + 1}/{last_page + 1}) {msg}"
+    return content, page, info
+
+
+@app.callback(
+    Output("runid-list", "children"),
+    Input("selected-file", "data"),
     Input("selected-file-version", "data"),
 )
-def update_runid_list(selected_path, selected_run_id, _version):
-    """選択中ファイルの run_end から run_id を抽出し、time 新しい順で表示。_version は監視用ダミー。"""
+def update_runid_list(selected_path, _version):
+    """選択中ファイルの run_end から run_id を抽出し、time 新しい順で表示。_version は監視用ダミー。
+    選択中の run_id の強調はクライアント側 (assets/ui.js の highlightRuns)。"""
     if not selected_path or not os.path.isfile(selected_path):
         return ""
 
-    run_times = {}
     try:
-        with open(selected_path, "r") as f:
-            for line in f:
-                try:
-                    obj = json.loads(line)
-                except Exception:
-                    continue
-                if obj.get("type") == "run_end" and "run_id" in obj:
-                    rid = obj.get("run_id")
-                    t_val = parse_time(obj.get("time"))
-                    prev = run_times.get(rid)
-                    if prev is None or (t_val is not None and (prev is None or t_val > prev)):
-                        run_times[rid] = t_val
-    except Exception as e:
+        run_times = shared.for_file("run_times", selected_path, "", lambda: sidecar.run_times(selected_path))
+    except OSError as e:
         return f"run_id抽出に失敗しました: {e}"
 
     if not run_times:
@@ -368,15 +686,7 @@ def update_runid_list(selected_path, selected_run_id, _version):
             rid,
             id={"type": "runid-item", "runid": rid},
             n_clicks=0,
-            style={
-                "padding": "6px",
-                "border": "1px solid #333",
-                "marginBottom": "4px",
-                "cursor": "pointer",
-                "borderRadius": "4px",
-                "backgroundColor": "#2f6eff" if rid == selected_run_id else "#181818",
-                "color": "#fff" if rid == selected_run_id else "#eee",
-            },
+            style=LIST_ITEM_STYLE,
         )
         for rid in sorted_run_ids
     ]
@@ -402,27 +712,14 @@ def select_run_id(n_clicks, _version, current_selected, selected_file):
     # ユーザークリックか自動更新かを判断
     triggered_id = ctx.triggered_id
 
-    # ユーティリティ: ファイルから run_end 時刻を辞書で返す
+    # ユーティリティ: ファイルから run_end 時刻を辞書で返す（解析結果はプロセス内で共有）
     def load_run_times(path):
-        times = {}
         if not path or not os.path.isfile(path):
-            return times
+            return {}
         try:
-            with open(path, "r") as f:
-                for line in f:
-                    try:
-                        obj = json.loads(line)
-                    except Exception:
-                        continue
-                    if obj.get("type") == "run_end" and "run_id" in obj:
-                        rid = obj.get("run_id")
-                        t_val = parse_time(obj.get("time"))
-                        prev = times.get(rid)
-                        if prev is None or (t_val is not None and (prev is None or t_val > prev)):
-                            times[rid] = t_val
-        except Exception:
-            return times
-        return times
+            return shared.for_file("run_times", path, "", lambda: sidecar.run_times(path))
+        except OSError:
+            return {}
 
     run_times = load_run_times(selected_file)
 
@@ -457,88 +754,289 @@ def select_run_id(n_clicks, _version, current_selected, selected_file):
     return dash.no_update, dash.no_update
 
 
-@app.callback(
+# ---- 表示だけの切り替え（クライアント側、assets/ui.js） ----
+# ボタンの ON/OFF 表示・サイドバーの開閉・選択行の強調はサーバに問い合わせずブラウザ内で行う。
+app.clientside_callback(
+    dash.ClientsideFunction(namespace="ui", function_name="toggleAutoRefresh"),
     Output("auto-refresh", "children"),
     Output("auto-refresh", "style"),
-    Output("auto-refresh-interval", "disabled"),
     Input("auto-refresh", "n_clicks"),
 )
-def toggle_auto_refresh(n_clicks):
-    """自動更新ボタンの ON/OFF 表示と Interval の有効/無効を切り替え。"""
-    on = bool(n_clicks and n_clicks % 2 == 1)
-    label = "自動更新 ON" if on else "自動更新 OFF"
-    base_style = {
-        "padding": "6px 10px",
-        "border": "1px solid #333",
-        "borderRadius": "4px",
-        "cursor": "pointer",
-        "backgroundColor": "#2f6eff" if on else "#222",
-        "color": "#fff" if on else "#eee",
-    }
-    return label, base_style, (not on)
+
+app.clientside_callback(
+    dash.ClientsideFunction(namespace="ui", function_name="toggleSidebar"),
+    Output("sidebar", "style"),
+    Output("sidebar-content", "style"),
+    Output("toggle-sidebar", "children"),
+    Input("toggle-sidebar", "n_clicks"),
+)
+
+app.clientside_callback(
+    dash.ClientsideFunction(namespace="ui", function_name="highlightFiles"),
+    Output({"type": "jsonl-item", "path": dash.dependencies.ALL}, "style"),
+    Input("selected-file", "data"),
+    Input({"type": "jsonl-item", "path": dash.dependencies.ALL}, "id"),
+)
+
+app.clientside_callback(
+    dash.ClientsideFunction(namespace="ui", function_name="highlightRuns"),
+    Output({"type": "runid-item", "runid": dash.dependencies.ALL}, "style"),
+    Input("selected-run-id", "data"),
+    Input({"type": "runid-item", "runid": dash.dependencies.ALL}, "id"),
+)
+
+
+# ---- 集計ビュー ----
+def _aggregate(path, run_id, kind):
+    """run の集計結果（ファイルの版ごとにワーカー間で共有）"""
+    return shared.for_file("agg", path, json.dumps([run_id, kind]),
+                           lambda: aggregate(sidecar.run_columns(path, run_id), kind))
 
 
 @app.callback(
-    Output("selected-file-version", "data"),
-    Input("auto-refresh-interval", "n_intervals"),
-    State("selected-file", "data"),
-    State("selected-file-version", "data"),
+    Output("agg-graph", "figure"),
+    Input("selected-file", "data"),
+    Input("selected-run-id", "data"),
+    Input("agg-view", "value"),
+    Input("selected-file-version", "data"),
+)
+def update_agg_graph(path, run_id, kind, _version):
+    """選択中の run の集計ビュー。自動更新でファイルが伸びたら集計し直す（送るのはビンの値だけ）。"""
+    if not path or not run_id or kind not in AGGREGATIONS or not os.path.isfile(path):
+        return build_agg_fig(None)
+    try:
+        agg = _aggregate(path, run_id, kind)
+    except OSError:
+        return build_agg_fig(None)
+    return build_agg_fig(agg, title=f"{kind} / run_id={run_id}")
+
+
+@app.server.route("/agg")
+def aggregation_endpoint():
+    """集計結果の JSON。/agg?path=...&run_id=...&kind=score_hist（kind は aggregations.AGGREGATIONS）"""
+    path = flask.request.args.get("path")
+    run_id = flask.request.args.get("run_id")
+    kind = flask.request.args.get("kind", "score_hist")
+    if kind not in AGGREGATIONS:
+        return {"error": f"unknown kind: {kind}", "kinds": list(AGGREGATIONS)}, 400
+    if not path or not run_id or not os.path.isfile(path):
+        return {"error": "not found"}, 404
+    try:
+        return _aggregate(os.path.abspath(path), run_id, kind)
+    except OSError as e:
+        return {"error": str(e)}, 404
+
+
+# ---- run 検索（カタログ） ----
+@app.callback(
+    Output("run-search-results", "children"),
+    Output("run-search-poll", "disabled"),
+    Input("text", "value"),
+    Input("run-search", "value"),
+    Input("run-search-poll", "n_intervals"),
 )
-def refresh_selected_file_version(_, selected_file, current):
+def search_runs(path, query, _n):
     """
-    自動更新が ON のときだけ走る。
-    選択ファイルの mtime が変わったら version をインクリメントし、run_id リストを更新させる。
+    カタログから run を検索して一覧表示する。カタログの更新（変更のあったファイルの読み直し）は
+    バックグラウンドで行い、ここでは SQLite を引くだけ。更新中は run-search-poll で取り直す。
+    クリックするとそのファイルと run_id を選択する（open_catalog_item）。
     """
-    if not selected_file or not os.path.isfile(selected_file):
-        return dash.no_update
+    if not query or not path or not os.path.isdir(path):
+        return "", True
+    try:
+        catalog = get_catalog(path)
+        building = catalog.refresh_async()
+        rows = catalog.search(query, limit=RUN_SEARCH_LIMIT)
+    except Exception as e:
+        return f"検索に失敗しました: {e}", True
+    note = [html.Div("カタログを更新中…", style={"color": "#aaa", "fontSize": "11px"})] if building else []
+    if not rows:
+        return note or f"一致する run がありません: {query}", not building
+    return note + [
+        html.Div(
+            id={"type": "catalog-item", "path": row["path"], "runid": row["run_id"]},
+            n_clicks=0,
+            style={
+                "padding": "4px 6px",
+                "border": "1px solid #333",
+                "marginBottom": "4px",
+                "cursor": "pointer",
+                "borderRadius": "4px",
+                "backgroundColor": "#181818",
+            },
+            children=[
+                html.Div(row["run_id"]),
+                html.Div(
+                    f"{row['file']} · {row['model_version'] or '-'} · {row['count'] or 0} frames · p95 {_fmt(row['p95_ms'])} ms",
+                    style={"color": "#aaa", "fontSize": "11px"},
+                ),
+            ],
+        )
+        for row in rows
+    ], not building
+
 
+@app.callback(
+    Output("selected-file", "data", allow_duplicate=True),
+    Output("selected-run-id", "data", allow_duplicate=True),
+    Output("selected-run-id-time", "data", allow_duplicate=True),
+    Input({"type": "catalog-item", "path": dash.dependencies.ALL, "runid": dash.dependencies.ALL}, "n_clicks"),
+    prevent_initial_call=True,
+)
+def open_catalog_item(n_clicks):
+    """検索結果のクリックで、その run のファイルと run_id を選択する。"""
+    trig = dash.callback_context.triggered_id
+    if not isinstance(trig, dict) or not n_clicks or all((c is None or c == 0) for c in n_clicks):
+        return dash.no_update, dash.no_update, dash.no_update
+    path, rid = trig.get("path"), trig.get("runid")
+    if not path or not os.path.isfile(path):
+        return dash.no_update, dash.no_update, dash.no_update
     try:
-        mtime = os.path.getmtime(selected_file)
+        run_time = shared.for_file("run_times", path, "", lambda: sidecar.run_times(path)).get(rid)
     except OSError:
-        return dash.no_update
+        run_time = None
+    return path, rid, run_time
 
-    current = current or {"version": 0, "mtime": None}
-    if current.get("mtime") == mtime:
-        return dash.no_update
 
-    return {"version": current.get("version", 0) + 1, "mtime": mtime}
+# ---- run 比較 ----
+def _run_summaries(path):
+    """ファイル内の全 run の集計（ワーカー間で共有。ファイルが変わるまで再計算しない）"""
+    return shared.for_file("run_summaries", path, "", lambda: sidecar.run_summaries(path))
+
 
-# ---- サイドバー表示切替 ----
 @app.callback(
-    Output("sidebar", "style"),
-    Output("sidebar-content", "style"),
-    Output("toggle-sidebar", "children"),
-    Input("toggle-sidebar", "n_clicks"),
+    Output("compare-runs", "options"),
+    Input("text", "value"),
+    Input("file-search", "value"),
+    Input("selected-file-version", "data"),
+)
+def update_compare_options(path, query, _version):
+    """ログパスの新しいファイル（最大 COMPARE_MAX_FILES 個）の run_id を比較の選択肢にする。値は [path, run_id] の JSON。"""
+    if not path or not os.path.isdir(path):
+        return []
+    try:
+        entries = list_dir(os.path.abspath(path), ".jsonl").filtered(query)[:COMPARE_MAX_FILES]
+    except OSError:
+        return []
+    options = []
+    for e in entries:
+        try:
+            summaries = _run_summaries(e.path)
+        except OSError:
+            continue
+        for rid, s in summaries.items():
+            options.append({"label": f"{rid} [{s['model_version']}] {e.name}", "value": json.dumps([e.path, rid])})
+    return options
+
+
+@app.callback(
+    Output("compare-graph", "figure"),
+    Output("compare-table", "children"),
+    Input("compare-runs", "value"),
+    Input("compare-metric", "value"),
+    Input("selected-file-version", "data"),
 )
-def toggle_sidebar(n):
+def render_compare(values, metric, _version):
+    """選択した run の集計（件数・平均・p50/p95/p99/max・defect 率・score）を表と model_version 別の棒グラフで表示。"""
+    rows = []
+    for value in values or []:
+        try:
+            path, rid = json.loads(value)
+            summary = _run_summaries(path).get(rid)
+        except (ValueError, OSError):
+            continue
+        if summary is not None:
+            rows.append(dict(summary, run_id=rid, file=os.path.basename(path)))
+    return build_compare_fig(rows, metric), build_compare_table(rows)
+
+
+# ---- 自動更新（server push） ----
+# 自動更新 ON の間、ブラウザは /live を EventSource で購読する。
+# 接続/切断と extendData への反映はクライアント側コールバック (assets/live.js)。
+app.clientside_callback(
+    dash.ClientsideFunction(namespace="live", function_name="connect"),
+    Output("live-status", "data"),
+    Input("auto-refresh", "n_clicks"),
+    Input("live-cursor", "data"),
+)
+
+app.clientside_callback(
+    dash.ClientsideFunction(namespace="live", function_name="extend"),
+    Output("detail-graph", "extendData"),
+    Input("live-points", "data"),
+    prevent_initial_call=True,
+)
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.server.route("/live")
+def live_stream():
     """
-    サイドバーの表示/非表示を切り替える。ボタンは常に右上に残し、コンテンツのみ畳む。
+    SSE ストリーム。ファイル監視（live_feed）で変更を待ち、
+    - event: points  … run_id の after 番目以降の (frame_id, elapsed_ms) だけ
+    - event: version … ファイルが更新された（run_id リストなどの更新用）
+    を送る。送る量は追記分だけなのでファイルサイズに比例しない。
+    version はサーバ側のコールバックを一通り動かすので、run の追加 / run_end があったときはすぐ、
+    それ以外の追記は LIVE_VERSION_INTERVAL 秒に 1 回までにまとめて送る（points は毎回）。
     """
-    base_style = {
-        "width": "19%",
-        "minWidth": "180px",
-        "backgroundColor": "#1a1a1a",
-        "padding": "10px",
-        "border": "1px solid #333",
-        "borderRadius": "6px",
-        "transition": "all 0.25s ease",
-    }
-    collapsed = bool(n and n % 2 == 1)
-    if collapsed:
-        content_style = {"display": "none"}
-        collapsed_style = {
-            "width": "24px",
-            "minWidth": "24px",
-            "backgroundColor": "#1a1a1a",
-            "padding": "8px",
-            "border": "1px solid #333",
-            "borderRadius": "6px",
-            "transition": "all 0.25s ease",
-        }
-        return collapsed_style, content_style, "▶"
-
-    content_style = {"display": "block"}
-    return base_style, content_style, "≡"
+    path = flask.request.args.get("path")
+    run_id = flask.request.args.get("run_id") or None
+    try:
+        after = max(int(flask.request.args.get("after", 0)), 0)
+    except ValueError:
+        after = 0
+    if not path or not os.path.isfile(path):
+        return flask.Response("not found", status=404)
+    path = os.path.abspath(path)
+    live_feed.feed.watch(path)
+
+    def stream():
+        sent = after
+        version = live_feed.feed.version(path)
+        mtime = None
+        run_times = None
+        pending = False   # まだ知らせていない更新がある
+        last_sent = 0.0
+        yield "retry: 2000\n\n"
+        while True:
+            try:
+                idx = get_log_index(path)
+            except OSError:
+                return
+            if run_id:
+                xs, ys = idx.frame_series(run_id, start=sent)
+                if xs:
+                    sent += len(xs)
+                    yield _sse("points", {"x": xs, "y": [None if y != y else y for y in ys]})  # NaN -> null
+            if mtime is not None and idx.mtime_ns != mtime:
+                pending = True
+            mtime = idx.mtime_ns
+            times = idx.run_times()
+            runs_changed = run_times is not None and times != run_times
+            run_times = times
+            now = time.monotonic()
+            if pending and (runs_changed or now - last_sent >= LIVE_VERSION_INTERVAL):
+                yield _sse("version", {"mtime": mtime})
+                pending = False
+                last_sent = now
+            # まとめ待ちの更新があれば、その送信時刻に起きる
+            timeout = max(last_sent + LIVE_VERSION_INTERVAL - now, 0.05) if pending else 15
+            new_version = live_feed.feed.wait(path, version, timeout=timeout)
+            if new_version == version and not pending:
+                yield ": keepalive\n\n"
+            version = new_version
+
+    return flask.Response(stream(), mimetype="text/event-stream",
+                          headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.server.route("/_cache")
+def cache_stats():
+    """このワーカーのキャッシュのヒット/ミス数とサイズ（プロセス内 LRU と共有 SQLite）。"""
+    return shared.stats()
 
 
 # ======================================================
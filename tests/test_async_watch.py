@@ -0,0 +1,37 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from main import CheckpointStore, watch_tail  # noqa: E402
+
+
+def test_checkpoint_backlog_larger_than_maxsize(tmp_path):
+    # 停止中に書かれた分（チェックポイントより後）が maxsize より多くても、イベントループを止めずに全部届く
+    log = tmp_path / "test0.log"
+    lines = [f"line {i:04d}" for i in range(40)]
+    log.write_text("".join(line + "\n" for line in lines))
+    st = os.stat(log)
+    state = tmp_path / "state.json"
+    state.write_text(json.dumps({str(log): {"inode": [st.st_dev, st.st_ino], "offset": 0}}))
+    checkpoints = CheckpointStore(str(state))
+
+    received = []
+
+    async def consume():
+        async for event in watch_tail(str(tmp_path), r"test\d+\.log", maxsize=2, backend="polling",
+                                      poll_interval=0.1, chunk_size=16, checkpoints=checkpoints):
+            received.extend(event.data.splitlines())
+            if len(received) >= len(lines):
+                break
+
+    # 以前はループのスレッドごと止まり wait_for も効かなかったので、別スレッドで待つ
+    t = threading.Thread(target=lambda: asyncio.run(asyncio.wait_for(consume(), 10)), daemon=True)
+    t.start()
+    t.join(15)
+    checkpoints.close()
+    assert not t.is_alive(), "watch_tail deadlocked on the checkpoint backlog"
+    assert received == lines
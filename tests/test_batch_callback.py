@@ -0,0 +1,54 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from main import BatchCallback  # noqa: E402
+
+
+def test_batches_are_cut_at_max_batch():
+    batches = []
+    batcher = BatchCallback(batches.append, max_batch=3, max_latency=60)
+    batcher("append", "a.log", "1\n2\n3\n4\n5\n")
+    batcher("create", "images/x.png", None)
+    batcher.close(5)
+    assert [len(b) for b in batches] == [3, 3]
+    assert batches[1][-1] == ("create", "images/x.png", None)
+    assert batcher.stats() == {"events": 2, "lines": 5, "batches": 2, "dropped": 0, "pending": 0}
+
+
+def test_partial_batch_is_delivered_after_max_latency():
+    done = threading.Event()
+    batches = []
+
+    def on_batch(items):
+        batches.append(items)
+        done.set()
+
+    batcher = BatchCallback(on_batch, max_batch=100, max_latency=0.05)
+    t0 = time.monotonic()
+    batcher("append", "a.log", "1\n2\n")
+    assert done.wait(5)
+    assert time.monotonic() - t0 >= 0.04
+    assert batches == [[("append", "a.log", "1"), ("append", "a.log", "2")]]
+    batcher.close(5)
+
+
+def test_items_over_max_pending_are_dropped_and_counted():
+    release = threading.Event()
+    batches = []
+
+    def on_batch(items):
+        release.wait(5)  # 消費側が詰まっている
+        batches.append(items)
+
+    batcher = BatchCallback(on_batch, max_batch=2, max_latency=0, max_pending=4)
+    batcher("append", "a.log", "1\n2\n")
+    time.sleep(0.1)  # 1 バッチ目がコールバックに入るまで待つ
+    batcher("append", "a.log", "3\n4\n5\n6\n7\n")
+    assert batcher.stats()["dropped"] == 1
+    release.set()
+    batcher.close(5)
+    assert [line for b in batches for _, _, line in b] == ["1", "2", "3", "4", "5", "6"]
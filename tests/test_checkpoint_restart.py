@@ -0,0 +1,73 @@
+import os
+import sys
+import time
+
+from watchdog.events import FileModifiedEvent
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from main import CheckpointStore, MultiTailHandler, TailHandler  # noqa: E402
+
+
+def append(path, *lines):
+    with open(path, "a") as f:
+        f.write("".join(line + "\n" for line in lines))
+
+
+def first_run(tmp_path, handler_cls, **kwargs):
+    # 1 回目: test1 を追って a1, a2 まで届けたところで停止
+    log1 = tmp_path / "test1.log"
+    log1.write_text("")
+    state = tmp_path / "state.json"
+    checkpoints = CheckpointStore(str(state))
+    received = []
+    handler = handler_cls(str(tmp_path), r"test\d+\.log", callback=lambda k, p, d: received.extend(d.splitlines()),
+                          verbose=False, checkpoints=checkpoints, **kwargs)
+    append(log1, "a1", "a2")
+    handler.on_modified(FileModifiedEvent(str(log1)))
+    if isinstance(handler, MultiTailHandler):
+        handler.executor.shutdown(wait=True)
+        handler.close()
+    checkpoints.close()
+    assert received == ["a1", "a2"]
+
+    # 停止中: test1 に追記し、test2 が作られる
+    time.sleep(0.05)
+    append(log1, "a3")
+    append(tmp_path / "test2.log", "b1", "b2")
+    return state
+
+
+def test_tail_restart_delivers_everything_written_while_down(tmp_path):
+    state = first_run(tmp_path, TailHandler)
+    checkpoints = CheckpointStore(str(state))
+    received = []
+    handler = TailHandler(str(tmp_path), r"test\d+\.log", callback=lambda k, p, d: received.extend(d.splitlines()),
+                          verbose=False, checkpoints=checkpoints)
+    log2 = tmp_path / "test2.log"
+    append(log2, "b3")
+    handler.on_modified(FileModifiedEvent(str(log2)))
+    checkpoints.close()
+    assert received == ["a3", "b1", "b2", "b3"]
+
+
+def test_tail_restart_applies_backlog_limit_to_new_files(tmp_path):
+    state = first_run(tmp_path, TailHandler)
+    checkpoints = CheckpointStore(str(state))
+    received = []
+    TailHandler(str(tmp_path), r"test\d+\.log", callback=lambda k, p, d: received.extend(d.splitlines()),
+                verbose=False, checkpoints=checkpoints, skip_backlog=True)
+    checkpoints.close()
+    assert received == ["a3"]
+
+
+def test_multi_restart_catches_up_files_outside_max_files(tmp_path):
+    state = first_run(tmp_path, MultiTailHandler)
+    checkpoints = CheckpointStore(str(state))
+    received = []
+    handler = MultiTailHandler(str(tmp_path), r"test\d+\.log", callback=lambda k, p, d: received.extend(d.splitlines()),
+                               max_files=1, verbose=False, checkpoints=checkpoints)
+    handler.executor.shutdown(wait=True)
+    handler.close()
+    checkpoints.close()
+    assert sorted(received) == ["a3", "b1", "b2"]
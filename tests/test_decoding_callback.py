@@ -0,0 +1,24 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from log_records import DecodingCallback  # noqa: E402
+
+
+def frame(run_id, frame_id):
+    return json.dumps({"type": "frame_result", "time": "2025-11-18T21:49:09.836763000", "run_id": run_id,
+                       "frame_id": frame_id, "elapsed_ms": 1.0, "defect": False, "score": 0.5}) + "\n"
+
+
+def test_same_run_id_in_two_files_is_kept_apart():
+    got = []
+    decoder = DecodingCallback(lambda kind, path, records: got.append((path, records and len(records))))
+    decoder("append", "a.jsonl", frame("run_1", 0) + frame("run_1", 1))
+    decoder("append", "b.jsonl", frame("run_1", 0))
+    decoder("create", "images/x.png", None)
+    assert got == [("a.jsonl", 2), ("b.jsonl", 1), ("images/x.png", None)]
+    assert list(decoder.decoders["a.jsonl"].runs["run_1"].frame_id) == [0, 1]
+    assert list(decoder.decoders["b.jsonl"].runs["run_1"].frame_id) == [0]
+    assert decoder.counts["frame_result"] == 3
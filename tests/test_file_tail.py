@@ -0,0 +1,83 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from main import FileTail  # noqa: E402
+
+
+def read_lines(tail):
+    return [line for data in tail.read_available() for line in data.splitlines()]
+
+
+def test_partial_lines_are_held_back(tmp_path):
+    log = tmp_path / "test0.log"
+    log.write_bytes(b"one\ntw")
+    tail = FileTail(str(log), chunk_size=4)
+    assert read_lines(tail) == ["one"]
+    assert tail.offset == 4
+    with open(log, "ab") as f:
+        f.write("o ü".encode()[:-1])  # UTF-8 の途中で切れている
+    assert read_lines(tail) == []
+    with open(log, "ab") as f:
+        f.write("o ü".encode()[-1:] + b"\n")
+    assert read_lines(tail) == ["two ü"]
+    tail.close()
+
+
+def test_align_skips_to_next_line(tmp_path):
+    log = tmp_path / "test0.log"
+    log.write_text("first line\nsecond\n")
+    tail = FileTail(str(log), offset=3, align=True)
+    assert read_lines(tail) == ["second"]
+    tail.close()
+
+
+def test_rotation_drains_old_file_then_reads_new_one(tmp_path):
+    log = tmp_path / "test0.log"
+    log.write_text("a1\n")
+    tail = FileTail(str(log))
+    assert read_lines(tail) == ["a1"]
+    with open(log, "a") as f:
+        f.write("a2\na3")  # 改行なしの最終行
+    os.rename(log, tmp_path / "test0.log.1")
+    log.write_text("b1\n")
+    assert read_lines(tail) == ["a2", "a3", "b1"]
+    tail.close()
+
+
+def test_truncation_reads_from_start(tmp_path):
+    log = tmp_path / "test0.log"
+    log.write_text("a1\na2\na3\n")
+    tail = FileTail(str(log))
+    assert read_lines(tail) == ["a1", "a2", "a3"]
+    log.write_text("b1\n")
+    assert read_lines(tail) == ["b1"]
+    tail.close()
+
+
+def test_truncate_then_regrow_past_position(tmp_path):
+    # 次の読み込みまでに切り詰め→元より長く書き直された場合（サイズだけでは分からない）
+    log = tmp_path / "test0.log"
+    log.write_text("a1\na2\n")
+    tail = FileTail(str(log))
+    assert read_lines(tail) == ["a1", "a2"]
+    with open(log, "w") as f:
+        f.write("b1 rewritten\nb2\n")
+    assert read_lines(tail) == ["b1 rewritten", "b2"]
+    with open(log, "a") as f:
+        f.write("b3\n")
+    assert read_lines(tail) == ["b3"]
+    tail.close()
+
+
+def test_resume_offset_keeps_checking_for_rewrites(tmp_path):
+    log = tmp_path / "test0.log"
+    log.write_text("a1\na2\n")
+    tail = FileTail(str(log), offset=3)
+    assert read_lines(tail) == ["a2"]
+    tail.close()
+    tail = FileTail(str(log), offset=6)
+    log.write_text("xxxxxxxx\n")
+    assert read_lines(tail) == ["xxxxxxxx"]
+    tail.close()
@@ -0,0 +1,79 @@
+import calendar
+import os
+import sys
+from datetime import datetime, timezone
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from log_records import NAT_NS, parse_time, parse_time_ns, parse_time_ns_array  # noqa: E402
+
+
+def legacy_parse_time(value):
+    """以前の simple_dash.parse_time（naive を UTC として読むようにだけ変更）。比較の基準"""
+    if not isinstance(value, str) or "T" not in value:
+        return None
+    try:
+        return datetime.fromisoformat(value).replace(tzinfo=timezone.utc).timestamp()
+    except ValueError:
+        if "." not in value:
+            return None
+        base, frac = value.split(".", 1)
+        frac_digits = "".join(ch for ch in frac if ch.isdigit())
+        try:
+            return datetime.fromisoformat(f"{base}.{frac_digits[:6].ljust(6, '0')}").replace(
+                tzinfo=timezone.utc).timestamp()
+        except ValueError:
+            return None
+
+
+def log_times(count=20000):
+    base = calendar.timegm((2025, 11, 18, 21, 49, 9))
+    times = []
+    for i in range(count):
+        sec, frac = divmod(i * 58000123, 1_000_000_000)
+        t = datetime.fromtimestamp(base + sec, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+        times.append(f"{t}.{frac:09d}")
+    return times
+
+
+EDGE_CASES = [
+    "2025-11-18T21:49:09",
+    "2025-11-18T21:49:09.5",
+    "2025-11-18T21:49:09.1234567891",
+    "2024-02-29T00:00:00.1",
+    "2025-02-30T00:00:00.1",   # 存在しない日付
+    "2025-02-29T00:00:00",
+    "2025-13-01T00:00:00.1",
+    "2025-11-18T21:49:09.",
+    "2025-1-18T21:49:09.55",
+    "２025-11-18T21:49:09.1",
+    "2025-11-18T21:49:09.1Z",
+    "x",
+]
+
+
+def test_matches_legacy_parser():
+    for t in log_times() + EDGE_CASES:
+        ns = parse_time_ns(t)
+        legacy = legacy_parse_time(t)
+        if ns is None:
+            continue  # 固定レイアウト以外は parse_time が一般のパーサで読む
+        assert legacy is not None, t
+        assert abs(ns / 1e9 - legacy) < 2e-6, (t, ns, legacy)
+
+
+def test_array_matches_scalar():
+    values = log_times() + EDGE_CASES + [None, 5, "2025-11-18 21:49:09.5"]
+    got = parse_time_ns_array(values)
+    want = [parse_time_ns(v) for v in values]
+    assert got.dtype == np.int64
+    assert [None if g == NAT_NS else int(g) for g in got] == want
+
+
+def test_invalid_dates_are_rejected():
+    assert parse_time_ns("2025-02-30T00:00:00.1") is None
+    assert parse_time_ns("2023-02-29T00:00:00") is None
+    assert parse_time_ns("2000-02-29T00:00:00") is not None
+    assert parse_time("2025-11-18T21:49:09+09:00") == datetime(2025, 11, 18, 12, 49, 9, tzinfo=timezone.utc).timestamp()
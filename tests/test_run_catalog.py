@@ -0,0 +1,48 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from run_catalog import RunCatalog  # noqa: E402
+
+
+def write_run(f, run_id, model_version, fft_size, end_time):
+    env = {"host_name": "dev-01", "model_name": "m", "model_version": model_version}
+    f.write(json.dumps({"type": "run_start", "time": "2025-11-18T21:00:00.000000000", "run_id": run_id,
+                        "env": env, "meta": {"fft_size": fft_size}}) + "\n")
+    f.write(json.dumps({"type": "frame_result", "time": "2025-11-18T21:00:00.100000000", "run_id": run_id,
+                        "env": env, "frame_id": 0, "elapsed_ms": 1.5, "defect": False, "score": 0.5}) + "\n")
+    f.write(json.dumps({"type": "run_end", "time": end_time, "run_id": run_id, "env": env, "meta": {}}) + "\n")
+
+
+def make_catalog(tmp_path):
+    with open(tmp_path / "_00000.jsonl", "w") as f:
+        write_run(f, "a_1", "v1", 1024, "2025-11-18T21:00:01.000000000")
+        write_run(f, "ab1", "v2", 2048, "2025-11-18T21:00:02.000000000")
+    with open(tmp_path / "_00001.jsonl", "w") as f:
+        write_run(f, "run%x", "v1", 1024, "2025-11-18T21:00:03.000000000")
+    catalog = RunCatalog(str(tmp_path), db_path=str(tmp_path / "catalog.sqlite"))
+    catalog.refresh()
+    return catalog
+
+
+def run_ids(rows):
+    return [row["run_id"] for row in rows]
+
+
+def test_search_terms(tmp_path):
+    catalog = make_catalog(tmp_path)
+    # 新しい run_end が先
+    assert run_ids(catalog.search("")) == ["run%x", "ab1", "a_1"]
+    assert run_ids(catalog.search("version:v1")) == ["run%x", "a_1"]
+    assert run_ids(catalog.search("fft_size:2048")) == ["ab1"]
+    assert run_ids(catalog.search("file:_00001 finished:1")) == ["run%x"]
+    assert catalog.search("a_1")[0]["count"] == 1
+
+
+def test_like_wildcards_are_literal(tmp_path):
+    catalog = make_catalog(tmp_path)
+    assert run_ids(catalog.search("run:a_1")) == ["a_1"]
+    assert run_ids(catalog.search("%")) == ["run%x"]
+    assert run_ids(catalog.search("run:_")) == ["a_1"]
@@ -0,0 +1,67 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from shared_cache import SharedCache, decode_value, encode_value  # noqa: E402
+
+
+def test_round_trip():
+    value = {
+        "lines": ["a", "b"],
+        "page": (3, None, True),
+        "stats": {"p95": 1.5, "count": np.int64(7)},
+        "xs": np.arange(5, dtype=np.int64),
+        "mask": np.array([[True, False], [False, True]]),
+        "日本語": "\u0000 in a value is fine",
+    }
+    got = decode_value(encode_value(value))
+    assert got["lines"] == ["a", "b"]
+    assert got["page"] == (3, None, True)
+    assert got["stats"] == {"p95": 1.5, "count": 7}
+    assert got["xs"].dtype == np.int64 and list(got["xs"]) == [0, 1, 2, 3, 4]
+    assert got["mask"].shape == (2, 2) and got["mask"][1, 1]
+    assert not got["xs"].flags.writeable
+    assert got["日本語"] == "\u0000 in a value is fine"
+
+
+@pytest.mark.parametrize("value", [
+    object(),
+    {1: "int key"},
+    {"\0tuple": [1]},  # 型の印と紛らわしいキー
+    np.array(["a", None], dtype=object),
+    {1, 2},
+])
+def test_unsupported_values_raise(value):
+    with pytest.raises(TypeError):
+        encode_value(value)
+
+
+def test_object_array_is_not_decoded():
+    data = encode_value(np.arange(2)).replace(b"<i8", b"|O")
+    with pytest.raises(ValueError):
+        decode_value(data)
+
+
+def test_get_or_compute_shares_through_sqlite(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"xs": np.arange(3)}
+
+    first = SharedCache(path)
+    assert list(first.get_or_compute("ns", "k", "fp1", compute)["xs"]) == [0, 1, 2]
+    # 別プロセス相当（ローカル LRU は空）でも SQLite から読める
+    second = SharedCache(path)
+    assert list(second.get_or_compute("ns", "k", "fp1", compute)["xs"]) == [0, 1, 2]
+    assert len(calls) == 1
+    # fingerprint が変われば計算し直す
+    second.get_or_compute("ns", "k", "fp2", compute)
+    assert len(calls) == 2
+    # 保存できない値は返すだけ
+    assert second.set("ns", "bad", "fp", object()) is None
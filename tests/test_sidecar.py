@@ -0,0 +1,72 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import sidecar  # noqa: E402
+
+
+def run_lines(run_id, frames, start=0):
+    t = "2025-11-18T21:49:09.836705000"
+    lines = [{"type": "run_start", "time": t, "run_id": run_id, "env": {"host": "a"}, "meta": {}}]
+    for i in range(start, start + frames):
+        lines.append({"type": "frame_result", "time": t, "run_id": run_id, "frame_id": i,
+                      "elapsed_ms": 0.5 * i, "defect": i % 3 == 0, "score": float(i)})
+    lines.append({"type": "run_end", "time": t, "run_id": run_id, "env": {"host": "a"}, "meta": {}})
+    return "".join(json.dumps(line) + "\n" for line in lines)
+
+
+def test_compact_and_load_columns(tmp_path):
+    log = tmp_path / "_00000.jsonl"
+    log.write_text(run_lines("r1", 5) + run_lines("r2", 3))
+    assert sidecar.compact_file(str(log)) == 2
+
+    columns = sidecar.load_run_columns(str(log), "r1")
+    assert list(columns["frame_id"]) == [0, 1, 2, 3, 4]
+    assert list(columns["defect"]) == [True, False, False, True, False]
+    assert sidecar.read_header(str(log), "r2")["count"] == 3
+    assert set(sidecar.run_summaries(str(log))) == {"r1", "r2"}
+    # 変換済みなら書き直さない
+    assert sidecar.compact_file(str(log)) == 0
+
+
+def test_late_append_to_finished_run_is_not_hidden(tmp_path):
+    log = tmp_path / "_00000.jsonl"
+    log.write_text(run_lines("r1", 5))
+    sidecar.compact_file(str(log))
+    assert sidecar.load_run_columns(str(log), "r1") is not None
+
+    # run_end のあとで同じ run_id のフレームが追記された: 末尾 CRC は通るが sidecar は途中までしかない
+    with open(log, "a") as f:
+        f.write(run_lines("r1", 2, start=5))
+    assert sidecar.load_run_columns(str(log), "r1") is None
+    xs, _ = sidecar.frame_series(str(log), "r1")
+    assert list(xs) == [0, 1, 2, 3, 4, 5, 6]
+
+    # 変換し直しても分割された run には sidecar を使わない
+    sidecar.compact_file(str(log))
+    assert sidecar.read_manifest(str(log))["runs"]["r1"]["split"]
+    assert sidecar.load_run_columns(str(log), "r1") is None
+
+
+def test_rewritten_log_falls_back_to_jsonl(tmp_path):
+    log = tmp_path / "_00000.jsonl"
+    log.write_text(run_lines("r1", 5))
+    sidecar.compact_file(str(log))
+    log.write_text(run_lines("r1", 4))
+    assert sidecar.read_header(str(log), "r1") is None
+    xs, _ = sidecar.frame_series(str(log), "r1")
+    assert list(xs) == [0, 1, 2, 3]
+
+
+def test_compactor_waits_for_settle(tmp_path):
+    log = tmp_path / "_00000.jsonl"
+    log.write_text(run_lines("r1", 2))
+    c = sidecar.Compactor(settle=3600)
+    c.watch(str(tmp_path), start=False)
+    assert c.run_once() == 0
+    assert sidecar.read_manifest(str(log)) is None
+    c.settle = 0
+    assert c.run_once() == 1
+    assert sidecar.read_manifest(str(log)) is not None
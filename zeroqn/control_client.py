@@ -1,4 +1,6 @@
 import zmq
+import sys
+import json
 import time
 
 context = zmq.Context()
@@ -7,18 +9,19 @@ context = zmq.Context()
 req = context.socket(zmq.REQ)
 req.connect("tcp://localhost:5555")
 
-# SUB: 状態購読
+# SUB: 状態購読（引数でトピックを絞れる: status / log. / image.create）
 sub = context.socket(zmq.SUB)
 sub.connect("tcp://localhost:5556")
-sub.setsockopt_string(zmq.SUBSCRIBE, "")
+for topic in sys.argv[1:] or [""]:
+    sub.setsockopt_string(zmq.SUBSCRIBE, topic)
 
 # 状態受信スレッド
 import threading
 
 def recv_status():
     while True:
-        msg = sub.recv_json()
-        print("[STATUS]", msg)
+        topic, body = sub.recv_multipart()
+        print(f"[{topic.decode()}]", json.loads(body))
 
 threading.Thread(target=recv_status, daemon=True).start()
 
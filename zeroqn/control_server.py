@@ -1,6 +1,69 @@
 import zmq
 import time
 import json
+import argparse
+import os
+import sys
+import threading
+
+# src/main.py の監視ロジックを使う
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from main import WATCH_BACKENDS  # noqa: E402
+
+# PUB は [topic, json] のマルチパートで送る
+#   status        : 状態
+#   log.append    : 追記された行   {"path", "lines"}
+#   log.switch    : 最新ログ切替時の既存行 {"path", "lines"}
+#   image.create  : 新規ファイル   {"path"}
+BRIDGE_ENDPOINT = "inproc://watch-bridge"
+# 1 回のループで中継する監視イベントの上限（残りは次のループ。コマンド応答と状態配信を待たせない）
+BRIDGE_BATCH = 100
+
+
+def start_bridge(context, log_dir, pattern, image_dir, backend):
+    """ファイル監視のイベントを inproc PUSH で PUB ループへ渡す。
+
+    zmq のソケットはスレッドをまたいで使えないので、監視スレッドごとに
+    PUSH ソケットを作り、PUB への送信はメインループだけが行う。
+    (observer, 作った PUSH ソケットのリスト) を返す。ソケットは observer を join した後に閉じる。
+    """
+    from main import create_observer, schedule_newfile, schedule_tailfile
+
+    local = threading.local()
+    sockets = []
+    sockets_lock = threading.Lock()
+
+    def on_event(kind, path, data):
+        sock = getattr(local, "sock", None)
+        if sock is None:
+            sock = local.sock = context.socket(zmq.PUSH)
+            sock.connect(BRIDGE_ENDPOINT)
+            with sockets_lock:
+                sockets.append(sock)
+        if kind == "create":
+            topic = "image.create"
+            body = {"time": time.time(), "path": path}
+        else:
+            topic = f"log.{kind}"
+            body = {"time": time.time(), "path": path, "lines": (data or "").splitlines()}
+        sock.send_multipart([topic.encode(), json.dumps(body, ensure_ascii=False).encode()])
+
+    observer = create_observer(backend)
+    if log_dir:
+        schedule_tailfile(observer, log_dir, pattern, on_event, skip_backlog=True, verbose=False)
+    if image_dir:
+        schedule_newfile(observer, image_dir, on_event, verbose=False)
+    observer.start()
+    return observer, sockets
+
+
+parser = argparse.ArgumentParser(description="REP command server + PUB status (and optional log bridge)")
+parser.add_argument("--bridge-logs", default=None, help="publish lines appended to the newest log in this directory")
+parser.add_argument("--bridge-pattern", default=r"test\d+\.log", help="regex of log file names to tail")
+parser.add_argument("--bridge-images", default=None, help="publish files created in this directory")
+parser.add_argument("--backend", choices=WATCH_BACKENDS, default="auto", help="watch backend")
+parser.add_argument("--status-hz", type=float, default=10.0, help="status publish rate (0 = do not publish status)")
+args = parser.parse_args()
 
 context = zmq.Context()
 
@@ -12,22 +75,74 @@ rep.bind("tcp://*:5555")
 pub = context.socket(zmq.PUB)
 pub.bind("tcp://*:5556")
 
-while True:
-    # --- REQ → REP 処理 ---
-    if rep.poll(10):  # 10msだけ待つ
-        cmd = rep.recv_json()     # JSON受信
-        print("cmd:", cmd)
+# PULL: 監視スレッドからのイベント
+bridge = context.socket(zmq.PULL)
+bridge.bind(BRIDGE_ENDPOINT)
+
+observer = None
+bridge_sockets = []
+if args.bridge_logs or args.bridge_images:
+    observer, bridge_sockets = start_bridge(context, args.bridge_logs, args.bridge_pattern, args.bridge_images, args.backend)
 
-        # 応答もJSON
-        rep.send_json({"ack": True, "cmd": cmd})
 
-    # --- 状態配信（PUB） ---
-    status_msg = {
+def status_message():
+    return {
         "time": time.time(),
         "status": "running",
         "fps": 30.5,
         "temperature": 45.3
     }
 
-    pub.send_json(status_msg)
-    time.sleep(0.1)
\ No newline at end of file
+
+# REP と監視イベントの PULL を 1 つの Poller で待つ。
+# コマンドは届いたらすぐ応答し、状態配信はコマンドとは独立したタイマー（--status-hz）で送る。
+poller = zmq.Poller()
+poller.register(rep, zmq.POLLIN)
+poller.register(bridge, zmq.POLLIN)
+
+status_period = 1.0 / args.status_hz if args.status_hz > 0 else None
+next_status = time.monotonic()
+
+try:
+    while True:
+        # 次の状態配信までだけ待つ（配信しないときはイベントが来るまで待つ）
+        if status_period is None:
+            timeout = None
+        else:
+            timeout = max(next_status - time.monotonic(), 0.0) * 1000
+        events = dict(poller.poll(timeout))
+
+        # --- REQ → REP 処理 ---
+        if events.get(rep):
+            cmd = rep.recv_json()     # JSON受信
+            print("cmd:", cmd)
+
+            # 応答もJSON
+            rep.send_json({"ack": True, "cmd": cmd})
+
+        # --- 監視イベントの中継（PUB） ---
+        if events.get(bridge):
+            for _ in range(BRIDGE_BATCH):
+                try:
+                    pub.send_multipart(bridge.recv_multipart(zmq.NOBLOCK))
+                except zmq.Again:
+                    break
+
+        # --- 状態配信（PUB） ---
+        if status_period is not None:
+            now = time.monotonic()
+            if now >= next_status:
+                pub.send_multipart([b"status", json.dumps(status_message()).encode()])
+                next_status += status_period
+                if next_status <= now:  # 大きく遅れたら（サスペンド等）追いつこうとせず今から数え直す
+                    next_status = now + status_period
+except KeyboardInterrupt:
+    pass
+finally:
+    if observer is not None:
+        observer.stop()
+        observer.join()
+    # 監視スレッドが終わってから、そのスレッドで作った PUSH ソケットも含めて閉じる
+    for sock in bridge_sockets + [rep, pub, bridge]:
+        sock.close(linger=0)
+    context.term()